@@ -0,0 +1,208 @@
+# admission.py
+
+import os
+import re
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+import metrics
+
+ADMISSION_LIMITS = os.environ.get("ADMISSION_LIMITS", "cpu=4,db=8,cheap=32,default=32")
+ADMISSION_QUEUE_LIMITS = os.environ.get("ADMISSION_QUEUE_LIMITS", "cpu=64,db=64,cheap=256,default=128")
+ADMISSION_QUEUE_TIMEOUTS = os.environ.get("ADMISSION_QUEUE_TIMEOUTS", "cpu=2,db=2,cheap=0.5,default=2")
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", 1))
+ADMISSION_EXEMPT = os.environ.get("ADMISSION_EXEMPT", "/health/,/metrics,/contacts/events")
+
+# Route classes by method (None for any) and path, first match wins; other routes are "default".
+# "cpu" routes hash passwords, "db" routes read or write many rows, "cheap" routes read one.
+ROUTE_CLASSES = (
+    ("cpu", "POST", re.compile(r"^/(login|register|password-reset|password-reset-request|admin/create-admin)$")),
+    ("db", "GET", re.compile(r"^/(contacts|contacts/changes|birthdays|users)$")),
+    ("db", None, re.compile(r"^/contacts/batch$")),
+    ("cheap", "GET", re.compile(r"^/users/me$")),
+)
+
+in_flight_gauge = metrics.Gauge("admission_in_flight", "Requests being served, by route class", labelnames=("route_class",))
+queued_gauge = metrics.Gauge("admission_queued", "Requests waiting for a slot, by route class", labelnames=("route_class",))
+limit_gauge = metrics.Gauge("admission_limit", "Concurrent requests allowed, by route class", labelnames=("route_class",))
+rejected_counter = metrics.Counter(
+    "admission_rejected_total", "Requests shed with 503, by route class and reason", labelnames=("route_class", "reason"),
+)
+wait_histogram = metrics.Histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a slot", labelnames=("route_class",),
+)
+
+
+def parse_budgets(spec: str, cast=float) -> Dict[str, float]:
+    """
+    Parses a comma-separated list of ``route_class=value`` pairs, e.g. ``"cpu=4,db=8"``.
+
+    Raises:
+        ValueError: If an entry has no value.
+    """
+    budgets = {}
+    for entry in filter(None, (item.strip() for item in spec.split(","))):
+        name, _, value = entry.partition("=")
+        if not value:
+            raise ValueError(f"Invalid admission budget: {entry!r}")
+        budgets[name.strip()] = cast(value)
+    return budgets
+
+
+def classify(method: str, path: str, exempt: Tuple[str, ...] = ()) -> Optional[str]:
+    """
+    Returns the route class of a request, or None for exempt paths.
+    """
+    if exempt and path.startswith(exempt):
+        return None
+    for route_class, route_method, pattern in ROUTE_CLASSES:
+        if (route_method is None or route_method == method) and pattern.match(path):
+            return route_class
+    return "default"
+
+
+class Budget:
+    """
+    A FIFO concurrency limit with a bounded wait queue, for one route class.
+
+    Slots are handed from a finishing request straight to the longest waiting one, so
+    waiting requests are admitted in arrival order. Used from the event loop only.
+
+    Args:
+        route_class (str): The class name, used as the metric label.
+        limit (int): Requests served at a time.
+        max_queue (int): Requests allowed to wait; more are rejected at once.
+        timeout (float): Seconds a request may wait before it is rejected.
+    """
+
+    def __init__(self, route_class: str, limit: int, max_queue: int, timeout: float):
+        self.route_class = route_class
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        limit_gauge.set(limit, route_class=route_class)
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Waits for a slot.
+
+        Returns:
+            Optional[str]: None once admitted, or why the request is rejected: "queue_full" or "timeout".
+        """
+        if self.in_flight < self.limit and not self._waiters:
+            self._admit(0.0)
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        queued_gauge.set(len(self._waiters), route_class=self.route_class)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as the wait timed out
+            return "timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as the request went away
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            queued_gauge.set(len(self._waiters), route_class=self.route_class)
+        wait_histogram.observe(time.perf_counter() - started, route_class=self.route_class)
+        return None
+
+    def _admit(self, waited: float):
+        self.in_flight += 1
+        in_flight_gauge.set(self.in_flight, route_class=self.route_class)
+        wait_histogram.observe(waited, route_class=self.route_class)
+
+    def release(self):
+        """
+        Frees a slot, handing it to the longest waiting request if there is one.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+        in_flight_gauge.set(self.in_flight, route_class=self.route_class)
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware limiting concurrent requests per route class and shedding the excess.
+
+    Each route class (see ``ROUTE_CLASSES``) has its own ``Budget``, so a flood of
+    logins or contact lists cannot starve cheap profile reads. A request that finds its
+    class's queue full, or waits longer than the class's timeout, gets a quick 503 with
+    a ``Retry-After`` header instead of queueing until every request times out. Paths
+    in ``exempt`` (health checks, metrics, event streams) are never limited. Budgets are
+    per worker process.
+
+    Args:
+        app: The wrapped ASGI application.
+        limits (Dict[str, int]): Concurrent requests per route class.
+        queue_limits (Dict[str, int]): Waiting requests per route class.
+        timeouts (Dict[str, float]): Seconds a request of each class may wait.
+        retry_after (int): The ``Retry-After`` of shed requests, in seconds.
+        exempt (Tuple[str, ...]): Path prefixes never limited.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, int]] = None, queue_limits: Optional[Dict[str, int]] = None,
+                 timeouts: Optional[Dict[str, float]] = None, retry_after: int = ADMISSION_RETRY_AFTER_SECONDS,
+                 exempt: Tuple[str, ...] = tuple(prefix for prefix in ADMISSION_EXEMPT.split(",") if prefix)):
+        self.app = app
+        limits = limits if limits is not None else parse_budgets(ADMISSION_LIMITS, int)
+        queue_limits = queue_limits if queue_limits is not None else parse_budgets(ADMISSION_QUEUE_LIMITS, int)
+        timeouts = timeouts if timeouts is not None else parse_budgets(ADMISSION_QUEUE_TIMEOUTS)
+        self.budgets = {
+            route_class: Budget(route_class, limit, queue_limits.get(route_class, 0), timeouts.get(route_class, 0.0))
+            for route_class, limit in limits.items()
+        }
+        self.retry_after = retry_after
+        self.exempt = exempt
+
+    async def __call__(self, scope, receive, send):
+        budget = None
+        if scope["type"] == "http":
+            budget = self.budgets.get(classify(scope["method"], scope["path"], self.exempt))
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejected = await budget.acquire()
+        if rejected is not None:
+            rejected_counter.inc(route_class=budget.route_class, reason=rejected)
+            response = JSONResponse(
+                {"detail": "The server is busy, please retry later"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
+
+
+def enable_admission_control(app: FastAPI):
+    """
+    Adds ``AdmissionControlMiddleware`` to the application.
+
+    Args:
+        app (FastAPI): The FastAPI application instance.
+    """
+    app.add_middleware(AdmissionControlMiddleware)
@@ -9,12 +9,12 @@ from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from redis_utils import get_redis, redis_client
+from redis_utils import get_redis, redis_client, cache_get, cache_setex, cache_delete, user_cache_key
 from pydantic import ValidationError
 
 import redis
 import json
-import database, models, crud
+import database, models, crud, server_timing
 
 SECRET_KEY = os.environ.get("SECRET_KEY")
 ALGORITHM = "HS256"
@@ -64,6 +64,7 @@ def create_refresh_token(user_id: int):
     return encoded_jwt
 
 
+@server_timing.timed("auth")
 async def get_current_user(
         token: str = Depends(oauth2_scheme),
         db: Session = Depends(database.get_db),
@@ -75,7 +76,8 @@ async def get_current_user(
      This function performs the following steps:
      1. Decodes the JWT token.
      2. Extracts the user's email and ID from the token's payload.
-     3. Checks if the user data exists in the Redis cache.
+     3. Checks if the user data exists in the Redis cache (or the local fallback cache
+        while the Redis circuit breaker is open).
      4. If found in the cache and valid, returns the cached user.
      5. If not found or invalid in the cache, queries the database for the user.
      6. If the user exists in the database, caches the user data in Redis.
@@ -108,7 +110,7 @@ async def get_current_user(
         raise credentials_exception
     
     # Checking Redis cache
-    cached_user_data = redis.get(f"user:{user_id}")
+    cached_user_data = cache_get(redis, user_cache_key(user_id))
     if cached_user_data:
         try:
             cached_user = models.CachedUser.model_validate_json(cached_user_data)
@@ -116,13 +118,13 @@ async def get_current_user(
             if user:
                 return user
             else:
-                await redis.delete(f"user:{user_id}") # Removing outdated cache
+                cache_delete(redis, user_cache_key(user_id)) # Removing outdated cache
                 pass
             return models.User.model_validate_json(cached_user_data)
         except ValidationError:
             # If the data in the cache is corrupted or does not match the User schema,
             # you can handle this situation (for example, remove the key from the cache and request it from the DB)
-            await redis.delete(f"user:{user_id}")
+            cache_delete(redis, user_cache_key(user_id))
             pass  # Go to query from database
     
     # If not in cache or validation error occurred, we access the database
@@ -132,7 +134,7 @@ async def get_current_user(
 
     # Cache the user in Redis (use CachedUser for saving)
     cached_user = models.CachedUser.model_validate(user)
-    redis.setex(f"user:{cached_user.id}", USER_CACHE_EXPIRE_SECONDS, cached_user.model_dump_json())
+    cache_setex(redis, user_cache_key(cached_user.id), USER_CACHE_EXPIRE_SECONDS, cached_user.model_dump_json())
     return user
 
 
@@ -152,9 +154,38 @@ def get_current_active_user(current_user: models.User = Depends(get_current_user
     """
     if not current_user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    server_timing.note_user(current_user)
     return current_user
 
 
+async def get_current_active_user_without_session(
+        token: str = Depends(oauth2_scheme),
+        redis: redis.Redis = Depends(get_redis),
+    ):
+    """
+     Retrieves the currently active user with a database session that is closed before returning.
+
+     For long-lived responses such as event streams: a ``Depends(database.get_db)`` session
+     is only closed after the response ends, so each open stream would hold a pooled
+     connection. The returned user is detached and only its loaded attributes can be used.
+
+     Args:
+         token (str, optional): The JWT access token obtained from the Authorization header. Defaults to Depends(oauth2_scheme).
+         redis (redis.Redis, optional): The Redis client. Defaults to Depends(get_redis).
+
+     Raises:
+         HTTPException: If the token is invalid (401 Unauthorized) or the user is inactive (400 Bad Request).
+
+     Returns:
+         models.User: The currently active user object.
+    """
+    db = database.SessionLocal()
+    try:
+        return get_current_active_user(await get_current_user(token, db, redis))
+    finally:
+        db.close()
+
+
 # Dependency for selecting a threaded active administrator
 async def get_current_active_admin(current_user: models.User = Depends(get_current_active_user)):
     """
@@ -0,0 +1,196 @@
+# avatar_processing.py
+
+import io
+import os
+import time
+import base64
+import asyncio
+import binascii
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy.orm import Session
+
+import crud, avatar_storage, metrics
+
+AVATAR_PREPROCESSING_ENABLED = os.environ.get("AVATAR_PREPROCESSING_ENABLED", "true").lower() == "true"
+AVATAR_SIZE_PX = int(os.environ.get("AVATAR_SIZE_PX", 256))
+AVATAR_WEBP_QUALITY = int(os.environ.get("AVATAR_WEBP_QUALITY", 80))
+AVATAR_MAX_PIXELS = int(os.environ.get("AVATAR_MAX_PIXELS", 50_000_000))
+AVATAR_PROCESS_WORKERS = int(os.environ.get("AVATAR_PROCESS_WORKERS", 2))
+
+upload_bytes_counter = metrics.Counter("avatar_upload_bytes_total", "Avatar bytes sent to the image store")
+dedup_hits_counter = metrics.Counter("avatar_dedup_hits_total", "Avatar uploads skipped because the content hash was already stored")
+processing_seconds = metrics.Histogram("avatar_processing_seconds", "Time spent decoding, resizing and re-encoding avatars")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class InvalidAvatarImage(ValueError):
+    """
+    Raised when avatar data cannot be decoded as an image.
+    """
+
+
+@dataclass(frozen=True)
+class ProcessedAvatar:
+    """
+    A resized, re-encoded avatar and the SHA-256 hex digest of its bytes.
+    """
+    content: bytes
+    content_hash: str
+    original_size: int
+
+
+def process_image(data: bytes, size: int = AVATAR_SIZE_PX, quality: int = AVATAR_WEBP_QUALITY, max_pixels: int = AVATAR_MAX_PIXELS) -> bytes:
+    """
+    Decodes an image, crops it to a centred square of ``size`` pixels and encodes it as WebP.
+
+    Runs in a worker process. JPEGs are decoded at a reduced scale close to the target size
+    (``Image.draft``), which avoids decoding every pixel of a large phone photo, and the EXIF
+    orientation is applied before cropping.
+
+    Args:
+        data (bytes): The encoded source image.
+        size (int, optional): The width and height of the result. Defaults to ``AVATAR_SIZE_PX``.
+        quality (int, optional): The WebP quality. Defaults to ``AVATAR_WEBP_QUALITY``.
+        max_pixels (int, optional): Images with more pixels are rejected. Defaults to ``AVATAR_MAX_PIXELS``.
+
+    Returns:
+        bytes: The WebP encoded avatar.
+
+    Raises:
+        InvalidAvatarImage: If the data is not a decodable image or exceeds ``max_pixels``.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Checked on the header, before any pixel is decoded; Pillow's own bomb check
+            # only warns below twice its (process-wide) limit.
+            if image.width * image.height > max_pixels:
+                raise InvalidAvatarImage(f"Invalid image: {image.width}x{image.height} exceeds {max_pixels} pixels")
+            image.draft("RGB", (size * 2, size * 2))
+            image = ImageOps.exif_transpose(image)
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+            image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="WEBP", quality=quality, method=4)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidAvatarImage(f"Invalid image: {e}") from None
+    return output.getvalue()
+
+
+def decode_base64_image(value: str) -> bytes:
+    """
+    Decodes a base64 image, with or without a ``data:image/...;base64,`` prefix.
+
+    Raises:
+        InvalidAvatarImage: If the value is not valid base64.
+    """
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidAvatarImage("Invalid base64 image data") from None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Returns the process pool used for image processing, creating it on first use.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=AVATAR_PROCESS_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    """
+    Shuts down the image processing pool, if it was started.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+async def preprocess_avatar(data: bytes) -> ProcessedAvatar:
+    """
+    Resizes and re-encodes an avatar in the process pool and hashes the result.
+
+    Args:
+        data (bytes): The encoded source image.
+
+    Returns:
+        ProcessedAvatar: The processed image and its content hash.
+
+    Raises:
+        InvalidAvatarImage: If the data is not a decodable image.
+    """
+    global _executor
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        content = await loop.run_in_executor(get_executor(), process_image, data)
+    except BrokenProcessPool:
+        # A crashed worker (e.g. killed for memory) breaks the whole pool; start a fresh one next time.
+        _executor = None
+        raise
+    processing_seconds.observe(time.perf_counter() - started)
+    return ProcessedAvatar(content, hashlib.sha256(content).hexdigest(), len(data))
+
+
+def sniff_content_type(data: bytes) -> str:
+    """
+    Returns the media type of an encoded image from its header, without decoding it.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.get_format_mimetype() or "application/octet-stream"
+    except (UnidentifiedImageError, OSError):
+        return "application/octet-stream"
+
+
+async def store_avatar(db: Session, data: bytes) -> Optional[str]:
+    """
+    Processes an avatar and stores it unless an identical image is already stored.
+
+    The processed image's SHA-256 is looked up first among the images stored by the active
+    ``avatar_storage`` backend; a hit returns the stored URL without any upload, and images
+    stored by a previously configured backend are stored again. New images are saved under
+    their hash and recorded. With ``AVATAR_PREPROCESSING_ENABLED`` false the original bytes
+    are stored unchanged.
+
+    Args:
+        db (Session): The database session.
+        data (bytes): The encoded source image.
+
+    Returns:
+        Optional[str]: The avatar URL, or None if the upload failed.
+
+    Raises:
+        InvalidAvatarImage: If the data is not a decodable image.
+    """
+    if not AVATAR_PREPROCESSING_ENABLED:
+        url = await avatar_storage.storage.save(hashlib.sha256(data).hexdigest(), data, sniff_content_type(data))
+        if url:
+            upload_bytes_counter.inc(len(data))
+        return url
+
+    storage = avatar_storage.storage
+    avatar = await preprocess_avatar(data)
+    stored = crud.get_avatar_by_hash(db, avatar.content_hash, storage.name)
+    if stored is not None:
+        dedup_hits_counter.inc()
+        return stored.url
+
+    url = await storage.save(avatar.content_hash, avatar.content, "image/webp")
+    if url is None:
+        return None
+    upload_bytes_counter.inc(len(avatar.content))
+    return crud.create_avatar(db, avatar.content_hash, url, len(avatar.content), storage.name).url
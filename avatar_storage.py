@@ -0,0 +1,229 @@
+# avatar_storage.py
+
+import os
+import re
+import asyncio
+import logging
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+
+import cloudinary_utils
+
+try:
+    import boto3
+except ImportError:  # boto3 is only needed for the S3 backend
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+AVATAR_STORAGE_BACKEND = os.environ.get("AVATAR_STORAGE_BACKEND", "cloudinary")
+AVATAR_LOCAL_DIR = os.environ.get("AVATAR_LOCAL_DIR", "media/avatars")
+AVATAR_LOCAL_BASE_URL = os.environ.get("AVATAR_LOCAL_BASE_URL", "/avatars")
+AVATAR_S3_BUCKET = os.environ.get("AVATAR_S3_BUCKET")
+AVATAR_S3_PREFIX = os.environ.get("AVATAR_S3_PREFIX", "avatars")
+AVATAR_S3_ENDPOINT_URL = os.environ.get("AVATAR_S3_ENDPOINT_URL")
+AVATAR_S3_REGION = os.environ.get("AVATAR_S3_REGION")
+AVATAR_S3_PUBLIC_BASE_URL = os.environ.get("AVATAR_S3_PUBLIC_BASE_URL")
+
+# Stored avatars are addressed by content hash, so a URL never changes meaning.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+EXTENSIONS = {"image/webp": ".webp", "image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif"}
+MEDIA_TYPES = {extension: media_type for media_type, extension in EXTENSIONS.items()}
+AVATAR_FILENAME = re.compile(r"^(?P<hash>[0-9a-f]{64})(?P<extension>\.[a-z]+)?$")
+
+
+def avatar_filename(content_hash: str, content_type: str) -> str:
+    """
+    Returns the file name of an avatar: its content hash plus an extension for the media type.
+    """
+    return content_hash + EXTENSIONS.get(content_type, "")
+
+
+class AvatarStorage:
+    """
+    Interface of avatar storage backends.
+
+    Avatars are addressed by the SHA-256 of their content, so ``save`` is idempotent and a
+    stored object never changes.
+    """
+    name = "base"
+
+    async def save(self, content_hash: str, content: bytes, content_type: str) -> Optional[str]:
+        """
+        Stores an avatar.
+
+        Args:
+            content_hash (str): The SHA-256 hex digest of ``content``.
+            content (bytes): The encoded image.
+            content_type (str): The media type of the image, e.g. "image/webp".
+
+        Returns:
+            Optional[str]: The public URL of the stored avatar, or None if storing failed.
+        """
+        raise NotImplementedError
+
+
+class CloudinaryAvatarStorage(AvatarStorage):
+    """
+    Stores avatars on Cloudinary under ``avatars/<hash>``.
+    """
+    name = "cloudinary"
+
+    async def save(self, content_hash: str, content: bytes, content_type: str) -> Optional[str]:
+        return await cloudinary_utils.upload_avatar_content(content, public_id=f"avatars/{content_hash}")
+
+
+class LocalAvatarStorage(AvatarStorage):
+    """
+    Stores avatars as files in a local directory, served by ``GET /avatars/{filename}``.
+
+    Suitable for on-premises deployments without an object store, for development and
+    for tests. Files are written to a temporary name and renamed into place, so readers
+    never see a partial avatar.
+    """
+    name = "local"
+
+    def __init__(self, directory: str = AVATAR_LOCAL_DIR, base_url: str = AVATAR_LOCAL_BASE_URL):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _write(self, filename: str, content: bytes):
+        path = self.path_for(filename)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    async def save(self, content_hash: str, content: bytes, content_type: str) -> Optional[str]:
+        filename = avatar_filename(content_hash, content_type)
+        try:
+            await asyncio.to_thread(self._write, filename, content)
+        except OSError:
+            logger.exception("Error storing avatar %s locally", filename)
+            return None
+        return f"{self.base_url}/{filename}"
+
+
+class S3AvatarStorage(AvatarStorage):
+    """
+    Stores avatars in an S3-compatible bucket (AWS S3, MinIO, Ceph, ...).
+
+    Objects are written with an immutable ``Cache-Control`` header so that a CDN or the
+    bucket's own HTTP endpoint can serve them without revalidation.
+    """
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: Optional[str] = AVATAR_S3_BUCKET,
+        prefix: str = AVATAR_S3_PREFIX,
+        endpoint_url: Optional[str] = AVATAR_S3_ENDPOINT_URL,
+        region: Optional[str] = AVATAR_S3_REGION,
+        public_base_url: Optional[str] = AVATAR_S3_PUBLIC_BASE_URL,
+        client=None,
+    ):
+        if not bucket:
+            raise ValueError("AVATAR_S3_BUCKET must be set for the s3 avatar storage backend")
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("The s3 avatar storage backend requires the boto3 package")
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        if public_base_url is None:
+            public_base_url = f"{endpoint_url.rstrip('/')}/{bucket}" if endpoint_url else f"https://{bucket}.s3.amazonaws.com"
+        self.public_base_url = public_base_url.rstrip("/")
+
+    async def save(self, content_hash: str, content: bytes, content_type: str) -> Optional[str]:
+        key = f"{self.prefix}/{avatar_filename(content_hash, content_type)}".lstrip("/")
+        try:
+            await asyncio.wait_for(
+                asyncio.to_thread(
+                    self.client.put_object,
+                    Bucket=self.bucket, Key=key, Body=content,
+                    ContentType=content_type, CacheControl=IMMUTABLE_CACHE_CONTROL,
+                ),
+                timeout=cloudinary_utils.AVATAR_UPLOAD_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            logger.exception("Error uploading avatar %s to S3", key)
+            return None
+        return f"{self.public_base_url}/{key}"
+
+
+def create_storage(backend: Optional[str] = None) -> AvatarStorage:
+    """
+    Creates the avatar storage backend selected by ``AVATAR_STORAGE_BACKEND``.
+
+    Args:
+        backend (Optional[str]): "cloudinary", "local" or "s3". Defaults to ``AVATAR_STORAGE_BACKEND``.
+
+    Returns:
+        AvatarStorage: The storage backend.
+
+    Raises:
+        ValueError: If the backend name is unknown or its settings are incomplete.
+        RuntimeError: If the backend's optional dependency is not installed.
+    """
+    backend = (backend or AVATAR_STORAGE_BACKEND).lower()
+    if backend == "cloudinary":
+        return CloudinaryAvatarStorage()
+    if backend == "local":
+        return LocalAvatarStorage()
+    if backend == "s3":
+        return S3AvatarStorage()
+    raise ValueError(f"Unknown AVATAR_STORAGE_BACKEND: {backend!r}")
+
+
+storage = create_storage()
+
+router = APIRouter()
+
+
+@router.get("/avatars/{filename}", include_in_schema=False)
+async def get_avatar(filename: str, request: Request):
+    """
+    Serves an avatar stored by the local backend.
+
+    The file is streamed by ``FileResponse`` (sent with ``sendfile`` on servers that
+    support the ASGI path-send extension). Because file names are content hashes the
+    response is cacheable forever, and the hash doubles as a strong ETag.
+
+    Args:
+        filename (str): The avatar file name, ``<sha256>.<extension>``.
+        request (Request): The incoming request, checked for ``If-None-Match``.
+
+    Returns:
+        FileResponse: The avatar, or an empty 304 response if the client's copy is current.
+
+    Raises:
+        HTTPException: If the local backend is not in use or the avatar does not exist (status code 404).
+    """
+    match = AVATAR_FILENAME.match(filename)
+    if not isinstance(storage, LocalAvatarStorage) or match is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+    path = storage.path_for(filename)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+
+    etag = f'"{match.group("hash")}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    media_type = MEDIA_TYPES.get(match.group("extension") or "", "application/octet-stream")
+    return FileResponse(path, media_type=media_type, headers=headers)
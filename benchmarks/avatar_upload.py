@@ -0,0 +1,134 @@
+# benchmarks/avatar_upload.py
+"""
+Benchmarks avatar uploads with and without avatar preprocessing.
+
+Requests go to ``POST /users/me/avatar/upload``: phone photos are several megabytes, and
+Starlette rejects form fields over 1 MB, so the base64 ``/users/me/avatar`` variant cannot
+carry them. Both endpoints share the same processing and upload path.
+
+Cloudinary is replaced by a stub that sleeps for a simulated round trip plus the transfer
+time of the uploaded bytes, so the numbers show how resizing and content-hash deduplication
+change bytes uploaded and request latency. The database is an in-memory SQLite instance;
+the application settings are read from the environment (``.env``) as usual.
+
+Usage:
+    python benchmarks/avatar_upload.py --requests 40 --unique 10 --uplink-mbps 20
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+import time
+import random
+import argparse
+import statistics
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import avatar_processing
+from database import Base, UserDB
+from main import app, get_db
+
+
+def make_photo(seed: int, size=(4032, 3024)) -> bytes:
+    """
+    Builds a phone-camera sized JPEG with enough noise to compress like a real photo.
+    """
+    rng = random.Random(seed)
+    small = Image.frombytes("RGB", (size[0] // 8, size[1] // 8), rng.randbytes(size[0] // 8 * size[1] // 8 * 3))
+    output = io.BytesIO()
+    small.resize(size, Image.Resampling.BICUBIC).save(output, format="JPEG", quality=92)
+    return output.getvalue()
+
+
+class SimulatedCloudinary:
+    """
+    Stand-in for ``cloudinary.uploader.upload`` that models round trip and uplink time.
+    """
+
+    def __init__(self, rtt_ms: float, uplink_mbps: float):
+        self.rtt = rtt_ms / 1000
+        self.bytes_per_second = uplink_mbps * 1_000_000 / 8
+        self.bytes_uploaded = 0
+        self.uploads = 0
+
+    def __call__(self, source, **options):
+        if isinstance(source, str):
+            size = len(source)
+        else:
+            source.seek(0, io.SEEK_END)
+            size = source.tell()
+        self.bytes_uploaded += size
+        self.uploads += 1
+        time.sleep(self.rtt + size / self.bytes_per_second)
+        return {"url": f"https://res.cloudinary.com/demo/{options.get('public_id', self.uploads)}"}
+
+
+def upload(client: TestClient, photo: bytes):
+    return client.post("/users/me/avatar/upload", files={"file": ("photo.jpg", photo, "image/jpeg")})
+
+
+def run(mode: str, payloads, rtt_ms: float, uplink_mbps: float) -> dict:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    admin = UserDB(username="admin", email="admin@example.com", hashed_password="x", role="admin")
+    db.add(admin)
+    db.commit()
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[auth.get_current_active_user] = lambda: admin
+    app.dependency_overrides[auth.get_current_active_admin] = lambda: admin
+
+    cloudinary = SimulatedCloudinary(rtt_ms, uplink_mbps)
+    latencies = []
+    with patch.object(avatar_processing, "AVATAR_PREPROCESSING_ENABLED", mode == "processed"), \
+            patch("cloudinary.uploader.upload", cloudinary), TestClient(app) as client:
+        upload(client, payloads[0])  # warm up the process pool
+        cloudinary.bytes_uploaded = cloudinary.uploads = 0
+        for payload in payloads:
+            started = time.perf_counter()
+            response = upload(client, payload)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    app.dependency_overrides.clear()
+    db.close()
+    return {
+        "mode": mode,
+        "uploads": cloudinary.uploads,
+        "bytes": cloudinary.bytes_uploaded,
+        "p50": statistics.median(latencies),
+        "p95": statistics.quantiles(latencies, n=20)[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40, help="number of avatar uploads")
+    parser.add_argument("--unique", type=int, default=10, help="number of distinct images among the uploads")
+    parser.add_argument("--rtt-ms", type=float, default=80, help="simulated round trip to Cloudinary")
+    parser.add_argument("--uplink-mbps", type=float, default=20, help="simulated uplink bandwidth")
+    args = parser.parse_args()
+
+    photos = [make_photo(seed) for seed in range(args.unique)]
+    payloads = [photos[index % args.unique] for index in range(args.requests)]
+    print(f"{args.requests} uploads of {args.unique} distinct photos, "
+          f"average {statistics.mean(len(photo) for photo in photos) / 1e6:.1f} MB each")
+    print(f"{'mode':<10} {'uploads':>8} {'MB sent':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for mode in ("raw", "processed"):
+        result = run(mode, payloads, args.rtt_ms, args.uplink_mbps)
+        print(f"{result['mode']:<10} {result['uploads']:>8} {result['bytes'] / 1e6:>10.2f} "
+              f"{result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f}")
+    avatar_processing.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/import_time.py
+"""
+Measures how long a fresh interpreter takes to ``import main``.
+
+Every worker process pays this cost at startup (and again whenever it is recycled), so
+it is tracked like any other latency. Each run imports the application in a new
+``python -X importtime`` subprocess; the median total and the top-level packages that
+spend the most time in their own modules are reported. Placeholder settings are used for
+anything missing from the environment, so no database, Redis or SMTP server is needed.
+
+Usage:
+    python benchmarks/import_time.py --runs 5
+    python benchmarks/import_time.py --record import_times.jsonl --max-ms 1500
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PLACEHOLDER_ENV = {
+    "DATABASE_URL": "sqlite:///:memory:",
+    "SECRET_KEY": "import-time",
+    "MAIL_USERNAME": "user",
+    "MAIL_PASSWORD": "password",
+    "MAIL_SERVER": "localhost",
+    "MAIL_PORT": "465",
+    "MAIL_FROM": "noreply@example.com",
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def import_once(module: str) -> dict:
+    """
+    Imports ``module`` in a new interpreter.
+
+    Returns:
+        dict: ``total_ms`` and the milliseconds spent in the modules of each top-level package.
+    """
+    env = {**PLACEHOLDER_ENV, **os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    total_ms, packages = 0.0, defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if len(indent) == 1:  # imported directly by the interpreter or the -c statement
+            total_ms += int(cumulative_us) / 1000
+        packages[name.split(".")[0]] += int(self_us) / 1000
+    return {"total_ms": total_ms, "packages": dict(packages)}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main", help="module to import")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    parser.add_argument("--record", help="append the result as a JSON line to this file")
+    parser.add_argument("--max-ms", type=float, help="exit with status 1 if the median exceeds this budget")
+    args = parser.parse_args()
+
+    runs = [import_once(args.module) for _ in range(args.runs)]
+    median = statistics.median(run["total_ms"] for run in runs)
+    packages = {
+        name: statistics.median(run["packages"].get(name, 0.0) for run in runs)
+        for name in {name for run in runs for name in run["packages"]}
+    }
+
+    print(f"import {args.module}: median {median:.0f} ms over {args.runs} runs "
+          f"(min {min(run['total_ms'] for run in runs):.0f}, max {max(run['total_ms'] for run in runs):.0f})")
+    print(f"{'package':<28} {'ms':>8}")
+    for name, elapsed in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<28} {elapsed:>8.1f}")
+
+    if args.record:
+        with open(args.record, "a") as record:
+            record.write(json.dumps({
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "revision": git_revision(),
+                "module": args.module,
+                "median_ms": round(median, 1),
+                "packages": {name: round(elapsed, 1) for name, elapsed in packages.items()},
+            }) + "\n")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"median import time {median:.0f} ms exceeds the {args.max_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
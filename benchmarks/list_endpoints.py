@@ -0,0 +1,93 @@
+# benchmarks/list_endpoints.py
+"""
+Benchmarks ``GET /contacts`` and ``GET /users`` with and without the JSON fast path.
+
+"validated" is the default path (``response_model`` validation of every ORM row, then
+JSON encoding); "trusted" copies the model fields from the rows and renders them with
+orjson (``JSON_FAST_PATH_ENABLED=true``). The database is an in-memory SQLite instance and
+the application settings are read from the environment (``.env``) as usual.
+
+Usage:
+    python benchmarks/list_endpoints.py --rows 100 1000 --iterations 50
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+import argparse
+import statistics
+from datetime import date
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import serialization
+from database import Base, ContactDB, UserDB
+from main import app, get_db
+
+
+def seed(db, rows: int) -> UserDB:
+    admin = UserDB(username="admin", email="admin@example.com", hashed_password="x", role="admin")
+    db.add(admin)
+    db.flush()
+    db.add_all(
+        UserDB(username=f"user{index}", email=f"user{index}@example.com", hashed_password="x", avatar_url=f"/avatars/{index}.webp")
+        for index in range(rows - 1)
+    )
+    db.add_all(
+        ContactDB(
+            first_name=f"First{index}", last_name=f"Last{index}", email=f"contact{index}@example.com",
+            phone_number=f"+380{index:09d}", birthday=date(1970 + index % 50, index % 12 + 1, index % 28 + 1),
+            additional_data="Met at the conference" if index % 3 else None, user_id=admin.id,
+        )
+        for index in range(rows)
+    )
+    db.commit()
+    return admin
+
+
+def measure(client: TestClient, url: str, iterations: int) -> list:
+    client.get(url).raise_for_status()  # warm up
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        client.get(url).raise_for_status()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000], help="rows per response")
+    parser.add_argument("--iterations", type=int, default=50, help="requests per measurement")
+    args = parser.parse_args()
+
+    print(f"{'endpoint':<24} {'mode':<10} {'p50 ms':>9} {'p95 ms':>9} {'rows/s':>10}")
+    for rows in args.rows:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        admin = seed(db, rows)
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: admin
+        app.dependency_overrides[auth.get_current_active_admin] = lambda: admin
+        with TestClient(app) as client:
+            for url in (f"/contacts?limit={rows}", f"/users?limit={rows}"):
+                for mode in ("validated", "trusted"):
+                    with patch.object(serialization, "JSON_FAST_PATH_ENABLED", mode == "trusted"):
+                        timings = measure(client, url, args.iterations)
+                    p50 = statistics.median(timings)
+                    p95 = statistics.quantiles(timings, n=20)[-1]
+                    print(f"{url:<24} {mode:<10} {p50 * 1000:>9.2f} {p95 * 1000:>9.2f} {rows / p50:>10.0f}")
+        app.dependency_overrides.clear()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
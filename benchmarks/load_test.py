@@ -0,0 +1,498 @@
+# benchmarks/load_test.py
+"""
+Drives a scripted traffic mix through the application and reports latency percentiles,
+error rates and per-route throughput.
+
+The harness starts its own stand-ins: a fake Redis server (``tests/fake_redis_server.py``)
+and an SMTP sink that accepts any login, which the outbox worker delivers to. It seeds
+``--users`` users and their contacts with ``seed_data``, mints their access tokens and
+starts ``--command`` against them. The database is a temporary SQLite file unless
+``--database-url`` points at another one, e.g. a local PostgreSQL; its tables are created
+if needed and the users are added after the existing rows. ``--base-url`` targets an
+instance that is already running instead. That instance must use the same database and
+``SECRET_KEY``.
+
+Scenarios (``--scenario``):
+    mixed           the production mix of all the actions below
+    login_burst     POST /login
+    me_polling      GET /users/me (rate limited per client, so expect 429s)
+    contacts_crud   create, read, update, list and delete contacts
+    birthdays       GET /birthdays
+    password_reset  POST /password-reset-request (queues an email for the outbox worker)
+
+Workload models (``--model``):
+    closed  ``--concurrency`` virtual users each send a request, wait for the response and
+            think for an exponentially distributed time with a mean of ``--think-time``.
+            The load drops when the server slows down.
+    open    requests arrive as a Poisson process at ``--rate`` per second, however slowly
+            the server answers, with at most ``--max-in-flight`` outstanding (arrivals
+            beyond that are counted as dropped). Latency is measured from the scheduled
+            arrival, so queueing delay is not hidden by a slow load generator.
+
+Usage:
+    python benchmarks/load_test.py --scenario mixed --concurrency 16 --duration 60
+    python benchmarks/load_test.py --scenario login_burst --model open --rate 50 --json login.json
+    python benchmarks/load_test.py --database-url postgresql://localhost/contacts --command "python server.py"
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests")))
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from server_throughput import ROOT, free_port, wait_until_ready
+
+PLACEHOLDER_ENV = {
+    "SECRET_KEY": "load-test",
+    "MAIL_USERNAME": "load-test",
+    "MAIL_PASSWORD": "load-test",
+    "MAIL_FROM": "noreply@example.com",
+}
+
+
+@dataclass
+class Account:
+    """
+    A seeded user the load generator acts as.
+    """
+    user_id: int
+    email: str
+    token: str
+    contact_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class Sample:
+    """
+    One request: its route template, status code (0 when no response arrived) and latency in seconds.
+    """
+    route: str
+    status: int
+    latency: float
+
+
+class Recorder:
+    """
+    Collects the samples of a run.
+    """
+
+    def __init__(self):
+        self.samples: List[Sample] = []
+        self.dropped = 0
+
+    def add(self, route: str, status: int, latency: float):
+        self.samples.append(Sample(route, status, latency))
+
+
+class VirtualUser:
+    """
+    Sends requests as one account and records each of them.
+
+    In the open model ``scheduled`` is the arrival time of the current action; the first
+    request of the action is timed from it instead of from when it was actually sent.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, account: Account, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.account = account
+        self.rng = rng
+        self.scheduled: Optional[float] = None
+
+    async def request(self, method: str, route: str, path: Optional[str] = None, *, authenticated: bool = True, **kwargs) -> Optional[httpx.Response]:
+        started, self.scheduled = self.scheduled or time.perf_counter(), None
+        headers = {"Authorization": f"Bearer {self.account.token}"} if authenticated else None
+        try:
+            response = await self.client.request(method, path or route, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.recorder.add(f"{method} {route}", response.status_code if response is not None else 0, time.perf_counter() - started)
+        return response
+
+
+# actions
+
+def _contact_body(rng: random.Random, account: Account) -> dict:
+    import seed_data
+    first, last = rng.choice(seed_data.FIRST_NAMES)[0], rng.choice(seed_data.LAST_NAMES)[0]
+    return {
+        "first_name": first,
+        "last_name": last,
+        "email": f"{first.lower()}.{last.lower()}.{account.user_id}.{uuid.uuid4().hex[:12]}@example.com",
+        "phone_number": seed_data.random_phone_number(rng),
+        "birthday": seed_data.random_birthday(rng, date.today()).isoformat(),
+    }
+
+
+async def login(user: VirtualUser):
+    import seed_data
+    response = await user.request("POST", "/login", authenticated=False,
+                                  data={"username": user.account.email, "password": seed_data.SEED_PASSWORD})
+    if response is not None and response.status_code == 200:
+        user.account.token = response.json()["access_token"]
+
+
+async def read_me(user: VirtualUser):
+    await user.request("GET", "/users/me")
+
+
+async def list_contacts(user: VirtualUser):
+    await user.request("GET", "/contacts", params={"limit": 50})
+
+
+async def search_contacts(user: VirtualUser):
+    import seed_data
+    await user.request("GET", "/contacts", params={"last_name": user.rng.choice(seed_data.LAST_NAMES)[0]})
+
+
+async def create_contact(user: VirtualUser):
+    response = await user.request("POST", "/contacts", json=_contact_body(user.rng, user.account))
+    if response is not None and response.status_code == 201:
+        user.account.contact_ids.append(response.json()["id"])
+
+
+async def read_contact(user: VirtualUser):
+    if not user.account.contact_ids:
+        return await create_contact(user)
+    contact_id = user.rng.choice(user.account.contact_ids)
+    await user.request("GET", "/contacts/{contact_id}", f"/contacts/{contact_id}")
+
+
+async def update_contact(user: VirtualUser):
+    if not user.account.contact_ids:
+        return await create_contact(user)
+    contact_id = user.rng.choice(user.account.contact_ids)
+    await user.request("PUT", "/contacts/{contact_id}", f"/contacts/{contact_id}",
+                       json={"additional_data": f"Updated {date.today().isoformat()}"})
+
+
+async def delete_contact(user: VirtualUser):
+    if not user.account.contact_ids:
+        return await create_contact(user)
+    contact_ids = user.account.contact_ids
+    contact_id = contact_ids.pop(user.rng.randrange(len(contact_ids)))
+    await user.request("DELETE", "/contacts/{contact_id}", f"/contacts/{contact_id}")
+
+
+async def upcoming_birthdays(user: VirtualUser):
+    await user.request("GET", "/birthdays")
+
+
+async def request_password_reset(user: VirtualUser):
+    await user.request("POST", "/password-reset-request", authenticated=False, json={"email": user.account.email})
+
+
+Action = Callable[[VirtualUser], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    A named traffic mix: the actions a virtual user picks from and their relative weights.
+    """
+    name: str
+    actions: Tuple[Tuple[Action, float], ...]
+
+    def pick(self, rng: random.Random) -> Action:
+        actions, weights = zip(*self.actions)
+        return rng.choices(actions, weights)[0]
+
+
+SCENARIOS: Dict[str, Scenario] = {scenario.name: scenario for scenario in (
+    Scenario("mixed", (
+        (read_me, 25), (list_contacts, 20), (search_contacts, 10), (read_contact, 12), (upcoming_birthdays, 10),
+        (create_contact, 6), (update_contact, 5), (delete_contact, 3), (login, 8), (request_password_reset, 1),
+    )),
+    Scenario("login_burst", ((login, 1),)),
+    Scenario("me_polling", ((read_me, 1),)),
+    Scenario("contacts_crud", (
+        (create_contact, 2), (read_contact, 3), (update_contact, 2), (list_contacts, 2), (delete_contact, 1),
+    )),
+    Scenario("birthdays", ((upcoming_birthdays, 1),)),
+    Scenario("password_reset", ((request_password_reset, 1),)),
+)}
+
+
+# workload models
+
+async def run_closed(client: httpx.AsyncClient, recorder: Recorder, accounts: List[Account], scenario: Scenario,
+                     duration: float, concurrency: int, think_time: float, seed: int):
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(index: int):
+        rng = random.Random(f"{seed}:{index}")
+        user = VirtualUser(client, recorder, accounts[index % len(accounts)], rng)
+        while time.perf_counter() < deadline:
+            await scenario.pick(rng)(user)
+            if think_time > 0:
+                await asyncio.sleep(min(rng.expovariate(1 / think_time), max(deadline - time.perf_counter(), 0)))
+
+    await asyncio.gather(*(virtual_user(index) for index in range(concurrency)))
+
+
+async def run_open(client: httpx.AsyncClient, recorder: Recorder, accounts: List[Account], scenario: Scenario,
+                   duration: float, rate: float, max_in_flight: int, seed: int):
+    rng = random.Random(seed)
+    in_flight = set()
+    arrival = time.perf_counter()
+    deadline = arrival + duration
+    while arrival < deadline:
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            recorder.dropped += 1
+        else:
+            user = VirtualUser(client, recorder, rng.choice(accounts), random.Random(rng.random()))
+            user.scheduled = arrival
+            task = asyncio.create_task(scenario.pick(rng)(user))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        arrival += rng.expovariate(rate)
+    await asyncio.gather(*in_flight)
+
+
+async def generate_load(base_url: str, accounts: List[Account], scenario: Scenario, args, duration: float) -> Tuple[Recorder, float]:
+    connections = args.concurrency if args.model == "closed" else args.max_in_flight
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    recorder = Recorder()
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        started = time.perf_counter()
+        if args.model == "closed":
+            await run_closed(client, recorder, accounts, scenario, duration, args.concurrency, args.think_time, args.seed)
+        else:
+            await run_open(client, recorder, accounts, scenario, duration, args.rate, args.max_in_flight, args.seed)
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+# report
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Returns the nearest-rank ``q``-th percentile (0-100) of ascending values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _stats(samples: List[Sample], elapsed: float) -> dict:
+    latencies = sorted(sample.latency for sample in samples)
+    errors = sum(1 for sample in samples if not 200 <= sample.status < 400)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        "statuses": dict(sorted(Counter(str(sample.status) for sample in samples).items())),
+    }
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    """
+    Aggregates the samples of a run overall and per route.
+
+    A request counts as an error unless it got a 2xx or 3xx response, so rate-limited
+    (429) and failed (5xx) requests as well as timeouts (status 0) are errors; the status
+    breakdown tells them apart.
+    """
+    by_route = defaultdict(list)
+    for sample in recorder.samples:
+        by_route[sample.route].append(sample)
+    return {
+        "elapsed_seconds": elapsed,
+        "dropped": recorder.dropped,
+        "overall": _stats(recorder.samples, elapsed),
+        "routes": {route: _stats(samples, elapsed) for route, samples in sorted(by_route.items())},
+    }
+
+
+def print_report(summary: dict):
+    print(f"{'route':<36} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    rows = list(summary["routes"].items()) + [("overall", summary["overall"])]
+    for route, stats in rows:
+        statuses = " ".join(f"{status}:{count}" for status, count in stats["statuses"].items())
+        print(f"{route:<36} {stats['requests']:>9} {stats['rps']:>8.1f} {stats['error_rate']:>6.1%} "
+              f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}  {statuses}")
+    if summary["dropped"]:
+        print(f"dropped arrivals (over --max-in-flight): {summary['dropped']}")
+
+
+# environment
+
+def prepare_accounts(database_url: str, users: int, contacts_per_user: int, seed: int) -> List[Account]:
+    """
+    Seeds ``users`` users with ``seed_data`` and returns the active ones with fresh access tokens.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    from sqlalchemy import func, select
+
+    import auth
+    import database
+    import seed_data
+    from database import ContactDB, UserDB
+
+    database.Base.metadata.create_all(bind=database.engine)
+    with database.engine.connect() as connection:
+        first_user_id = (connection.execute(select(func.max(UserDB.id))).scalar() or 0) + 1
+    seed_data.seed(database.engine, users, contacts_per_user, seed=seed)
+
+    accounts = {}
+    with database.engine.connect() as connection:
+        for user_id, email in connection.execute(
+            select(UserDB.id, UserDB.email).where(UserDB.id >= first_user_id, UserDB.is_active.is_(True))
+        ):
+            token = auth.create_access_token({"sub": email, "id": user_id}, expires_delta=timedelta(hours=12))
+            accounts[user_id] = Account(user_id, email, token)
+        for contact_id, user_id in connection.execute(
+            select(ContactDB.id, ContactDB.user_id).where(ContactDB.user_id >= first_user_id)
+        ):
+            if user_id in accounts:
+                accounts[user_id].contact_ids.append(contact_id)
+    database.engine.dispose()
+    return list(accounts.values())
+
+
+class _SMTPSink:
+    """
+    aiosmtpd handler counting the delivered messages.
+    """
+
+    def __init__(self):
+        self.messages = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        return "250 Message accepted for delivery"
+
+
+@contextmanager
+def stand_ins() -> Iterator[Tuple[dict, _SMTPSink]]:
+    """
+    Starts a fake Redis server and an SMTP sink and yields the environment pointing the application at them.
+    """
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+    from fake_redis_server import FakeRedisServer
+
+    redis_server = FakeRedisServer().start()
+    sink = _SMTPSink()
+    smtp_port = free_port()
+    smtp = Controller(sink, hostname="127.0.0.1", port=smtp_port, auth_require_tls=False,
+                      authenticator=lambda *args: AuthResult(success=True))
+    smtp.start()
+    try:
+        yield {
+            "REDIS_MODE": "standalone",
+            "REDIS_HOST": "127.0.0.1",
+            "REDIS_PORT": str(redis_server.port),
+            "MAIL_SERVER": "127.0.0.1",
+            "MAIL_PORT": str(smtp_port),
+            "MAIL_SSL_TLS": "false",
+            "MAIL_STARTTLS": "false",
+            "MAIL_VALIDATE_CERTS": "false",
+        }, sink
+    finally:
+        smtp.stop()
+        redis_server.stop()
+
+
+@contextmanager
+def running_server(command: str, env: dict) -> Iterator[str]:
+    port = free_port()
+    process = subprocess.Popen(
+        command.format(port=port), shell=True, cwd=ROOT, env={**env, "WEB_BIND": f"127.0.0.1:{port}"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url, process)
+        yield base_url
+    finally:
+        os.killpg(process.pid, 15)
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed", help="traffic mix")
+    parser.add_argument("--model", choices=("closed", "open"), default="closed", help="workload model")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the measurement")
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users (closed model)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean think time in seconds (closed model)")
+    parser.add_argument("--rate", type=float, default=50, help="arrivals per second (open model)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="outstanding requests before arrivals are dropped (open model)")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout in seconds")
+    parser.add_argument("--users", type=int, default=100, help="users to seed")
+    parser.add_argument("--contacts-per-user", type=int, default=50, help="mean contacts per seeded user")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the data and the traffic")
+    parser.add_argument("--database-url", default=None, help="database to seed and serve (default: a temporary SQLite file)")
+    parser.add_argument("--command", default="uvicorn main:app --host 127.0.0.1 --port {port}", help="server command; {port} is replaced")
+    parser.add_argument("--base-url", default=None, help="load an already running instance instead (requires --database-url)")
+    parser.add_argument("--json", default=None, help="also write the summary to this file")
+    args = parser.parse_args()
+    if args.base_url and not args.database_url:
+        parser.error("--base-url requires the --database-url of that instance")
+
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+    scenario = SCENARIOS[args.scenario]
+
+    with ExitStack() as stack:
+        database_url = args.database_url
+        if database_url is None:
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            database_url = f"sqlite:///{os.path.join(directory, 'load.db')}"
+        accounts = prepare_accounts(database_url, args.users, args.contacts_per_user, args.seed)
+        sink = None
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            stand_in_env, sink = stack.enter_context(stand_ins())
+            env = {**os.environ, **stand_in_env, "DATABASE_URL": database_url}
+            base_url = stack.enter_context(running_server(args.command, env))
+
+        model = f"{args.concurrency} virtual users" if args.model == "closed" else f"{args.rate:g} arrivals/s"
+        print(f"scenario {scenario.name}, {args.model} model ({model}), {len(accounts)} accounts, "
+              f"{args.duration:g} s after {args.warmup:g} s of warm-up")
+        if args.warmup > 0:
+            asyncio.run(generate_load(base_url, accounts, scenario, args, args.warmup))
+        recorder, elapsed = asyncio.run(generate_load(base_url, accounts, scenario, args, args.duration))
+        summary = summarize(recorder, elapsed)
+        summary.update(scenario=scenario.name, model=args.model, concurrency=args.concurrency, rate=args.rate)
+        if sink is not None:
+            summary["emails_delivered"] = sink.messages
+
+    print_report(summary)
+    if sink is not None:
+        print(f"emails delivered to the SMTP sink: {summary['emails_delivered']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
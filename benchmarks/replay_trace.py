@@ -0,0 +1,242 @@
+# benchmarks/replay_trace.py
+"""
+Re-issues the requests of a request trace (``REQUEST_TRACE_ENABLED=true``, see
+``request_trace.py``) against a local instance and compares the latencies per route
+with the recorded ones.
+
+Requests are sent at their recorded offsets from the first one, divided by ``--speed``
+(2 replays twice as fast), whatever the response times; like the open model of
+``load_test.py``, latency is measured from the scheduled time. The environment is the
+one of ``load_test.py``: seeded users, a fake Redis server and an SMTP sink, and a
+temporary SQLite database unless ``--database-url`` is given.
+
+Redacted values are replaced with synthetic ones of the same kind and length. Each
+recorded identity is mapped to one seeded user, whose token authenticates its requests
+and whose email fills its login and password reset forms; ``contact_id`` path
+parameters are mapped to that user's contacts. Requests whose body was not recorded
+(e.g. avatar uploads) are skipped.
+
+Usage:
+    python benchmarks/replay_trace.py request_trace-1234.jsonl
+    python benchmarks/replay_trace.py trace.jsonl --speed 4 --database-url postgresql://localhost/contacts --json replay.json
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from load_test import (
+    PLACEHOLDER_ENV, Account, Recorder, VirtualUser, percentile, prepare_accounts, print_report,
+    running_server, stand_ins, summarize,
+)
+
+INVALID_TOKEN = "invalid-token"
+
+
+def load_trace(path: str, limit: Optional[int] = None) -> List[dict]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+def synthetic_value(kind: str, length: int, rng: random.Random) -> str:
+    """
+    Returns a valid value of a redacted ``kind`` (see ``request_trace.value_kind``), about ``length`` long.
+    """
+    import seed_data
+    if kind == "email":
+        return f"replay.{uuid.uuid4().hex[:max(length - 20, 8)]}@example.com"
+    if kind == "password":
+        return seed_data.SEED_PASSWORD
+    if kind == "date":
+        return seed_data.random_birthday(rng, date.today()).isoformat()
+    if kind == "phone":
+        return seed_data.random_phone_number(rng)
+    return "x" * length
+
+
+def materialize(key: str, value: Any, account: Account, rng: random.Random, own_email: bool = False) -> Any:
+    """
+    Replaces the placeholders in a redacted value.
+
+    With ``own_email`` (anonymous requests such as login and password reset, whose identity
+    comes from these fields), ``username`` and ``email`` fields become the account's email.
+    """
+    import request_trace
+    if isinstance(value, dict):
+        return {item_key: materialize(item_key, item, account, rng, own_email) for item_key, item in value.items()}
+    if isinstance(value, list):
+        return [materialize(key, item, account, rng) for item in value]
+    placeholder = request_trace.parse_placeholder(value)
+    if placeholder is None:
+        return value
+    kind, length = placeholder
+    if own_email and key in ("username", "email") and account.email:
+        return account.email
+    return synthetic_value(kind, length, rng)
+
+
+class Replayer:
+    """
+    Maps recorded identities and IDs onto seeded accounts and sends the recorded requests.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, accounts: List[Account], seed: int = 0):
+        self.client = client
+        self.recorder = recorder
+        self.accounts = accounts
+        self.rng = random.Random(seed)
+        self.identities: Dict[str, Account] = {}
+        self.skipped = 0
+
+    def account_for(self, record: dict) -> Account:
+        if record["identity_class"] == "invalid":
+            return Account(0, "", INVALID_TOKEN)
+        identity = record.get("identity")
+        if identity is None:
+            return self.rng.choice(self.accounts)
+        if identity not in self.identities:
+            self.identities[identity] = self.accounts[len(self.identities) % len(self.accounts)]
+        return self.identities[identity]
+
+    def path_for(self, record: dict, account: Account) -> str:
+        path = record["route"]
+        for key, value in record["path_params"].items():
+            if key == "contact_id" and account.contact_ids:
+                value = account.contact_ids[int(value) % len(account.contact_ids)] if str(value).isdigit() else account.contact_ids[0]
+            else:
+                value = materialize(key, value, account, self.rng)
+            path = path.replace(f"{{{key}}}", str(value))
+        return path
+
+    async def send(self, record: dict, scheduled: float):
+        if record["route"] == "<unmatched>" or (record["request_bytes"] and not record["body_captured"]):
+            self.skipped += 1
+            return
+        account = self.account_for(record)
+        user = VirtualUser(self.client, self.recorder, account, self.rng)
+        user.scheduled = scheduled
+        kwargs = {"params": materialize("", record["query"], account, self.rng) or None}
+        body = materialize("", record["body"], account, self.rng, own_email=record["identity_class"] == "anonymous")
+        if record["content_type"] == "application/json" and body is not None:
+            kwargs["json"] = body
+        elif record["content_type"] == "application/x-www-form-urlencoded" and body is not None:
+            kwargs["data"] = body
+        await user.request(record["method"], record["route"], self.path_for(record, account),
+                           authenticated=record["identity_class"] != "anonymous", **kwargs)
+
+
+async def replay(base_url: str, records: List[dict], accounts: List[Account], args) -> tuple:
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    recorder = Recorder()
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        replayer = Replayer(client, recorder, accounts, args.seed)
+        in_flight = set()
+        first = records[0]["ts"]
+        started = time.perf_counter()
+        for record in records:
+            scheduled = started + (record["ts"] - first) / args.speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= args.max_in_flight:
+                recorder.dropped += 1
+                continue
+            task = asyncio.create_task(replayer.send(record, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        await asyncio.gather(*in_flight)
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed, replayer.skipped
+
+
+def recorded_latencies(records: List[dict]) -> Dict[str, dict]:
+    by_route = defaultdict(list)
+    for record in records:
+        by_route[f"{record['method']} {record['route']}"].append(record["duration_ms"])
+    result = {}
+    for route, durations in by_route.items():
+        durations.sort()
+        result[route] = {q: percentile(durations, q) for q in (50, 95, 99)}
+    return result
+
+
+def print_comparison(summary: dict, recorded: Dict[str, dict]):
+    print(f"\n{'route':<36} {'p50 rec':>8} {'p50 now':>8} {'p95 rec':>8} {'p95 now':>8} {'p99 rec':>8} {'p99 now':>8}")
+    for route, stats in summary["routes"].items():
+        before = recorded.get(route)
+        if before:
+            print(f"{route:<36} {before[50]:>8.1f} {stats['p50_ms']:>8.1f} {before[95]:>8.1f} "
+                  f"{stats['p95_ms']:>8.1f} {before[99]:>8.1f} {stats['p99_ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace", help="JSONL request trace")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor (2 = twice as fast)")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N requests")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="outstanding requests before records are dropped")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout in seconds")
+    parser.add_argument("--users", type=int, default=100, help="users to seed (recorded identities are mapped onto them)")
+    parser.add_argument("--contacts-per-user", type=int, default=50, help="mean contacts per seeded user")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--database-url", default=None, help="database to seed and serve (default: a temporary SQLite file)")
+    parser.add_argument("--command", default="uvicorn main:app --host 127.0.0.1 --port {port}", help="server command; {port} is replaced")
+    parser.add_argument("--base-url", default=None, help="replay against an already running instance (requires --database-url)")
+    parser.add_argument("--json", default=None, help="also write the summary to this file")
+    args = parser.parse_args()
+    if args.base_url and not args.database_url:
+        parser.error("--base-url requires the --database-url of that instance")
+    records = load_trace(args.trace, args.limit)
+    if not records:
+        parser.error(f"{args.trace} holds no requests")
+
+    for name, value in PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+    with ExitStack() as stack:
+        database_url = args.database_url
+        if database_url is None:
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            database_url = f"sqlite:///{os.path.join(directory, 'replay.db')}"
+        accounts = prepare_accounts(database_url, args.users, args.contacts_per_user, args.seed)
+        if args.base_url:
+            base_url = args.base_url
+        else:
+            stand_in_env, _ = stack.enter_context(stand_ins())
+            base_url = stack.enter_context(running_server(args.command, {**os.environ, **stand_in_env, "DATABASE_URL": database_url}))
+
+        span = records[-1]["ts"] - records[0]["ts"]
+        print(f"{len(records)} requests over {span:.1f} s, replayed at {args.speed:g}x against {len(accounts)} accounts")
+        recorder, elapsed, skipped = asyncio.run(replay(base_url, records, accounts, args))
+
+    summary = summarize(recorder, elapsed)
+    summary.update(trace=args.trace, speed=args.speed, skipped=skipped)
+    print_report(summary)
+    if skipped:
+        print(f"skipped (unmatched route or body not recorded): {skipped}")
+    print_comparison(summary, recorded_latencies(records))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
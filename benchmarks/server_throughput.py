@@ -0,0 +1,169 @@
+# benchmarks/server_throughput.py
+"""
+Compares the throughput of server commands under the same load.
+
+Each command is started against a freshly seeded SQLite database (one user with
+``--contacts`` contacts) on a free local port. The load generator holds ``--concurrency``
+keep-alive connections for ``--duration`` seconds against ``GET /contacts`` and ``GET
+/birthdays`` with a valid token, and the requests per second and latency percentiles of
+every command are printed side by side. The outbox worker is disabled and Redis may be
+absent (the cache falls back to the database), so no other service is needed.
+
+Usage:
+    python benchmarks/server_throughput.py
+    python benchmarks/server_throughput.py --duration 30 --concurrency 64 \\
+        --command "uvicorn main:app --port {port}" --command "python server.py"
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import date, timedelta
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_COMMANDS = (
+    "uvicorn main:app --host 127.0.0.1 --port {port}",
+    "python server.py",
+)
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def seed(database_url: str, contacts: int) -> str:
+    """
+    Creates the schema and test data and returns an access token for the seeded user.
+    """
+    os.environ["DATABASE_URL"] = database_url
+    import auth
+    import database
+
+    database.Base.metadata.create_all(bind=database.engine)
+    with database.SessionLocal() as db:
+        user = database.UserDB(username="bench", email="bench@example.com", hashed_password="x", is_verified=True)
+        db.add(user)
+        db.flush()
+        db.add_all(
+            database.ContactDB(
+                first_name=f"First{index}", last_name=f"Last{index}", email=f"contact{index}@example.com",
+                phone_number=f"+380{index:09d}", birthday=date(1970 + index % 50, index % 12 + 1, index % 28 + 1),
+                user_id=user.id,
+            )
+            for index in range(contacts)
+        )
+        db.commit()
+        token = auth.create_access_token({"sub": user.email, "id": user.id}, expires_delta=timedelta(hours=1))
+    database.engine.dispose()
+    return token
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def generate_load(base_url: str, token: str, duration: float, concurrency: int) -> dict:
+    urls = ("/contacts", "/birthdays")
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30,
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        async def user(offset: int):
+            nonlocal errors
+            request = offset
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(urls[request % len(urls)])
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+                request += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(user(offset) for offset in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+def run_command(command: str, env: dict, token: str, args) -> dict:
+    port = free_port()
+    env = {**env, "WEB_BIND": f"127.0.0.1:{port}"}
+    process = subprocess.Popen(
+        command.format(port=port), shell=True, cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url, process)
+        asyncio.run(generate_load(base_url, token, args.warmup, args.concurrency))
+        return asyncio.run(generate_load(base_url, token, args.duration, args.concurrency))
+    finally:
+        os.killpg(process.pid, 15)
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--command", action="append", help="server command; {port} is replaced (repeatable)")
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds per command")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds per command")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent connections")
+    parser.add_argument("--contacts", type=int, default=50, help="contacts returned by GET /contacts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        token = seed(database_url, args.contacts)
+        env = {
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "OUTBOX_WORKER_ENABLED": "false",
+            "MAIL_PORT": os.environ.get("MAIL_PORT", "465"),
+        }
+        print(f"{args.concurrency} connections, {args.duration:.0f} s per command, "
+              f"{len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()} CPUs")
+        print(f"{'command':<64} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for command in args.command or DEFAULT_COMMANDS:
+            result = run_command(command, env, token, args)
+            print(f"{command.format(port='PORT'):<64} {result['rps']:>9.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p99_ms']:>8.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
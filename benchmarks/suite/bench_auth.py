@@ -0,0 +1,42 @@
+# benchmarks/suite/bench_auth.py
+"""
+Benchmarks of ``auth.get_current_user``, which runs on every authenticated request.
+"""
+
+import asyncio
+
+import pytest
+
+import auth
+from redis_utils import user_cache_key
+
+
+@pytest.fixture
+def event_loop_runner():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+def bench_get_current_user_cached(benchmark, dataset, fake_redis, access_token, event_loop_runner, record_allocations):
+    token = access_token(dataset)
+
+    def get_current_user():
+        with dataset.session() as db:
+            return event_loop_runner(auth.get_current_user(token, db, fake_redis))
+
+    record_allocations(get_current_user)
+    assert fake_redis.get(user_cache_key(dataset.user_id))
+    assert benchmark(get_current_user).id == dataset.user_id
+
+
+def bench_get_current_user_cache_miss(benchmark, dataset, fake_redis, access_token, event_loop_runner, record_allocations):
+    token = access_token(dataset)
+
+    def get_current_user():
+        fake_redis.delete(user_cache_key(dataset.user_id))
+        with dataset.session() as db:
+            return event_loop_runner(auth.get_current_user(token, db, fake_redis))
+
+    record_allocations(get_current_user)
+    assert benchmark(get_current_user).id == dataset.user_id
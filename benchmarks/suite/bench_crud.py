@@ -0,0 +1,53 @@
+# benchmarks/suite/bench_crud.py
+"""
+Benchmarks of the contact queries in ``crud`` at every dataset size.
+
+The measured user owns ``CONTACTS_PER_USER`` contacts at every size, so the timings show
+how the queries scale with the size of the table rather than the size of the result.
+"""
+
+from datetime import date
+
+import crud
+
+TODAY = date(2025, 6, 1)
+
+
+def bench_get_contacts(benchmark, dataset, record_allocations):
+    def get_contacts():
+        with dataset.session() as db:
+            return crud.get_contacts(db, dataset.user_id, limit=100)
+
+    record_allocations(get_contacts)
+    contacts = benchmark(get_contacts)
+    assert len(contacts) == min(100, dataset.size)
+
+
+def bench_get_contacts_by_last_name(benchmark, dataset, record_allocations):
+    with dataset.session() as db:
+        last_name = crud.get_contacts(db, dataset.user_id, limit=1)[0].last_name
+
+    def get_contacts():
+        with dataset.session() as db:
+            return crud.get_contacts(db, dataset.user_id, last_name=last_name)
+
+    record_allocations(get_contacts)
+    assert benchmark(get_contacts)
+
+
+def bench_get_upcoming_birthdays(benchmark, dataset, record_allocations):
+    def get_upcoming_birthdays():
+        with dataset.session() as db:
+            return crud.get_upcoming_birthdays(db, dataset.user_id, today=TODAY)
+
+    record_allocations(get_upcoming_birthdays)
+    benchmark(get_upcoming_birthdays)
+
+
+def bench_get_user_by_email(benchmark, dataset, record_allocations):
+    def get_user_by_email():
+        with dataset.session() as db:
+            return crud.get_user_by_email(db, dataset.user_email)
+
+    record_allocations(get_user_by_email)
+    assert benchmark(get_user_by_email).id == dataset.user_id
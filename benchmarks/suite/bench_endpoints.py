@@ -0,0 +1,71 @@
+# benchmarks/suite/bench_endpoints.py
+"""
+Benchmarks of whole requests through the application (routing, dependencies, validation
+and serialisation included) with ``TestClient``.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import crud
+import database
+import main
+import redis_utils
+from seed_data import SEED_PASSWORD, SEED_PASSWORD_HASH
+from settings import Settings
+
+
+@pytest.fixture
+def client(dataset, fake_redis):
+    app = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+
+    def get_db():
+        db = dataset.session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[main.get_db] = get_db
+    app.dependency_overrides[database.get_db] = get_db
+    app.dependency_overrides[redis_utils.get_redis] = lambda: fake_redis
+    return TestClient(app)
+
+
+def bench_login(benchmark, dataset, client, record_allocations):
+    try:
+        crud.verify_password(SEED_PASSWORD, SEED_PASSWORD_HASH)
+    except Exception as e:  # e.g. a bcrypt release passlib cannot load
+        pytest.skip(f"password hashing is unavailable: {e!r}")
+
+    def login():
+        response = client.post("/login", data={"username": dataset.user_email, "password": SEED_PASSWORD})
+        assert response.status_code == 200, response.text
+        return response
+
+    record_allocations(login)
+    benchmark(login)
+
+
+def bench_list_contacts(benchmark, dataset, client, access_token, record_allocations):
+    headers = {"Authorization": f"Bearer {access_token(dataset)}"}
+
+    def list_contacts():
+        response = client.get("/contacts", params={"limit": 100}, headers=headers)
+        assert response.status_code == 200, response.text
+        return response
+
+    record_allocations(list_contacts)
+    assert len(benchmark(list_contacts).json()) == min(100, dataset.size)
+
+
+def bench_upcoming_birthdays(benchmark, dataset, client, access_token, record_allocations):
+    headers = {"Authorization": f"Bearer {access_token(dataset)}"}
+
+    def upcoming_birthdays():
+        response = client.get("/birthdays", headers=headers)
+        assert response.status_code == 200, response.text
+        return response
+
+    record_allocations(upcoming_birthdays)
+    benchmark(upcoming_birthdays)
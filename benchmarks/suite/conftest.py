@@ -0,0 +1,179 @@
+# benchmarks/suite/conftest.py
+"""
+Fixtures of the benchmark suite: seeded databases at several sizes and a fake Redis.
+
+Datasets are seeded once per size and reused across runs. SQLite files are kept in
+``--data-dir`` and named after the size and a digest of the schema and of ``seed_data``,
+so changing either reseeds them. With ``--database-url`` (e.g. a local PostgreSQL) the tables are recreated
+and reseeded for every size.
+
+Usage::
+
+    python -m pytest benchmarks/suite --sizes 1000,100000,1000000 --benchmark-autosave
+    python -m pytest benchmarks/suite --benchmark-compare=0001_baseline --benchmark-compare-fail=median:15%
+
+Saved runs go to ``benchmarks/results``, in a folder per platform and Python version;
+``--benchmark-compare`` compares against the latest of them, or against a given one by
+number or name. ``0001_baseline`` is the committed reference run at the default sizes,
+recorded with the locked dependencies on a 1-CPU Linux VM; on other hardware, record a
+baseline of your own with ``--benchmark-save=baseline`` before changing the code.
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "tests")))
+
+# Placeholder settings so the application modules import without a .env file.
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+import hashlib
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable
+
+import pytest
+import redis
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import CreateTable
+
+import auth
+import seed_data
+from database import Base, ContactDB, UserDB
+from fake_redis_server import FakeRedisServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+DEFAULT_SIZES = "1000,100000"
+CONTACTS_PER_USER = 100
+SEED_REFERENCE_DATE = date(2025, 6, 1)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("datasets")
+    group.addoption("--sizes", default=DEFAULT_SIZES,
+                    help=f"comma-separated contact counts to benchmark (default: {DEFAULT_SIZES}), e.g. 1000,100000,1000000")
+    group.addoption("--database-url", default=None, help="seed and benchmark this database instead of SQLite files")
+    group.addoption("--data-dir", default=os.path.join(ROOT, "benchmarks", ".data"), help="where SQLite datasets are kept")
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Keep saved runs (--benchmark-autosave / --benchmark-save) in the repository, whatever the working directory.
+    if config.getoption("benchmark_storage", None) == "file://./.benchmarks":
+        config.option.benchmark_storage = f"file://{os.path.join(ROOT, 'benchmarks', 'results')}"
+
+
+def pytest_generate_tests(metafunc):
+    if "dataset" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("sizes").split(",") if size.strip()]
+        metafunc.parametrize("dataset", sizes, indirect=True, scope="session", ids=[f"{size}" for size in sizes])
+
+
+@dataclass
+class Dataset:
+    """
+    A seeded database.
+
+    Attributes:
+        size (int): The number of contacts.
+        engine (Engine): The engine of the database.
+        user_id (int): A user owning ``CONTACTS_PER_USER`` contacts, whose queries are measured.
+        user_email (str): That user's email (and login).
+    """
+    size: int
+    engine: Engine
+    user_id: int
+    user_email: str
+
+    def session(self) -> Session:
+        return sessionmaker(bind=self.engine, autoflush=False)()
+
+
+def dataset_digest() -> str:
+    """
+    Digest of the schema and the data generator, so cached datasets are reseeded when either changes.
+    """
+    digest = hashlib.sha1("".join(str(CreateTable(table)) for table in Base.metadata.sorted_tables).encode())
+    with open(seed_data.__file__, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:10]
+
+
+def seed(engine: Engine, size: int):
+    """
+    Recreates the tables and seeds ``size / CONTACTS_PER_USER`` users with ``CONTACTS_PER_USER`` contacts each.
+    """
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed_data.seed(engine, max(1, size // CONTACTS_PER_USER), CONTACTS_PER_USER, vary_contacts=False, reference=SEED_REFERENCE_DATE)
+
+
+@pytest.fixture(scope="session")
+def dataset(request) -> Dataset:
+    size = request.param
+    database_url = request.config.getoption("database_url")
+    if database_url:
+        engine = create_engine(database_url)
+        seed(engine, size)
+    else:
+        data_dir = request.config.getoption("data_dir")
+        os.makedirs(data_dir, exist_ok=True)
+        path = os.path.join(data_dir, f"contacts-{size}-{dataset_digest()}.db")
+        if not os.path.exists(path):
+            partial = f"{path}.partial"
+            if os.path.exists(partial):
+                os.remove(partial)
+            seed_engine = create_engine(f"sqlite:///{partial}")
+            seed(seed_engine, size)
+            seed_engine.dispose()
+            os.replace(partial, path)
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    with engine.connect() as connection:
+        count = connection.execute(select(func.count()).select_from(ContactDB)).scalar_one()
+        user_id, user_email = connection.execute(select(UserDB.id, UserDB.email).order_by(UserDB.id).limit(1)).one()
+    yield Dataset(size=count, engine=engine, user_id=user_id, user_email=user_email)
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def fake_redis():
+    """
+    A Redis client connected to an in-process fake Redis server.
+    """
+    server = FakeRedisServer().start()
+    client = redis.Redis(host="127.0.0.1", port=server.port, decode_responses=True)
+    yield client
+    client.close()
+    server.stop()
+
+
+@pytest.fixture
+def access_token():
+    def create(dataset: Dataset) -> str:
+        return auth.create_access_token({"sub": dataset.user_email, "id": dataset.user_id}, expires_delta=timedelta(hours=1))
+    return create
+
+
+@pytest.fixture
+def record_allocations(benchmark) -> Callable[[Callable], None]:
+    """
+    Runs an operation once under ``tracemalloc`` and stores the memory it allocated at its
+    peak (``alloc_peak_kib``) and still holds afterwards (``alloc_retained_kib``) in the
+    benchmark's extra info, which is saved with the timings.
+    """
+    def record(operation: Callable):
+        operation()  # warm caches so only the steady-state cost is traced
+        tracemalloc.start()
+        try:
+            operation()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["alloc_peak_kib"] = round(peak / 1024, 1)
+        benchmark.extra_info["alloc_retained_kib"] = round(current / 1024, 1)
+    return record
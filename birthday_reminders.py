@@ -0,0 +1,299 @@
+# birthday_reminders.py
+
+import os
+import time
+import asyncio
+import logging
+import argparse
+import threading
+import concurrent.futures
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from html import escape
+from itertools import groupby
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import crud, database, email_outbox, metrics, redis_utils
+
+logger = logging.getLogger(__name__)
+
+BIRTHDAY_REMINDER_DAYS = int(os.environ.get("BIRTHDAY_REMINDER_DAYS", 7))
+BIRTHDAY_REMINDER_HOUR_UTC = int(os.environ.get("BIRTHDAY_REMINDER_HOUR_UTC", 7))
+BIRTHDAY_REMINDER_BATCH_SIZE = int(os.environ.get("BIRTHDAY_REMINDER_BATCH_SIZE", 500))
+BIRTHDAY_REMINDER_CONCURRENCY = int(os.environ.get("BIRTHDAY_REMINDER_CONCURRENCY", 4))
+BIRTHDAY_REMINDER_MAX_ATTEMPTS = int(os.environ.get("BIRTHDAY_REMINDER_MAX_ATTEMPTS", 3))
+BIRTHDAY_REMINDER_RETRY_SECONDS = float(os.environ.get("BIRTHDAY_REMINDER_RETRY_SECONDS", 300))
+
+users_counter = metrics.Counter("birthday_reminder_users_total", "Users who received a birthday digest")
+contacts_counter = metrics.Counter("birthday_reminder_contacts_total", "Contacts included in birthday digests")
+duration_gauge = metrics.Gauge("birthday_reminder_last_run_seconds", "Duration of the last birthday reminder run")
+
+
+@dataclass
+class BirthdayDigest:
+    """
+    The upcoming birthdays of one user's contacts.
+    """
+    user_id: int
+    email: str
+    username: str
+    contacts: List[tuple] = field(default_factory=list)
+
+
+@dataclass
+class BirthdayReminderReport:
+    """
+    Summary and throughput of a birthday reminder run.
+    """
+    users: int = 0
+    contacts: int = 0
+    emails_queued: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def users_per_second(self) -> float:
+        return self.users / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def contacts_per_second(self) -> float:
+        return self.contacts / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def iter_birthday_digests(db: Session, today: date, days: int = BIRTHDAY_REMINDER_DAYS, chunk_size: int = 1000) -> Iterator[BirthdayDigest]:
+    """
+    Streams one digest per active user with upcoming contact birthdays.
+
+    A single query joins contacts to their owners, filters on the birthday window in SQL
+    and is ordered by owner, so rows are fetched in chunks and grouped on the fly without
+    loading all contacts into memory.
+
+    Args:
+        db (Session): The database session.
+        today (date): The first day of the window.
+        days (int, optional): The window length in days. Defaults to ``BIRTHDAY_REMINDER_DAYS``.
+        chunk_size (int, optional): The number of rows fetched per round trip. Defaults to 1000.
+
+    Yields:
+        BirthdayDigest: The digest of one user.
+    """
+    contact, user = database.ContactDB, database.UserDB
+    statement = (
+        select(user.id, user.email, user.username, contact.first_name, contact.last_name, contact.birthday)
+        .select_from(contact)
+        .join(contact.owner)
+        .where(user.is_active.is_not(False), crud.upcoming_birthday_filter(today, days))
+        .order_by(user.id, contact.birthday, contact.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    rows = db.execute(statement)
+    for user_id, owner_rows in groupby(rows, key=lambda row: row[0]):
+        owner_rows = list(owner_rows)
+        _, email, username = owner_rows[0][:3]
+        yield BirthdayDigest(user_id, email, username, [row[3:] for row in owner_rows])
+
+
+def next_birthday(birthday: date, today: date) -> date:
+    """
+    Returns the next occurrence of ``birthday`` on or after ``today`` (Feb 29th falls on Feb 28th in non-leap years).
+    """
+    for year in (today.year, today.year + 1):
+        try:
+            occurrence = birthday.replace(year=year)
+        except ValueError:
+            occurrence = date(year, 2, 28)
+        if occurrence >= today:
+            return occurrence
+    return occurrence
+
+
+def digest_email(digest: BirthdayDigest, today: date) -> dict:
+    """
+    Renders a digest as an outbox message, keyed so that each user gets at most one digest per day.
+
+    Args:
+        digest (BirthdayDigest): The digest to render.
+        today (date): The first day of the window, used to compute the birthday dates.
+
+    Returns:
+        dict: The message fields accepted by ``email_outbox.enqueue_emails``.
+    """
+    items = "".join(
+        f"<li>{escape(first_name)} {escape(last_name)} &mdash; {next_birthday(birthday, today):%A, %B %d}</li>"
+        for first_name, last_name, birthday in digest.contacts
+    )
+    return {
+        "recipient": digest.email,
+        "subject": "Upcoming birthdays",
+        "body": f"<p>Hi {escape(digest.username)}, these contacts have birthdays coming up:</p><ul>{items}</ul>",
+        "subtype": "html",
+        "dedup_key": f"birthday-digest:{digest.user_id}:{today.isoformat()}",
+    }
+
+
+def _enqueue_batch(session_factory: Callable[[], Session], messages: List[dict]) -> int:
+    db = session_factory()
+    try:
+        return email_outbox.enqueue_emails(db, messages)
+    finally:
+        db.close()
+
+
+async def run_birthday_reminders(
+    session_factory: Optional[Callable[[], Session]] = None,
+    today: Optional[date] = None,
+    days: int = BIRTHDAY_REMINDER_DAYS,
+    batch_size: int = BIRTHDAY_REMINDER_BATCH_SIZE,
+    concurrency: int = BIRTHDAY_REMINDER_CONCURRENCY,
+) -> BirthdayReminderReport:
+    """
+    Queues one birthday digest email per user for the whole user base.
+
+    A reader thread streams digests from the database while up to ``concurrency`` writers
+    insert them into the email outbox in batches of ``batch_size``. The queue between them
+    holds at most ``concurrency`` batches, so memory stays bounded regardless of the number
+    of users; delivery itself is left to the outbox worker. If a writer fails, the reader
+    and the other writers are stopped and the error is raised. Digests are queued at most
+    once per user and day, so rerunning a failed run only queues the ones still missing.
+
+    Args:
+        session_factory (Optional[Callable[[], Session]]): Creates database sessions. Defaults to ``database.SessionLocal``.
+        today (Optional[date]): The first day of the window. Defaults to the current UTC date.
+        days (int, optional): The window length in days. Defaults to ``BIRTHDAY_REMINDER_DAYS``.
+        batch_size (int, optional): Digests per outbox insert. Defaults to ``BIRTHDAY_REMINDER_BATCH_SIZE``.
+        concurrency (int, optional): Concurrent outbox writers. Defaults to ``BIRTHDAY_REMINDER_CONCURRENCY``.
+
+    Returns:
+        BirthdayReminderReport: Counts and throughput of the run.
+    """
+    session_factory = session_factory or database.SessionLocal
+    today = today or datetime.now(timezone.utc).date()
+    report = BirthdayReminderReport()
+    loop = asyncio.get_running_loop()
+    batches: "asyncio.Queue[Optional[List[dict]]]" = asyncio.Queue(maxsize=concurrency)
+    stopped = threading.Event()
+    started = time.perf_counter()
+
+    def put(batch) -> bool:
+        # Waits for room in the queue, giving up once the run is stopped so the reader
+        # thread (and its session) cannot outlive writers that failed.
+        future = asyncio.run_coroutine_threadsafe(batches.put(batch), loop)
+        while not stopped.is_set():
+            with suppress(concurrent.futures.TimeoutError):
+                future.result(timeout=0.1)
+                return True
+        future.cancel()
+        return False
+
+    def produce():
+        db = session_factory()
+        try:
+            batch = []
+            for digest in iter_birthday_digests(db, today, days):
+                report.users += 1
+                report.contacts += len(digest.contacts)
+                batch.append(digest_email(digest, today))
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch:
+                put(batch)
+        finally:
+            db.close()
+            for _ in range(concurrency):
+                if not put(None):
+                    break
+
+    async def consume():
+        while (batch := await batches.get()) is not None:
+            queued = await asyncio.to_thread(_enqueue_batch, session_factory, batch)
+            report.emails_queued += queued
+
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    consumers = [asyncio.ensure_future(consume()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(producer, *consumers)
+    except BaseException:
+        stopped.set()
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(producer, *consumers, return_exceptions=True)
+        raise
+
+    report.elapsed_seconds = time.perf_counter() - started
+    users_counter.inc(report.users)
+    contacts_counter.inc(report.contacts)
+    duration_gauge.set(report.elapsed_seconds)
+    logger.info(
+        "Birthday reminders queued for %d users (%d contacts) in %.2fs: %.1f users/s, %.1f contacts/s",
+        report.users, report.contacts, report.elapsed_seconds, report.users_per_second, report.contacts_per_second,
+    )
+    return report
+
+
+def seconds_until_next_run(now: datetime, hour: int = BIRTHDAY_REMINDER_HOUR_UTC) -> float:
+    """
+    Returns the number of seconds from ``now`` until the next daily run at ``hour`` UTC.
+    """
+    next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def _scheduler_loop():
+    while True:
+        await asyncio.sleep(seconds_until_next_run(datetime.now(timezone.utc)))
+        today = datetime.now(timezone.utc).date()
+        lock_key = redis_utils.cache_key("job", "birthday-reminders", today.isoformat())
+        # Every worker runs this loop; the lock makes sure only one of them sends the digests.
+        if not redis_utils.acquire_lock(redis_utils.redis_client, lock_key, ttl=23 * 3600):
+            continue
+        # Digests are deduplicated per user and day, so a failed run is retried without resending.
+        for attempt in range(1, BIRTHDAY_REMINDER_MAX_ATTEMPTS + 1):
+            try:
+                await run_birthday_reminders(today=today)
+                break
+            except Exception:
+                logger.exception("Birthday reminder run failed (attempt %d of %d)", attempt, BIRTHDAY_REMINDER_MAX_ATTEMPTS)
+                if attempt < BIRTHDAY_REMINDER_MAX_ATTEMPTS:
+                    await asyncio.sleep(BIRTHDAY_REMINDER_RETRY_SECONDS)
+
+
+@asynccontextmanager
+async def run_birthday_scheduler() -> AsyncIterator[asyncio.Task]:
+    """
+    Runs the daily birthday reminder job for the duration of the context, e.g. the
+    application lifespan when ``BIRTHDAY_REMINDER_SCHEDULER_ENABLED`` is true.
+
+    Deployments that prefer an external scheduler can run ``python birthday_reminders.py``
+    from cron instead.
+
+    Yields:
+        asyncio.Task: The scheduler task.
+    """
+    task = asyncio.create_task(_scheduler_loop())
+    try:
+        yield task
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue birthday digest emails for all users.")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="first day of the window (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=BIRTHDAY_REMINDER_DAYS, help="window length in days")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    result = asyncio.run(run_birthday_reminders(today=args.date, days=args.days))
+    print(
+        f"users={result.users} contacts={result.contacts} emails_queued={result.emails_queued} "
+        f"elapsed={result.elapsed_seconds:.2f}s users/s={result.users_per_second:.1f} "
+        f"contacts/s={result.contacts_per_second:.1f}"
+    )
@@ -1,35 +1,73 @@
 # cloudinary_utils.py
 
+import io
 import os
-import cloudinary
-import cloudinary.uploader
-
-cloudinary.config(
-    cloud_name=os.environ.get("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.environ.get("CLOUDINARY_API_KEY"),
-    api_secret=os.environ.get("CLOUDINARY_API_SECRET")
-)
-"""
-Configuration for the Cloudinary service.
-
-This configuration is loaded from environment variables for the cloud name, API key, and API secret.
-Ensure these environment variables are set for the Cloudinary integration to work.
-"""
-
-async def upload_avatar(base64_image: str):
+import asyncio
+import logging
+from typing import BinaryIO, Optional
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+AVATAR_MAX_BYTES = int(os.environ.get("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+AVATAR_UPLOAD_TIMEOUT_SECONDS = float(os.environ.get("AVATAR_UPLOAD_TIMEOUT_SECONDS", 30))
+
+_configured = False
+
+
+def _uploader():
     """
-    Asynchronously uploads a base64 encoded image to Cloudinary.
+    Imports and configures the Cloudinary SDK on first use, so processes that never upload
+    an avatar do not pay for importing it.
 
-    Args:
-        base64_image (str): A string containing the base64 encoded image data.
+    The configuration is loaded from environment variables for the cloud name, API key, and API secret.
+    Ensure these environment variables are set for the Cloudinary integration to work.
+    """
+    global _configured
+    import cloudinary
+    import cloudinary.uploader
+    if not _configured:
+        cloudinary.config(
+            cloud_name=os.environ.get("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.environ.get("CLOUDINARY_API_KEY"),
+            api_secret=os.environ.get("CLOUDINARY_API_SECRET")
+        )
+        _configured = True
+    return cloudinary.uploader
 
-    Returns:
-        Optional[str]: The URL of the uploaded image on Cloudinary if successful, otherwise None.
+
+def _upload(source: BinaryIO, **options) -> Optional[str]:
+    with tracing.span("cloudinary.upload", tracing.SpanKind.CLIENT):
+        upload_result = _uploader().upload(source, timeout=AVATAR_UPLOAD_TIMEOUT_SECONDS, **options)
+    return upload_result.get("url")
+
+
+async def _upload_in_thread(source: BinaryIO, **options) -> Optional[str]:
+    """
+    Runs the blocking Cloudinary upload in the default thread pool so the event loop keeps
+    serving other requests, giving up after ``AVATAR_UPLOAD_TIMEOUT_SECONDS``.
     """
     try:
-        upload_result = cloudinary.uploader.upload(base64_image)
-        return upload_result.get("url")
+        return await asyncio.wait_for(asyncio.to_thread(_upload, source, **options), timeout=AVATAR_UPLOAD_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Cloudinary upload timed out after %ss", AVATAR_UPLOAD_TIMEOUT_SECONDS)
+        return None
     except Exception as e:
-        print(f"Error uploading to Cloudinary: {e}")
+        logger.warning("Error uploading to Cloudinary: %r", e)
         return None
-    
\ No newline at end of file
+
+
+async def upload_avatar_content(content: bytes, public_id: str) -> Optional[str]:
+    """
+    Asynchronously uploads an already processed avatar image to Cloudinary.
+
+    Args:
+        content (bytes): The encoded image.
+        public_id (str): The Cloudinary public ID, e.g. derived from the content hash so
+            that repeated uploads of the same image map to the same asset.
+
+    Returns:
+        Optional[str]: The URL of the uploaded image on Cloudinary if successful, otherwise None.
+    """
+    return await _upload_in_thread(io.BytesIO(content), public_id=public_id, overwrite=False)
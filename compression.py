@@ -0,0 +1,246 @@
+# compression.py
+
+import os
+import gzip
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it "br" is not offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; without it "zstd" is not offered
+    zstandard = None
+
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", 1024))
+COMPRESSION_ENCODINGS = os.environ.get("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+COMPRESSION_CONTENT_TYPES = os.environ.get(
+    "COMPRESSION_CONTENT_TYPES", "application/json,text/html,text/plain,text/csv,application/javascript,image/svg+xml"
+)
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", 3))
+COMPRESSION_CACHE_MAX_BYTES = int(os.environ.get("COMPRESSION_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Bodies at least this large are compressed in a worker thread instead of on the event loop.
+_OFFLOAD_BYTES = 64 * 1024
+
+input_bytes_counter = metrics.Counter(
+    "compression_input_bytes_total", "Response bytes before compression", labelnames=("encoding",)
+)
+output_bytes_counter = metrics.Counter(
+    "compression_output_bytes_total", "Response bytes after compression", labelnames=("encoding",)
+)
+cache_hits_counter = metrics.Counter(
+    "compression_cache_hits_total", "Responses served from the precompressed body cache", labelnames=("encoding",)
+)
+
+
+def _compressors() -> Dict[str, Callable[[bytes], bytes]]:
+    compressors = {"gzip": lambda data: gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        compressors["br"] = lambda data: brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        compressors["zstd"] = lambda data: zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(data)
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+
+def parse_list(value: str) -> Tuple[str, ...]:
+    """
+    Parses a comma-separated setting into lower-case, non-empty entries.
+    """
+    return tuple(item.strip().lower() for item in value.split(",") if item.strip())
+
+
+def negotiate(accept_encoding: Optional[str], available: Sequence[str]) -> Optional[str]:
+    """
+    Picks the content coding for a response from the request's ``Accept-Encoding``.
+
+    The client's highest q-value wins; ties go to the earliest entry of ``available``.
+    Codings with ``q=0`` are refused and ``*`` applies to every coding not listed.
+
+    Args:
+        accept_encoding (Optional[str]): The ``Accept-Encoding`` request header.
+        available (Sequence[str]): The server's codings in order of preference.
+
+    Returns:
+        Optional[str]: The chosen coding, or None to send the body uncompressed.
+    """
+    if not accept_encoding:
+        return None
+    preferences = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            preferences[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = preferences.get(coding, preferences.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class PrecompressedCache:
+    """
+    A size-bounded LRU cache of compressed bodies keyed by coding and body digest.
+
+    Responses with identical bodies (e.g. the same list page requested by many clients)
+    are compressed once and served from memory afterwards.
+
+    Args:
+        max_bytes (int): The total size of the compressed bodies to keep.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(encoding: str, body: bytes) -> Tuple[str, bytes]:
+        return encoding, hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Tuple[str, bytes], value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the best coding the client accepts.
+
+    Only complete bodies are compressed: a response whose first body message announces
+    more data (e.g. a Server-Sent Events stream) is passed through untouched, so streams
+    are never buffered. Responses that are too small, already encoded or not of an allowed
+    content type are also left alone; eligible content types always get
+    ``Vary: Accept-Encoding``.
+
+    Args:
+        app: The wrapped ASGI application.
+        minimum_size (int): Smallest body, in bytes, worth compressing.
+        encodings (Sequence[str]): Codings to offer, in order of preference; unavailable ones are ignored.
+        content_types (Sequence[str]): Allowed media types; entries ending in ``/`` match a whole type.
+        cache (Optional[PrecompressedCache]): Cache of compressed bodies. Defaults to a new cache.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+                 encodings: Sequence[str] = parse_list(COMPRESSION_ENCODINGS),
+                 content_types: Sequence[str] = parse_list(COMPRESSION_CONTENT_TYPES),
+                 cache: Optional[PrecompressedCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = tuple(encoding for encoding in encodings if encoding in COMPRESSORS)
+        self.content_types = tuple(content_types)
+        self.cache = cache if cache is not None else PrecompressedCache()
+
+    def is_compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return any(
+            media_type.startswith(allowed) if allowed.endswith("/") else media_type == allowed
+            for allowed in self.content_types
+        )
+
+    async def compress(self, body: bytes, encoding: str) -> bytes:
+        """
+        Returns the compressed body, from the cache when this body was compressed before.
+        """
+        key = self.cache.key(encoding, body)
+        compressed = self.cache.get(key)
+        if compressed is not None:
+            cache_hits_counter.inc(encoding=encoding)
+            return compressed
+        compressor = COMPRESSORS[encoding]
+        if len(body) >= _OFFLOAD_BYTES:
+            compressed = await asyncio.to_thread(compressor, body)
+        else:
+            compressed = compressor(body)
+        self.cache.set(key, compressed)
+        input_bytes_counter.inc(len(body), encoding=encoding)
+        output_bytes_counter.inc(len(compressed), encoding=encoding)
+        return compressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] == "http.response.body" and start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                body = message.get("body", b"")
+                if self.is_compressible(headers):
+                    headers.add_vary_header("Accept-Encoding")
+                    if encoding and not message.get("more_body", False) and len(body) >= self.minimum_size:
+                        compressed = await self.compress(body, encoding)
+                        if len(compressed) < len(body):
+                            headers["Content-Encoding"] = encoding
+                            headers["Content-Length"] = str(len(compressed))
+                            etag = headers.get("etag")
+                            if etag and not etag.startswith("W/"):
+                                headers["ETag"] = f"W/{etag}"
+                            message = {**message, "body": compressed}
+            if start_message is not None:
+                # Also flush before messages that are not bodies, e.g. ``http.response.pathsend``.
+                await send(start_message)
+                start_message = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+def enable_compression(app: FastAPI):
+    """
+    Adds ``CompressionMiddleware`` to the application.
+
+    Args:
+        app (FastAPI): The FastAPI application instance.
+    """
+    app.add_middleware(CompressionMiddleware)
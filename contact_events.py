@@ -0,0 +1,303 @@
+# contact_events.py
+
+import os
+import json
+import asyncio
+import logging
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+import redis
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import metrics
+from redis_utils import cache_key, publish, redis_client
+
+logger = logging.getLogger(__name__)
+
+CONTACT_EVENTS_QUEUE_SIZE = int(os.environ.get("CONTACT_EVENTS_QUEUE_SIZE", 100))
+CONTACT_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("CONTACT_EVENTS_HEARTBEAT_SECONDS", 15))
+CONTACT_EVENTS_MAX_CONNECTIONS = int(os.environ.get("CONTACT_EVENTS_MAX_CONNECTIONS", 1000))
+CONTACT_EVENTS_RECONNECT_SECONDS = float(os.environ.get("CONTACT_EVENTS_RECONNECT_SECONDS", 5))
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+RESYNC = "resync"
+
+CHANNEL_NAMESPACE = "contact-events"
+_PENDING_KEY = "contact_events"
+
+subscribers_gauge = metrics.Gauge("contact_event_subscribers", "Open contact event streams in this worker")
+dropped_counter = metrics.Counter(
+    "contact_events_dropped_total", "Contact events dropped because a stream's buffer was full"
+)
+
+
+def channel(user_id: int) -> str:
+    """
+    Returns the pub/sub channel of a user's contact events, e.g. ``"contact-events:{42}"``.
+    """
+    return cache_key(CHANNEL_NAMESPACE, user_id)
+
+
+def record(db: Session, user_id: int, event_type: str, ids: List[int], version: int):
+    """
+    Queues a contact event on the session; it is published only if the transaction commits.
+
+    Args:
+        db (Session): The session making the change.
+        user_id (int): The ID of the user who owns the contacts.
+        event_type (str): ``CREATED``, ``UPDATED`` or ``DELETED``.
+        ids (List[int]): The IDs of the changed contacts.
+        version (int): The owner's contact version of the change.
+    """
+    db.info.setdefault(_PENDING_KEY, []).append(
+        {"type": event_type, "user_id": user_id, "ids": list(ids), "version": version}
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session):
+    for pending in session.info.pop(_PENDING_KEY, ()):
+        publish_event(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def publish_event(contact_event: dict):
+    """
+    Fans a contact event out to every worker through Redis pub/sub.
+
+    While Redis is unavailable the event is delivered to this worker's streams only.
+
+    Args:
+        contact_event (dict): The event, including the owner's ``user_id``.
+    """
+    if not publish(redis_client, channel(contact_event["user_id"]), json.dumps(contact_event)):
+        broker.dispatch(contact_event)
+
+
+def format_event(contact_event: dict) -> str:
+    """
+    Formats a contact event as a Server-Sent Events message.
+
+    The SSE ``id`` is the contact version, which a reconnecting client can pass to
+    ``GET /contacts/changes?since=`` to catch up on anything it missed.
+
+    Args:
+        contact_event (dict): The event.
+
+    Returns:
+        str: The SSE message.
+    """
+    data = {key: value for key, value in contact_event.items() if key != "user_id"}
+    lines = [f"event: {contact_event['type']}", f"data: {json.dumps(data)}"]
+    if contact_event.get("version") is not None:
+        lines.insert(0, f"id: {contact_event['version']}")
+    return "\n".join(lines) + "\n\n"
+
+
+class TooManySubscribers(Exception):
+    """
+    Raised when this worker already holds ``CONTACT_EVENTS_MAX_CONNECTIONS`` streams.
+    """
+
+
+class Subscription:
+    """
+    A bounded event buffer for one open stream.
+
+    When a slow client lets the buffer fill up, the buffered events are replaced by a single
+    ``resync`` event telling the client to catch up through ``/contacts/changes``, so memory
+    stays bounded and no change is silently lost.
+    """
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, contact_event: dict):
+        """
+        Buffers an event; must be called on the subscription's event loop.
+        """
+        try:
+            self.queue.put_nowait(contact_event)
+        except asyncio.QueueFull:
+            dropped_counter.inc(self.queue.qsize() + 1)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": RESYNC})
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """
+        Waits for the next event.
+
+        Args:
+            timeout (float): Seconds to wait.
+
+        Returns:
+            Optional[dict]: The event, or None if none arrived in time.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ContactEventBroker:
+    """
+    Routes contact events from Redis pub/sub to the open streams of this worker.
+
+    A single pattern subscription per worker (in a background thread, started with the
+    first stream) receives every user's events; each event is handed to the streams of
+    its owner on their event loop.
+    """
+
+    def __init__(self, client=None, queue_size: int = CONTACT_EVENTS_QUEUE_SIZE,
+                 max_subscribers: int = CONTACT_EVENTS_MAX_CONNECTIONS):
+        self.client = client
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def has_capacity(self) -> bool:
+        return self.subscriber_count < self.max_subscribers
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """
+        Opens a stream buffer for a user; must be called from a running event loop.
+
+        Raises:
+            TooManySubscribers: If the worker is at ``max_subscribers``.
+        """
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            if sum(len(subscriptions) for subscriptions in self._subscriptions.values()) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def dispatch(self, contact_event: dict):
+        """
+        Delivers an event to the owner's streams in this worker; safe to call from any thread.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(contact_event.get("user_id"), ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.push, contact_event)
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(cache_key(CHANNEL_NAMESPACE, "*"))
+                while not self._stopping.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "pmessage":
+                        try:
+                            self.dispatch(json.loads(message["data"]))
+                        except (TypeError, ValueError):
+                            logger.warning("Ignoring malformed contact event: %r", message["data"])
+            except (redis.RedisError, OSError) as e:
+                logger.warning("Contact event subscription failed, retrying: %s", e)
+                self._stopping.wait(CONTACT_EVENTS_RECONNECT_SECONDS)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except (redis.RedisError, OSError):
+                        pass
+
+    def start(self):
+        """
+        Starts the Redis listener thread if it is not running yet.
+        """
+        with self._lock:
+            if self.client is None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._listen, name="contact-events", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+broker = ContactEventBroker(redis_client)
+subscribers_gauge.set_function(lambda: broker.subscriber_count)
+
+
+async def stream(subscription: Subscription, heartbeat_seconds: float = CONTACT_EVENTS_HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+    """
+    Yields a subscription's contact events as Server-Sent Events, with a comment line as
+    heartbeat whenever nothing happened for ``heartbeat_seconds``.
+
+    Args:
+        subscription (Subscription): The open stream buffer.
+        heartbeat_seconds (float, optional): The idle interval between heartbeats.
+
+    Yields:
+        str: SSE messages.
+    """
+    yield f"retry: {int(CONTACT_EVENTS_RECONNECT_SECONDS * 1000)}\n\n"
+    while True:
+        contact_event = await subscription.get(heartbeat_seconds)
+        yield ": heartbeat\n\n" if contact_event is None else format_event(contact_event)
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    The ``text/event-stream`` response of a subscription.
+
+    The subscription is closed when the response ends, whether the stream finished, the
+    client went away or the response was cancelled before the stream started.
+
+    Args:
+        subscription (Subscription): The stream buffer, from ``ContactEventBroker.subscribe``.
+        event_broker (ContactEventBroker): The broker that opened it.
+        heartbeat_seconds (float, optional): The idle interval between heartbeats.
+    """
+
+    def __init__(self, subscription: Subscription, event_broker: ContactEventBroker,
+                 heartbeat_seconds: float = CONTACT_EVENTS_HEARTBEAT_SECONDS):
+        super().__init__(
+            stream(subscription, heartbeat_seconds),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        self.subscription = subscription
+        self.event_broker = event_broker
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.event_broker.unsubscribe(self.subscription)
@@ -2,15 +2,17 @@
 
 import os
 import secrets
-from typing import List, Optional
+from http import HTTPStatus
+from typing import Dict, List, Optional, Sequence
 from datetime import date, timedelta, timezone, datetime
 from calendar import isleap
 
-from sqlalchemy import and_, func
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, func, extract, select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only
 from passlib.context import CryptContext
 
-import models, database
+import models, database, contact_events, tracing, server_timing
 
 PASSWORD_RESET_TOKEN_EXPIRY_MINUTES = int(os.environ.get("PASSWORD_RESET_TOKEN_EXPIRY_MINUTES", 15))
 
@@ -28,7 +30,8 @@ def get_password_hash(password):
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    with tracing.span("bcrypt.hash"), server_timing.timer("hash"):
+        return pwd_context.hash(password)
 
 
 def verify_password(plain_password, hashed_password):
@@ -42,7 +45,8 @@ def verify_password(plain_password, hashed_password):
     Returns:
         bool: True if the plain password matches the hashed password, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    with tracing.span("bcrypt.verify"), server_timing.timer("hash"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 
 def create_password_reset_token(db: Session, email: str) -> database.PasswordResetTokenDB:
@@ -184,6 +188,50 @@ def update_user_avatar(db: Session, user_id: int, avatar_url: str):
     return None
 
 
+def get_avatar_by_hash(db: Session, content_hash: str, backend: str) -> Optional[database.AvatarDB]:
+    """
+    Retrieves an avatar stored by a backend, by the content hash of its processed image.
+
+    Args:
+        db (Session): The database session.
+        content_hash (str): The SHA-256 hex digest of the processed image.
+        backend (str): The name of the storage backend, e.g. "local".
+
+    Returns:
+        Optional[database.AvatarDB]: The stored avatar if found, otherwise None.
+    """
+    return db.query(database.AvatarDB).filter(
+        database.AvatarDB.backend == backend, database.AvatarDB.content_hash == content_hash,
+    ).first()
+
+
+def create_avatar(db: Session, content_hash: str, url: str, size_bytes: int, backend: str) -> database.AvatarDB:
+    """
+    Records the URL of an avatar stored by a backend under its content hash.
+
+    If a concurrent request recorded the same hash for the backend first, the existing row is returned.
+
+    Args:
+        db (Session): The database session.
+        content_hash (str): The SHA-256 hex digest of the processed image.
+        url (str): The URL of the stored image.
+        size_bytes (int): The size of the processed image in bytes.
+        backend (str): The name of the storage backend that stored it.
+
+    Returns:
+        database.AvatarDB: The stored avatar.
+    """
+    db_avatar = database.AvatarDB(backend=backend, content_hash=content_hash, url=url, size_bytes=size_bytes)
+    db.add(db_avatar)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return get_avatar_by_hash(db, content_hash, backend)
+    db.refresh(db_avatar)
+    return db_avatar
+
+
 def update_user_refresh_token(db: Session, user_id: int, refresh_token: str):
     """
     Updates the refresh token of an existing user.
@@ -220,7 +268,19 @@ def get_user_by_refresh_token(db: Session, refresh_token: str):
 
 
 # contact
-def get_contact(db: Session, contact_id: int, user_id: int):
+def _contact_query(db: Session, fields: Optional[Sequence[str]] = None):
+    """
+    Starts a contact query that loads only ``fields`` (plus the primary key) when given.
+
+    Unloaded columns raise on access instead of being lazy-loaded one row at a time.
+    """
+    query = db.query(database.ContactDB)
+    if fields:
+        query = query.options(load_only(*(getattr(database.ContactDB, name) for name in fields), raiseload=True))
+    return query
+
+
+def get_contact(db: Session, contact_id: int, user_id: int, fields: Optional[Sequence[str]] = None):
     """
     Retrieves a specific contact by its ID for a given user.
 
@@ -228,15 +288,16 @@ def get_contact(db: Session, contact_id: int, user_id: int):
         db (Session): The database session.
         contact_id (int): The ID of the contact to retrieve.
         user_id (int): The ID of the user who owns the contact.
+        fields (Optional[Sequence[str]], optional): Load only these columns. Defaults to None (all columns).
 
     Returns:
         Optional[database.ContactDB]: The contact database object if found, otherwise None.
     """
-    return db.query(database.ContactDB).filter(database.ContactDB.id == contact_id, database.ContactDB.user_id == user_id).first()
+    return _contact_query(db, fields).filter(database.ContactDB.id == contact_id, database.ContactDB.user_id == user_id).first()
 
 
 def get_contacts(db: Session, user_id: int, skip: int = 0, limit: int = 100, first_name: str = None,
-                 last_name: str = None, email: str = None):
+                 last_name: str = None, email: str = None, fields: Optional[Sequence[str]] = None):
     """
     Retrieves a list of contacts for a specific user with optional filtering.
 
@@ -248,11 +309,12 @@ def get_contacts(db: Session, user_id: int, skip: int = 0, limit: int = 100, fir
         first_name (Optional[str], optional): Filter contacts by first name (case-insensitive). Defaults to None.
         last_name (Optional[str], optional): Filter contacts by last name (case-insensitive). Defaults to None.
         email (Optional[str], optional): Filter contacts by email address (case-insensitive). Defaults to None.
+        fields (Optional[Sequence[str]], optional): Load only these columns. Defaults to None (all columns).
 
     Returns:
         List[database.ContactDB]: A list of contact database objects matching the criteria.
     """
-    query = db.query(database.ContactDB).filter(database.ContactDB.user_id == user_id)
+    query = _contact_query(db, fields).filter(database.ContactDB.user_id == user_id)
     if first_name:
         query = query.filter(database.ContactDB.first_name.ilike(f"%{first_name}%"))
     if last_name:
@@ -262,6 +324,30 @@ def get_contacts(db: Session, user_id: int, skip: int = 0, limit: int = 100, fir
     return query.offset(skip).limit(limit).all()
 
 
+def next_contact_version(db: Session, user_id: int) -> int:
+    """
+    Increments and returns the user's contact version within the current transaction.
+
+    The UPDATE locks the user row until commit, so concurrent writers of the same user
+    commit their versions in increasing order and delta sync never skips a change.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose contacts are changing.
+
+    Returns:
+        int: The version to stamp on every contact changed by the transaction.
+    """
+    statement = (
+        update(database.UserDB)
+        .where(database.UserDB.id == user_id)
+        .values(contact_version=database.UserDB.contact_version + 1)
+        .returning(database.UserDB.contact_version)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(statement).scalar_one()
+
+
 def create_contact(db: Session, contact: models.ContactCreate, user_id: int):
     """
     Creates a new contact for a specific user.
@@ -274,8 +360,10 @@ def create_contact(db: Session, contact: models.ContactCreate, user_id: int):
     Returns:
         database.ContactDB: The newly created contact database object.
     """
-    db_contact = database.ContactDB(**contact.model_dump(), user_id=user_id)
+    db_contact = database.ContactDB(**contact.model_dump(), user_id=user_id, version=next_contact_version(db, user_id))
     db.add(db_contact)
+    db.flush()
+    contact_events.record(db, user_id, contact_events.CREATED, [db_contact.id], db_contact.version)
     db.commit()
     db.refresh(db_contact)
     return db_contact
@@ -298,6 +386,9 @@ def update_contact(db: Session, contact_id: int, user_id: int, contact: models.C
     if db_contact:
         for key, value in contact.model_dump(exclude_unset=True).items():
             setattr(db_contact, key, value)
+        db_contact.updated_at = datetime.now(timezone.utc)
+        db_contact.version = next_contact_version(db, user_id)
+        contact_events.record(db, user_id, contact_events.UPDATED, [contact_id], db_contact.version)
         db.commit()
         db.refresh(db_contact)
     return db_contact
@@ -317,13 +408,272 @@ def delete_contact(db: Session, contact_id: int, user_id: int):
     """
     db_contact = db.query(database.ContactDB).filter(database.ContactDB.id == contact_id, database.ContactDB.user_id == user_id).first()
     if db_contact:
+        version = next_contact_version(db, user_id)
+        db.add(database.ContactTombstoneDB(contact_id=contact_id, user_id=user_id, version=version))
+        contact_events.record(db, user_id, contact_events.DELETED, [contact_id], version)
         db.delete(db_contact)
         db.commit()
         return True
     return False
 
 
-def get_upcoming_birthdays(db: Session, user_id: int):
+def get_contacts_by_ids(db: Session, user_id: int, ids: Sequence[int], fields: Optional[Sequence[str]] = None):
+    """
+    Retrieves the given contacts of a user in one query.
+
+    IDs that do not exist or belong to another user are skipped.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user who owns the contacts.
+        ids (Sequence[int]): The IDs of the contacts to retrieve.
+        fields (Optional[Sequence[str]], optional): Load only these columns. Defaults to None (all columns).
+
+    Returns:
+        List[database.ContactDB]: The contacts found, ordered by ID.
+    """
+    query = _contact_query(db, fields).filter(database.ContactDB.user_id == user_id, database.ContactDB.id.in_(ids))
+    return query.order_by(database.ContactDB.id).all()
+
+
+def _contacts_by_id(db: Session, ids: Sequence[int]) -> Dict[int, database.ContactDB]:
+    if not ids:
+        return {}
+    return {contact.id: contact for contact in db.scalars(select(database.ContactDB).where(database.ContactDB.id.in_(ids)))}
+
+
+def _batch_result(index: int, status: HTTPStatus, contact_id: Optional[int] = None, detail: Optional[str] = None,
+                  contact: Optional[database.ContactDB] = None) -> models.ContactBatchItemResult:
+    return models.ContactBatchItemResult(
+        index=index, id=contact_id, status=status, detail=detail,
+        contact=models.Contact.model_validate(contact) if contact is not None else None,
+    )
+
+
+def create_contacts(db: Session, contacts: Sequence[models.ContactCreate], user_id: int) -> List[models.ContactBatchItemResult]:
+    """
+    Creates several contacts for a user in one transaction.
+
+    Email addresses already used by a contact, or by an earlier item of the same batch,
+    are reported as conflicts; the other items are inserted with one multi-row INSERT.
+
+    Args:
+        db (Session): The database session.
+        contacts (Sequence[models.ContactCreate]): The contacts to create.
+        user_id (int): The ID of the user who owns the contacts.
+
+    Returns:
+        List[models.ContactBatchItemResult]: One result per contact, in request order.
+
+    Raises:
+        IntegrityError: If a concurrent transaction claimed one of the email addresses;
+            nothing is created in that case.
+    """
+    taken = set(db.scalars(select(database.ContactDB.email).where(database.ContactDB.email.in_({contact.email for contact in contacts}))))
+    rows, indexes, conflicts = [], [], []
+    for index, contact in enumerate(contacts):
+        if contact.email in taken:
+            conflicts.append(index)
+            continue
+        taken.add(contact.email)
+        rows.append({**contact.model_dump(), "user_id": user_id})
+        indexes.append(index)
+
+    ids_by_email = {}
+    if rows:
+        # RETURNING rows are matched back by the unique email: asking SQLAlchemy to keep
+        # parameter order would make some backends fall back to one INSERT per row.
+        try:
+            version = next_contact_version(db, user_id)
+            for row in rows:
+                row["version"] = version
+            ids_by_email = dict(db.execute(insert(database.ContactDB).returning(database.ContactDB.email, database.ContactDB.id), rows).all())
+            contact_events.record(db, user_id, contact_events.CREATED, [ids_by_email[row["email"]] for row in rows], version)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise
+    created = _contacts_by_id(db, list(ids_by_email.values()))
+
+    results = {index: _batch_result(index, HTTPStatus.CONFLICT, detail="Contact with this email already exists") for index in conflicts}
+    for index, row in zip(indexes, rows):
+        contact_id = ids_by_email[row["email"]]
+        results[index] = _batch_result(index, HTTPStatus.CREATED, contact_id, contact=created[contact_id])
+    return [results[index] for index in range(len(contacts))]
+
+
+def update_contacts(db: Session, items: Sequence[models.ContactBatchUpdateItem], user_id: int) -> List[models.ContactBatchItemResult]:
+    """
+    Applies several partial contact updates for a user in one transaction.
+
+    Ownership and email conflicts are checked with one query each; the updates themselves
+    are sent as a single executemany UPDATE by primary key.
+
+    Args:
+        db (Session): The database session.
+        items (Sequence[models.ContactBatchUpdateItem]): The contact IDs and the fields to change.
+        user_id (int): The ID of the user who owns the contacts.
+
+    Returns:
+        List[models.ContactBatchItemResult]: One result per item, in request order.
+
+    Raises:
+        IntegrityError: If a concurrent transaction claimed one of the email addresses;
+            nothing is updated in that case.
+    """
+    ids = [item.id for item in items]
+    owned = set(db.scalars(select(database.ContactDB.id).where(database.ContactDB.id.in_(ids), database.ContactDB.user_id == user_id)))
+    changes = {item.id: item.model_dump(exclude_unset=True, exclude={"id"}) for item in items}
+    emails = {values["email"] for contact_id, values in changes.items() if contact_id in owned and values.get("email")}
+    email_owners = dict(db.execute(select(database.ContactDB.email, database.ContactDB.id).where(database.ContactDB.email.in_(emails))).all()) if emails else {}
+
+    results, params, updated = {}, [], []
+    for index, item in enumerate(items):
+        values = changes[item.id]
+        if item.id not in owned:
+            results[index] = _batch_result(index, HTTPStatus.NOT_FOUND, item.id, detail="Contact not found")
+            continue
+        missing = sorted(name for name, value in values.items() if value is None and models.ContactCreate.model_fields[name].is_required())
+        if missing:
+            results[index] = _batch_result(index, HTTPStatus.UNPROCESSABLE_ENTITY, item.id, detail=f"Fields cannot be null: {', '.join(missing)}")
+            continue
+        email = values.get("email")
+        if email is not None and email_owners.setdefault(email, item.id) != item.id:
+            results[index] = _batch_result(index, HTTPStatus.CONFLICT, item.id, detail="Contact with this email already exists")
+            continue
+        if values:
+            params.append({"id": item.id, **values})
+        updated.append((index, item.id))
+
+    if params:
+        changed = {"version": next_contact_version(db, user_id), "updated_at": datetime.now(timezone.utc)}
+        try:
+            db.execute(update(database.ContactDB), [{**values, **changed} for values in params])
+            contact_events.record(db, user_id, contact_events.UPDATED, [values["id"] for values in params], changed["version"])
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise
+    contacts = _contacts_by_id(db, [contact_id for _, contact_id in updated])
+    for index, contact_id in updated:
+        results[index] = _batch_result(index, HTTPStatus.OK, contact_id, contact=contacts[contact_id])
+    return [results[index] for index in range(len(items))]
+
+
+def delete_contacts(db: Session, ids: Sequence[int], user_id: int) -> List[models.ContactBatchItemResult]:
+    """
+    Deletes several contacts of a user with one DELETE statement and records their tombstones.
+
+    Args:
+        db (Session): The database session.
+        ids (Sequence[int]): The IDs of the contacts to delete.
+        user_id (int): The ID of the user who owns the contacts.
+
+    Returns:
+        List[models.ContactBatchItemResult]: One result per ID, in request order.
+    """
+    deleted = set(db.scalars(
+        delete(database.ContactDB)
+        .where(database.ContactDB.id.in_(ids), database.ContactDB.user_id == user_id)
+        .returning(database.ContactDB.id)
+    ))
+    if deleted:
+        version = next_contact_version(db, user_id)
+        db.execute(insert(database.ContactTombstoneDB), [
+            {"contact_id": contact_id, "user_id": user_id, "version": version} for contact_id in sorted(deleted)
+        ])
+        contact_events.record(db, user_id, contact_events.DELETED, sorted(deleted), version)
+    db.commit()
+    return [
+        _batch_result(index, HTTPStatus.OK, contact_id) if contact_id in deleted
+        else _batch_result(index, HTTPStatus.NOT_FOUND, contact_id, detail="Contact not found")
+        for index, contact_id in enumerate(ids)
+    ]
+
+
+def get_contact_changes(db: Session, user_id: int, since: int, limit: int = 500, after: Optional[int] = None) -> models.ContactChanges:
+    """
+    Returns the contacts changed and deleted after the ``(since, after)`` position.
+
+    Changes are ordered by ``(version, contact id)`` and paged with that pair as a keyset
+    cursor, so every page holds at most ``limit`` rows even when one version (a batch request,
+    or contacts seeded or imported with version 0) is larger than a page. Both lookups are
+    range scans of the ``(user_id, version)`` indexes, so the cost depends on the number of
+    changes rather than the size of the address book.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID of the user whose contacts to sync.
+        since (int): The last version the client has seen, or 0 for a full sync.
+        limit (int, optional): The maximum number of changes to return. Defaults to 500.
+        after (Optional[int], optional): The ``after`` returned by the previous page: changes of
+            version ``since`` up to this contact ID were already returned. Defaults to None.
+
+    Returns:
+        models.ContactChanges: The changes, the ``since``/``after`` pair for the next call and
+            whether more changes are waiting.
+    """
+    current = db.scalar(select(database.UserDB.contact_version).where(database.UserDB.id == user_id)) or 0
+
+    def page(model, key):
+        query = select(model).where(model.user_id == user_id)
+        if after is not None:
+            query = query.where(model.version >= since, or_(model.version > since, key > after))
+        else:
+            # Contacts written directly (e.g. seeded or imported) keep version 0; a full sync includes them.
+            query = query.where(model.version > (since if since > 0 else -1))
+        return db.scalars(query.order_by(model.version, key).limit(limit + 1)).all()
+
+    contacts = page(database.ContactDB, database.ContactDB.id)
+    tombstones = page(database.ContactTombstoneDB, database.ContactTombstoneDB.contact_id)
+    rows = sorted(
+        [*contacts, *tombstones],
+        key=lambda row: (row.version, row.id if isinstance(row, database.ContactDB) else row.contact_id),
+    )
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+        last = rows[-1]
+        version, after = last.version, last.id if isinstance(last, database.ContactDB) else last.contact_id
+    else:
+        version, after = max(current, since), None
+
+    return models.ContactChanges(
+        version=version,
+        after=after,
+        changed=[models.Contact.model_validate(row) for row in rows if isinstance(row, database.ContactDB)],
+        deleted=[row.contact_id for row in rows if isinstance(row, database.ContactTombstoneDB)],
+        has_more=has_more,
+    )
+
+
+def upcoming_birthday_filter(today: date, days: int = 7):
+    """
+    Builds a SQL predicate matching contacts whose birthday falls within ``days`` days from ``today``.
+
+    The window is expanded into the (month, day) pairs it covers, so the check is a single
+    ``IN`` over ``month * 100 + day`` that the database evaluates in one pass, including across
+    the turn of the year. February 29th birthdays are treated as February 28th in non-leap years.
+
+    Args:
+        today (date): The first day of the window.
+        days (int, optional): The number of days after ``today`` included in the window. Defaults to 7.
+
+    Returns:
+        ColumnElement[bool]: The filter expression on ``database.ContactDB.birthday``.
+    """
+    month_days = set()
+    for offset in range(days + 1):
+        day = today + timedelta(days=offset)
+        month_days.add(day.month * 100 + day.day)
+        # Processing February 29 in a non-leap year
+        if day.month == 2 and day.day == 28 and not isleap(day.year):
+            month_days.add(229)
+    birthday = database.ContactDB.birthday
+    return (extract("month", birthday) * 100 + extract("day", birthday)).in_(sorted(month_days))
+
+
+def get_upcoming_birthdays(db: Session, user_id: int, today: Optional[date] = None):
     """
     Retrieves a list of contacts with birthdays in the next 7 days for a specific user.
 
@@ -332,39 +682,13 @@ def get_upcoming_birthdays(db: Session, user_id: int):
     Args:
         db (Session): The database session.
         user_id (int): The ID of the user whose contacts to check.
+        today (Optional[date], optional): The first day of the window. Defaults to the current date.
 
     Returns:
         List[database.ContactDB]: A list of contact database objects with upcoming birthdays.
     """
-    today = date.today()
-    next_week = today + timedelta(days=7)
-    upcoming_birthdays = []
-    contacts = db.query(database.ContactDB).filter(database.ContactDB.user_id == user_id).all()
-    for contact in contacts:
-        birthday_month = contact.birthday.month
-        birthday_day = contact.birthday.day
-
-        # Processing February 29 in a non-leap year
-        if birthday_month == 2 and birthday_day == 29 and not isleap(today.year):
-            birthday_this_year = date(today.year, 2, 28)
-        else:
-            try:
-                birthday_this_year = date(today.year, birthday_month, birthday_day)
-            except ValueError:
-                continue
-
-        if today <= birthday_this_year <= next_week:
-            upcoming_birthdays.append(contact)
-        else:
-            next_year = today.year + 1
-            if birthday_month == 2 and birthday_day == 29 and not isleap(next_year):
-                birthday_next_year = date(next_year, 2, 28)
-            else:
-                try:
-                    birthday_next_year = date(next_year, birthday_month, birthday_day)
-                except ValueError:
-                    continue
-
-            if today <= birthday_next_year <= next_week:
-                upcoming_birthdays.append(contact)
-    return upcoming_birthdays
+    today = today or date.today()
+    return db.query(database.ContactDB).filter(
+        database.ContactDB.user_id == user_id,
+        upcoming_birthday_filter(today),
+    ).all()
@@ -3,7 +3,7 @@
 import os
 
 from datetime import timezone, datetime
-from sqlalchemy import create_engine, Column, Integer, String, Date, Boolean, DateTime, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Text, Date, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from sqlalchemy.sql import func
@@ -31,9 +31,12 @@ class ContactDB(Base):
         birthday (date): The birthday of the contact.
         additional_data (Optional[str]): Additional information about the contact (nullable).
         user_id (int): Foreign key linking this contact to the user who owns it.
+        updated_at (datetime): The timestamp of the last change to the contact.
+        version (int): The owner's contact version at the last change (see ``UserDB.contact_version``).
         owner (UserDB): Relationship to the UserDB model representing the owner of the contact.
     """
     __tablename__ = "contacts"
+    __table_args__ = (Index("ix_contacts_user_id_version", "user_id", "version"),)
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, index=True, nullable=False)
@@ -43,6 +46,8 @@ class ContactDB(Base):
     birthday = Column(Date, nullable=False)
     additional_data = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    version = Column(Integer, default=0, nullable=False)
 
     owner = relationship("UserDB", back_populates="contacts")
 
@@ -60,6 +65,7 @@ class UserDB(Base):
         created_at (datetime): The timestamp when the user account was created (default: current UTC time).
         avatar_url (Optional[str]): The URL of the user's avatar image (nullable).
         role (str): The role of the user in the system (default: "user").
+        contact_version (int): Incremented by every transaction that changes the user's contacts (default: 0).
        contacts (List[ContactDB]): Relationship to the ContactDB model representing the contacts owned by this user.
     """
     __tablename__ = "users"
@@ -74,6 +80,7 @@ class UserDB(Base):
     avatar_url = Column(String, nullable=True)
     role = Column(String(50), default="user")
     refresh_token = Column(String, nullable=True)
+    contact_version = Column(Integer, default=0, nullable=False)
 
     contacts = relationship("ContactDB", back_populates="owner")
 
@@ -110,3 +117,82 @@ class PasswordResetTokenDB(Base):
     token = Column(String, unique=True, index=True)
     expires_at = Column(DateTime)
     created_at = Column(DateTime, default=func.now())
+
+
+class EmailOutboxDB(Base):
+    """
+    SQLAlchemy model representing an outgoing email waiting to be delivered.
+
+    Attributes:
+        id (int): The primary key and unique identifier for the message.
+        recipient (str): The email address of the recipient.
+        subject (str): The subject line.
+        body (str): The message body.
+        subtype (str): The body subtype, "html" or "plain" (default: "html").
+        status (str): "pending", "sending", "sent" or "failed" (default: "pending").
+        attempts (int): The number of delivery attempts made so far (default: 0).
+        next_attempt_at (datetime): The earliest time of the next delivery attempt.
+        last_error (Optional[str]): The error of the last failed attempt (nullable).
+        created_at (datetime): The timestamp when the message was queued.
+        sent_at (Optional[datetime]): The timestamp when the message was delivered (nullable).
+        dedup_key (Optional[str]): Identifies a message that must be queued at most once (unique, nullable).
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    subtype = Column(String(10), default="html", nullable=False)
+    status = Column(String(10), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime, nullable=True)
+    dedup_key = Column(String, nullable=True, unique=True)
+
+
+class AvatarDB(Base):
+    """
+    SQLAlchemy model mapping the content hash of a processed avatar to its stored URL.
+
+    Attributes:
+        id (int): The primary key and unique identifier for the avatar.
+        backend (str): The storage backend holding the image, e.g. "cloudinary" or "local".
+        content_hash (str): The SHA-256 hex digest of the processed image (unique per backend).
+        url (str): The URL of the stored image.
+        size_bytes (int): The size of the processed image in bytes.
+        created_at (datetime): The timestamp when the avatar was stored.
+    """
+    __tablename__ = "avatars"
+    __table_args__ = (Index("ix_avatars_backend_content_hash", "backend", "content_hash", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    backend = Column(String(32), nullable=False, default="cloudinary")
+    content_hash = Column(String(64), nullable=False)
+    url = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class ContactTombstoneDB(Base):
+    """
+    SQLAlchemy model recording a deleted contact, so delta sync clients learn about the deletion.
+
+    Attributes:
+        id (int): The primary key and unique identifier for the tombstone.
+        contact_id (int): The ID of the deleted contact.
+        user_id (int): Foreign key linking the tombstone to the user who owned the contact.
+        version (int): The owner's contact version of the deletion.
+        deleted_at (datetime): The timestamp when the contact was deleted.
+    """
+    __tablename__ = "contact_tombstones"
+    __table_args__ = (Index("ix_contact_tombstones_user_id_version", "user_id", "version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    contact_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
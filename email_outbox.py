@@ -0,0 +1,376 @@
+# email_outbox.py
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from email.utils import formataddr
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
+
+import aiosmtplib
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session
+
+import database, metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.environ.get("OUTBOX_POLL_INTERVAL_SECONDS", 1))
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 50))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_BASE_SECONDS", 5))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_MAX_SECONDS", 900))
+OUTBOX_LEASE_SECONDS = float(os.environ.get("OUTBOX_LEASE_SECONDS", 300))
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", 2))
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+sent_counter = metrics.Counter("email_outbox_sent_total", "Emails delivered from the outbox")
+failed_counter = metrics.Counter(
+    "email_outbox_failed_attempts_total", "Failed outbox delivery attempts", labelnames=("final",)
+)
+smtp_connections_counter = metrics.Counter("smtp_connections_opened_total", "SMTP connections opened by the pool")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_email(db: Session, recipient: str, subject: str, body: str, subtype: str = "html") -> database.EmailOutboxDB:
+    """
+    Queues an email for background delivery.
+
+    Args:
+        db (Session): The database session.
+        recipient (str): The recipient's email address.
+        subject (str): The subject line.
+        body (str): The message body.
+        subtype (str, optional): "html" or "plain". Defaults to "html".
+
+    Returns:
+        database.EmailOutboxDB: The queued message.
+    """
+    message = database.EmailOutboxDB(recipient=recipient, subject=subject, body=body, subtype=subtype, next_attempt_at=_now())
+    db.add(message)
+    db.commit()
+    db.refresh(message)
+    return message
+
+
+def enqueue_emails(db: Session, messages: List[dict]) -> int:
+    """
+    Queues many emails with a single multi-row insert.
+
+    Messages carrying a ``dedup_key`` that is already in the outbox are skipped, so a job
+    that is rerun after a partial failure does not send the same message twice.
+
+    Args:
+        db (Session): The database session.
+        messages (List[dict]): Messages with ``recipient``, ``subject``, ``body`` and optional ``subtype`` and ``dedup_key`` keys.
+
+    Returns:
+        int: The number of messages queued.
+    """
+    keys = [message["dedup_key"] for message in messages if message.get("dedup_key")]
+    if keys:
+        queued = set(db.scalars(select(database.EmailOutboxDB.dedup_key).where(database.EmailOutboxDB.dedup_key.in_(keys))))
+        messages = [message for message in messages if message.get("dedup_key") not in queued]
+    if not messages:
+        return 0
+    now = _now()
+    rows = [
+        dict(message, subtype=message.get("subtype", "html"), status=PENDING, attempts=0, next_attempt_at=now, created_at=now)
+        for message in messages
+    ]
+    db.execute(insert(database.EmailOutboxDB), rows)
+    db.commit()
+    return len(rows)
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """
+    Returns the exponential backoff delay after the given number of failed attempts.
+
+    Args:
+        attempts (int): The number of attempts made so far (at least 1).
+
+    Returns:
+        timedelta: ``OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1)``, capped at ``OUTBOX_BACKOFF_MAX_SECONDS``.
+    """
+    return timedelta(seconds=min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS))
+
+
+def claim_due_messages(db: Session, limit: int, now: Optional[datetime] = None) -> List[database.EmailOutboxDB]:
+    """
+    Claims up to ``limit`` messages that are due for delivery.
+
+    Claimed messages are moved to ``sending`` with a lease: if the worker dies before
+    recording the outcome, the message becomes claimable again once the lease expires.
+    On PostgreSQL, ``SKIP LOCKED`` lets several workers claim batches concurrently.
+
+    Args:
+        db (Session): The database session.
+        limit (int): The maximum number of messages to claim.
+        now (Optional[datetime]): The current time. Defaults to the current UTC time.
+
+    Returns:
+        List[database.EmailOutboxDB]: The claimed messages.
+    """
+    now = now or _now()
+    messages = (
+        db.query(database.EmailOutboxDB)
+        .filter(
+            or_(database.EmailOutboxDB.status == PENDING, database.EmailOutboxDB.status == SENDING),
+            database.EmailOutboxDB.next_attempt_at <= now,
+        )
+        .order_by(database.EmailOutboxDB.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for message in messages:
+        message.status = SENDING
+        message.next_attempt_at = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    db.commit()
+    return messages
+
+
+def record_result(db: Session, message: database.EmailOutboxDB, error: Optional[Exception], now: Optional[datetime] = None):
+    """
+    Records the outcome of a delivery attempt, scheduling a retry with backoff on failure.
+
+    Args:
+        db (Session): The database session.
+        message (database.EmailOutboxDB): The message that was attempted.
+        error (Optional[Exception]): The delivery error, or None if the message was sent.
+        now (Optional[datetime]): The current time. Defaults to the current UTC time.
+    """
+    now = now or _now()
+    message.attempts += 1
+    if error is None:
+        message.status = SENT
+        message.sent_at = now
+        message.last_error = None
+        sent_counter.inc()
+    elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+        message.status = FAILED
+        message.last_error = str(error)[:500]
+        failed_counter.inc(final="true")
+        logger.error("Giving up on outbox message %s after %d attempts: %s", message.id, message.attempts, error)
+    else:
+        message.status = PENDING
+        message.next_attempt_at = now + backoff_delay(message.attempts)
+        message.last_error = str(error)[:500]
+        failed_counter.inc(final="false")
+    db.commit()
+
+
+class SMTPConnectionPool:
+    """
+    A small pool of long-lived, authenticated SMTP connections.
+
+    Connections are opened lazily, reused across messages and dropped (then reopened on
+    demand) when the server disconnects or a send fails, so a burst of messages pays for
+    the TCP/TLS handshake and login once per pooled connection instead of once per message.
+    """
+
+    def __init__(self, conf, size: int = SMTP_POOL_SIZE):
+        self.conf = conf
+        self.size = size
+        self._idle: "asyncio.Queue[aiosmtplib.SMTP]" = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=self.conf.MAIL_SERVER,
+            port=self.conf.MAIL_PORT,
+            use_tls=self.conf.MAIL_SSL_TLS,
+            start_tls=self.conf.MAIL_STARTTLS,
+            validate_certs=self.conf.VALIDATE_CERTS,
+            timeout=self.conf.TIMEOUT,
+        )
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = self._new_client()
+        await client.connect()
+        if self.conf.USE_CREDENTIALS:
+            await client.login(self.conf.MAIL_USERNAME, self.conf.MAIL_PASSWORD.get_secret_value())
+        smtp_connections_counter.inc()
+        return client
+
+    def build_message(self, recipient: str, subject: str, body: str, subtype: str = "html") -> EmailMessage:
+        """
+        Builds a MIME message from the configured sender.
+        """
+        message = EmailMessage()
+        message["From"] = formataddr((self.conf.MAIL_FROM_NAME or "", str(self.conf.MAIL_FROM)))
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(body, subtype=subtype)
+        return message
+
+    async def send(self, message: EmailMessage):
+        """
+        Sends a message over a pooled connection, opening one if none is idle.
+
+        Raises:
+            aiosmtplib.SMTPException: If delivery fails; the connection is discarded.
+            OSError: If the server cannot be reached.
+        """
+        async with self._slots:
+            client = None
+            while not self._idle.empty():
+                candidate = self._idle.get_nowait()
+                if candidate.is_connected:
+                    client = candidate
+                    break
+            if client is None:
+                client = await self._connect()
+            try:
+                with tracing.span("smtp.send", tracing.SpanKind.CLIENT):
+                    await client.send_message(message)
+            except BaseException:
+                client.close()
+                raise
+            self._idle.put_nowait(client)
+
+    async def warm(self, count: int) -> int:
+        """
+        Opens up to ``count`` connections ahead of the first message.
+
+        Args:
+            count (int): The number of connections to open (capped at the pool size).
+
+        Returns:
+            int: The number of idle connections afterwards.
+
+        Raises:
+            aiosmtplib.SMTPException: If the server rejects the connection or login.
+            OSError: If the server cannot be reached.
+        """
+        while self._idle.qsize() < min(count, self.size):
+            self._idle.put_nowait(await self._connect())
+        return self._idle.qsize()
+
+    async def close(self):
+        """
+        Closes every idle connection.
+        """
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            try:
+                await client.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                client.close()
+
+
+class OutboxWorker:
+    """
+    Background task that drains the email outbox through an SMTP connection pool.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        session_factory: Callable[[], Session] = None,
+        poll_interval: float = OUTBOX_POLL_INTERVAL_SECONDS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+    ):
+        self.pool = pool
+        self.session_factory = session_factory or database.SessionLocal
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def _claim(self) -> List[tuple]:
+        db = self.session_factory()
+        try:
+            return [
+                (message.id, message.recipient, message.subject, message.body, message.subtype)
+                for message in claim_due_messages(db, self.batch_size)
+            ]
+        finally:
+            db.close()
+
+    def _record(self, message_id: int, error: Optional[Exception]):
+        db = self.session_factory()
+        try:
+            message = db.get(database.EmailOutboxDB, message_id)
+            if message is not None:
+                record_result(db, message, error)
+        finally:
+            db.close()
+
+    async def _deliver(self, message_id: int, recipient: str, subject: str, body: str, subtype: str):
+        try:
+            await self.pool.send(self.pool.build_message(recipient, subject, body, subtype))
+            error = None
+        except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as e:
+            logger.warning("Outbox delivery of message %s failed: %s", message_id, e)
+            error = e
+        await asyncio.to_thread(self._record, message_id, error)
+
+    async def run_once(self) -> int:
+        """
+        Claims one batch of due messages and delivers them concurrently.
+
+        Returns:
+            int: The number of messages attempted.
+        """
+        batch = await asyncio.to_thread(self._claim)
+        await asyncio.gather(*(self._deliver(*message) for message in batch))
+        return len(batch)
+
+    async def run(self):
+        """
+        Drains the outbox until stopped, sleeping between empty polls.
+        """
+        while not self._stopping.is_set():
+            try:
+                attempted = await self.run_once()
+            except Exception:
+                logger.exception("Outbox worker iteration failed")
+                attempted = 0
+            if attempted < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self):
+        self._stopping.clear()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+        await self.pool.close()
+
+
+@asynccontextmanager
+async def run_outbox_worker(conf) -> AsyncIterator[OutboxWorker]:
+    """
+    Runs the outbox worker for the duration of the context, e.g. the application lifespan.
+
+    Deployments where a separate process drains the outbox set ``OUTBOX_WORKER_ENABLED``
+    to false and do not enter this context.
+
+    Args:
+        conf (ConnectionConfig): The SMTP connection settings.
+
+    Yields:
+        OutboxWorker: The running worker.
+    """
+    worker = OutboxWorker(SMTPConnectionPool(conf))
+    worker.start()
+    try:
+        yield worker
+    finally:
+        await worker.stop()
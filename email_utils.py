@@ -5,46 +5,121 @@ from typing import Dict
 from sqlalchemy.orm import Session
 
 from fastapi import FastAPI
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
 from jose import JWTError, jwt
 
-import crud
+import crud, email_outbox, tracing
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=os.environ.get("MAIL_USERNAME"),
-    MAIL_PASSWORD=os.environ.get("MAIL_PASSWORD"),
-    MAIL_SERVER=os.environ.get("MAIL_SERVER"),
-    MAIL_PORT=int(os.environ.get("MAIL_PORT")),
-    MAIL_FROM=os.environ.get("MAIL_FROM"),
-    MAIL_FROM_NAME="FastAPI Mailer",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
-)
+# fastapi_mail (and the template engine it pulls in) is only imported when mail is
+# actually configured or sent, which keeps it out of every worker's import path.
+_FASTAPI_MAIL_NAMES = ("FastMail", "MessageSchema", "ConnectionConfig")
+
+
+def __getattr__(name: str):
+    if name in _FASTAPI_MAIL_NAMES:
+        import fastapi_mail
+        return getattr(fastapi_mail, name)
+    if name == "conf":
+        return get_conf()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_conf = None
+_mail = None
+
+
+def get_conf():
+    """
+    Returns the SMTP connection settings, reading them from the environment on first use.
+
+    Returns:
+        ConnectionConfig: The settings shared by ``get_mail`` and the outbox worker.
+    """
+    global _conf
+    if _conf is None:
+        from fastapi_mail import ConnectionConfig
+        _conf = ConnectionConfig(
+            MAIL_USERNAME=os.environ.get("MAIL_USERNAME"),
+            MAIL_PASSWORD=os.environ.get("MAIL_PASSWORD"),
+            MAIL_SERVER=os.environ.get("MAIL_SERVER"),
+            MAIL_PORT=int(os.environ.get("MAIL_PORT")),
+            MAIL_FROM=os.environ.get("MAIL_FROM"),
+            MAIL_FROM_NAME="FastAPI Mailer",
+            MAIL_STARTTLS=os.environ.get("MAIL_STARTTLS", "false").lower() == "true",
+            MAIL_SSL_TLS=os.environ.get("MAIL_SSL_TLS", "true").lower() == "true",
+            USE_CREDENTIALS=True,
+            VALIDATE_CERTS=os.environ.get("MAIL_VALIDATE_CERTS", "true").lower() == "true",
+        )
+    return _conf
+
+
+def get_mail():
+    """
+    Returns the shared FastMail instance, creating it on first use.
+
+    Returns:
+        FastMail: The mailer configured with ``get_conf()``.
+    """
+    global _mail
+    if _mail is None:
+        from fastapi_mail import FastMail
+        _mail = FastMail(get_conf())
+    return _mail
+
+
+def verification_email_body(token: str) -> str:
+    """
+    Builds the body of the verification email.
+
+    Args:
+        token (str): The verification token to include in the email link.
+
+    Returns:
+        str: The email body.
+    """
+    return f"""
+        Please click the following link to verify your email:
+        http://localhost:8000/verify-email?token={token}
+        """
 
 
 async def send_verification_email(email: str, token: str, app: FastAPI):
     """
-    Sends a verification email to the specified email address.
+    Sends a verification email to the specified email address immediately.
+
+    Request handlers should prefer ``queue_verification_email``, which returns without
+    waiting for SMTP.
 
     Args:
         email (str): The recipient's email address.
         token (str): The verification token to include in the email link.
         app (FastAPI): The FastAPI application instance.
     """
+    from fastapi_mail import MessageSchema
+
     message = MessageSchema(
         subject="Verify your email",
         recipients=[email],
-        body=f"""
-        Please click the following link to verify your email:
-        http://localhost:8000/verify-email?token={token}
-        """,
+        body=verification_email_body(token),
         subtype="html"
     )
 
-    fm = FastMail(conf)
-    await fm.send_message(message)
+    with tracing.span("smtp.send", tracing.SpanKind.CLIENT):
+        await get_mail().send_message(message)
+
+
+def queue_verification_email(db: Session, email: str, token: str):
+    """
+    Queues a verification email in the outbox for background delivery.
+
+    Args:
+        db (Session): The database session.
+        email (str): The recipient's email address.
+        token (str): The verification token to include in the email link.
+
+    Returns:
+        database.EmailOutboxDB: The queued message.
+    """
+    return email_outbox.enqueue_email(db, email, "Verify your email", verification_email_body(token))
 
 
 def generate_verification_token(email: str):
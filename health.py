@@ -0,0 +1,182 @@
+# health.py
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional
+
+from fastapi import APIRouter, FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import text
+
+import auth, crud, database, metrics, models, redis_utils
+
+logger = logging.getLogger(__name__)
+
+WARMUP_DB_CONNECTIONS = int(os.environ.get("WARMUP_DB_CONNECTIONS", 5))
+WARMUP_SMTP_CONNECTIONS = int(os.environ.get("WARMUP_SMTP_CONNECTIONS", 1))
+WARMUP_STEP_TIMEOUT_SECONDS = float(os.environ.get("WARMUP_STEP_TIMEOUT_SECONDS", 10))
+WARMUP_IN_BACKGROUND = os.environ.get("WARMUP_IN_BACKGROUND", "false").lower() == "true"
+
+OK = "ok"
+FAILED = "failed"
+BEST_EFFORT_STEPS = frozenset({"smtp"})
+
+warmup_seconds_gauge = metrics.Gauge("warmup_duration_seconds", "Time the last warm-up of this worker took")
+warmup_failures_counter = metrics.Counter("warmup_failures_total", "Warm-up steps that failed", labelnames=("step",))
+
+
+@dataclass
+class WarmupState:
+    """
+    Progress of a worker's warm-up, shown by the readiness endpoint.
+
+    Attributes:
+        ready (bool): Whether the warm-up has finished.
+        steps (Dict[str, str]): The outcome of each step (``"ok"`` or ``"failed: <reason>"``).
+        duration_seconds (Optional[float]): How long the warm-up took, once finished.
+        failed_required (Dict[str, Callable]): Required steps that failed, retried by the readiness endpoint.
+    """
+    ready: bool = False
+    steps: Dict[str, str] = field(default_factory=dict)
+    duration_seconds: Optional[float] = None
+    failed_required: Dict[str, Callable[[], Awaitable]] = field(default_factory=dict, repr=False)
+
+
+def warm_database(engine, connections: int = WARMUP_DB_CONNECTIONS) -> int:
+    """
+    Opens ``connections`` pooled connections at once and returns them to the pool, so the
+    first requests do not pay for connection setup (TCP, TLS, authentication).
+
+    Args:
+        engine (Engine): The SQLAlchemy engine.
+        connections (int): The number of connections to open.
+
+    Returns:
+        int: The number of connections opened.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+def warm_password_hashing(*contexts) -> None:
+    """
+    Loads and self-tests the passlib hash backends (bcrypt) of the given contexts.
+    """
+    for context in contexts:
+        context.hash("warm-up")
+
+
+def warm_models(app: FastAPI) -> None:
+    """
+    Finishes building the pydantic models and the OpenAPI schema ahead of the first request.
+    """
+    for model in vars(models).values():
+        if isinstance(model, type) and issubclass(model, BaseModel) and model.__module__ == models.__name__ \
+                and not model.__pydantic_complete__:
+            model.model_rebuild()
+    app.openapi()
+
+
+async def _run_step(state: WarmupState, name: str, step: Callable[[], Awaitable], timeout: float):
+    try:
+        await asyncio.wait_for(step(), timeout=timeout)
+        state.steps[name] = OK
+        state.failed_required.pop(name, None)
+    except Exception as e:
+        warmup_failures_counter.inc(step=name)
+        state.steps[name] = f"{FAILED}: {e.__class__.__name__}"
+        if name not in BEST_EFFORT_STEPS:
+            state.failed_required[name] = step
+        logger.warning("Warm-up step %s failed: %r", name, e)
+
+
+async def warm_up(app: FastAPI, state: WarmupState, smtp_pool=None, timeout: float = WARMUP_STEP_TIMEOUT_SECONDS):
+    """
+    Runs every warm-up step and marks the warm-up finished.
+
+    A failed step is logged, counted and shown by the readiness endpoint. Failed required
+    steps (all but ``BEST_EFFORT_STEPS``) keep the worker out of service until a readiness
+    check retries them successfully; a worker without SMTP can still serve requests, since
+    the outbox delivers mail later.
+
+    Args:
+        app (FastAPI): The application whose models and schema to build.
+        state (WarmupState): Updated with the outcome of each step.
+        smtp_pool (Optional[SMTPConnectionPool]): The outbox worker's pool, if it runs here.
+        timeout (float): Seconds allowed per step.
+    """
+    async def ping_redis():
+        if not await asyncio.to_thread(redis_utils.ping, redis_utils.redis_client):
+            raise ConnectionError("Redis did not answer")
+
+    steps = {
+        "database": lambda: asyncio.to_thread(warm_database, database.engine),
+        "redis": ping_redis,
+        "password_hashing": lambda: asyncio.to_thread(warm_password_hashing, crud.pwd_context, auth.pwd_context),
+        "models": lambda: asyncio.to_thread(warm_models, app),
+    }
+    if smtp_pool is not None and WARMUP_SMTP_CONNECTIONS > 0:
+        steps["smtp"] = lambda: smtp_pool.warm(WARMUP_SMTP_CONNECTIONS)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_run_step(state, name, step, timeout) for name, step in steps.items()))
+    state.duration_seconds = time.perf_counter() - started
+    warmup_seconds_gauge.set(state.duration_seconds)
+    state.ready = True
+    logger.info("Warm-up finished in %.2fs: %s", state.duration_seconds, state.steps)
+
+
+async def close_pools():
+    """
+    Closes the database and Redis connection pools on shutdown.
+    """
+    await asyncio.to_thread(database.engine.dispose)
+    try:
+        await asyncio.to_thread(redis_utils.redis_client.close)
+    except Exception as e:
+        logger.warning("Closing the Redis client failed: %r", e)
+
+
+router = APIRouter()
+
+
+@router.get("/health/live", include_in_schema=False)
+async def liveness():
+    """
+    Reports that the process is running.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/health/ready", include_in_schema=False)
+async def readiness(request: Request):
+    """
+    Reports whether this worker has finished warming up and its required steps succeeded.
+
+    Required steps that failed are retried first, so a worker rejoins the load balancer once
+    e.g. the database is reachable again.
+
+    Returns:
+        JSONResponse: 200 with the outcome of each step once ready, 503 while warming up or
+            while a required step is failing.
+    """
+    state: WarmupState = getattr(request.app.state, "warmup", None) or WarmupState(ready=True)
+    if state.ready and state.failed_required:
+        await asyncio.gather(*(
+            _run_step(state, name, step, WARMUP_STEP_TIMEOUT_SECONDS) for name, step in list(state.failed_required.items())
+        ))
+    status_name = "warming_up" if not state.ready else "failing" if state.failed_required else "ready"
+    body = {"status": status_name, "steps": state.steps, "duration_seconds": state.duration_seconds}
+    return JSONResponse(body, status_code=status.HTTP_200_OK if status_name == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,160 @@
+# loop_monitor.py
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from contextlib import asynccontextmanager, suppress
+from typing import Dict, Optional
+
+from fastapi import FastAPI
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.environ.get("LOOP_MONITOR_INTERVAL_SECONDS", 0.05))
+LOOP_MONITOR_THRESHOLD_SECONDS = float(os.environ.get("LOOP_MONITOR_THRESHOLD_SECONDS", 0.1))
+LOOP_MONITOR_STACK_DEPTH = int(os.environ.get("LOOP_MONITOR_STACK_DEPTH", 30))
+
+lag_histogram = metrics.Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a timer it was due to run",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+blocked_counter = metrics.Counter(
+    "event_loop_blocked_total", "Stalls of the event loop longer than the monitor threshold", labelnames=("route",),
+)
+
+
+class LoopMonitor:
+    """
+    Watches the event loop for callbacks that block it.
+
+    A heartbeat task sleeps ``interval`` seconds at a time and records how late it wakes
+    up in ``event_loop_lag_seconds``. A watchdog thread checks the heartbeat; when it has
+    not run for ``threshold`` seconds past its due time, something holds the loop (sync
+    SQLAlchemy or Redis calls, bcrypt, an upload in an ``async def`` handler), and the
+    watchdog logs the loop thread's current stack and the route of the request whose task
+    is running, once per stall. Requests are tied to their tasks by
+    ``LoopMonitorMiddleware``.
+
+    Unlike asyncio debug mode (``slow_callback_duration``), the loop itself is not
+    instrumented, so the monitor is cheap enough to leave on in production, and the stack
+    is taken while the callback still blocks rather than after it returned.
+
+    Args:
+        interval (float): Seconds between heartbeats.
+        threshold (float): Seconds of delay after which the loop counts as blocked.
+        stack_depth (int): Innermost frames of the stack to log.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_SECONDS, threshold: float = LOOP_MONITOR_THRESHOLD_SECONDS,
+                 stack_depth: int = LOOP_MONITOR_STACK_DEPTH):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        self.requests: Dict[asyncio.Task, dict] = {}
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+
+    def route_of(self, task: Optional[asyncio.Task]) -> tuple:
+        """
+        Returns the route template and the request description of the request a task serves.
+
+        The template (``"<unmatched>"`` before routing) is used as the metric label; tasks
+        serving no request are reported as ``"<background>"``.
+        """
+        scope = self.requests.get(task) if task is not None else None
+        if scope is None:
+            name = task.get_name() if task is not None else "no task"
+            return "<background>", f"<background: {name}>"
+        route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+        return route, f"{scope['method']} {scope['path']} (route {route})"
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_histogram.observe(max(loop.time() - due, 0.0))
+            self._last_beat = time.monotonic()
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int):
+        reported = None
+        while not self._stop.wait(min(self.interval, self.threshold) / 2):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=self.stack_depth)) if frame is not None else ""
+            label, description = self.route_of(asyncio.current_task(loop))
+            blocked_counter.inc(route=label)
+            logger.warning("Event loop blocked for at least %.0f ms by %s, at:\n%s", blocked * 1000, description, stack)
+
+    @asynccontextmanager
+    async def run(self):
+        """
+        Runs the heartbeat task and the watchdog thread on the current event loop.
+        """
+        self._stop.clear()
+        self._last_beat = time.monotonic()
+        heartbeat = asyncio.create_task(self._heartbeat(), name="loop-monitor-heartbeat")
+        watchdog = threading.Thread(
+            target=self._watch, args=(asyncio.get_running_loop(), threading.get_ident()), name="loop-monitor", daemon=True,
+        )
+        watchdog.start()
+        try:
+            yield self
+        finally:
+            self._stop.set()
+            heartbeat.cancel()
+            with suppress(asyncio.CancelledError):
+                await heartbeat
+            await asyncio.to_thread(watchdog.join, 5)
+
+
+class LoopMonitorMiddleware:
+    """
+    ASGI middleware registering the task serving each HTTP request with a ``LoopMonitor``.
+
+    Args:
+        app: The wrapped ASGI application.
+        monitor (LoopMonitor): The monitor reporting stalls.
+    """
+
+    def __init__(self, app, monitor: LoopMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        self.monitor.requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.requests.pop(task, None)
+
+
+def enable_loop_monitor(app: FastAPI, monitor: Optional[LoopMonitor] = None) -> LoopMonitor:
+    """
+    Adds ``LoopMonitorMiddleware`` to the application.
+
+    Args:
+        app (FastAPI): The FastAPI application instance.
+        monitor (Optional[LoopMonitor]): The monitor. Defaults to one with the ``LOOP_MONITOR_*`` settings.
+
+    Returns:
+        LoopMonitor: The monitor, which the caller runs for the lifetime of the application.
+    """
+    monitor = monitor or LoopMonitor()
+    app.add_middleware(LoopMonitorMiddleware, monitor=monitor)
+    return monitor
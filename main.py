@@ -1,29 +1,28 @@
 # main.py
 
-from typing import List
+import asyncio
+from contextlib import AsyncExitStack, aclosing, asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
-from fastapi import Depends, FastAPI, HTTPException, status, Request, Response, UploadFile, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, status, Request, Response, UploadFile, Form, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi.middleware import Middleware
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi_mail import FastMail, MessageSchema
 
 from datetime import timedelta, timezone, datetime
-from redis_utils import get_redis, redis_client
+from redis_utils import get_redis, redis_client, cache_setex, user_cache_key
+from settings import Settings
 
 import os
 import redis
-import crud, models, database, auth, email_utils, rate_limit, cors, cloudinary_utils
+import crud, models, database, auth, email_utils, email_outbox, birthday_reminders, rate_limit, cors, cloudinary_utils, avatar_processing, avatar_storage, metrics, serialization, contact_events, compression, health, request_trace, loop_monitor, profiling, tracing, server_timing, admission
 
-database.Base.metadata.create_all(bind=database.engine)
-
-app = FastAPI()
-cors.enable_cors(app)
-rate_limit.init_rate_limit(app)
-
-mail = FastMail(email_utils.conf)
+router = APIRouter()
 
 
 # Dependency for getting a database session
@@ -43,7 +42,7 @@ def get_db():
 
 # registration
 # Endpoint for new user registration
-@app.post("/register", response_model=models.UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/register", response_model=models.UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(user: models.UserCreate, db: Session = Depends(get_db)):
     """
     Registers a new user in the system.
@@ -66,7 +65,7 @@ async def register_user(user: models.UserCreate, db: Session = Depends(get_db)):
 
 # login
 # Endpoint for user login and obtaining JWT token
-@app.post("/login", response_model=models.TokenPair)
+@router.post("/login", response_model=models.TokenPair)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
@@ -104,13 +103,13 @@ async def login_for_access_token(
     cached_user = models.CachedUser.model_validate(user_db)
 
     # Cache the user after a successful login
-    redis.setex(f"user:{cached_user.id}", auth.USER_CACHE_EXPIRE_SECONDS, cached_user.model_dump_json())
+    cache_setex(redis, user_cache_key(cached_user.id), auth.USER_CACHE_EXPIRE_SECONDS, cached_user.model_dump_json())
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 # Endpoint for refreshing access token
-@app.post("/refresh-token", response_model=models.Token)
+@router.post("/refresh-token", response_model=models.Token)
 async def refresh_access_token(refresh_token: str = Form(...), db: Session = Depends(get_db)):
     """
     Refreshes the access token using the provided refresh token.
@@ -139,7 +138,7 @@ async def refresh_access_token(refresh_token: str = Form(...), db: Session = Dep
 
 # admin
 # Endpoint for creating a new administrator (accessible only to other administrators)
-@app.post(
+@router.post(
         "/admin/create-admin",
         response_model=models.UserResponse,
         status_code=status.HTTP_201_CREATED,
@@ -171,7 +170,7 @@ async def create_admin(
 
 
 # Endpoint for updating user avatar (available only to administrators)
-@app.post("/users/me/avatar", response_model=models.UserResponse, dependencies=[Depends(auth.get_current_active_user), Depends(auth.get_current_active_admin)])
+@router.post("/users/me/avatar", response_model=models.UserResponse, dependencies=[Depends(auth.get_current_active_user), Depends(auth.get_current_active_admin)])
 async def update_user_avatar(file: str = Form(...), current_admin: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)): # Зверніть увагу на зміну current_admin на current_user
     """
     Updates the current admin avatar (only available to admins).
@@ -185,11 +184,33 @@ async def update_user_avatar(file: str = Form(...), current_admin: models.User =
         models.UserResponse: Updated admin information.
 
     Raises:
-        HTTPException: In case of an error uploading to Cloudinary or updating the database (status code 500).
+        HTTPException: If the file is not a valid image (status code 400), or in case of an error
+            uploading to Cloudinary or updating the database (status code 500).
+    """
+    try:
+        avatar_url = await avatar_processing.store_avatar(db, avatar_processing.decode_base64_image(file))
+    except avatar_processing.InvalidAvatarImage as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return save_avatar_url(db, current_admin.id, avatar_url)
+
+
+def save_avatar_url(db: Session, user_id: int, avatar_url: Optional[str]) -> models.UserResponse:
+    """
+    Stores an uploaded avatar URL for a user.
+
+    Args:
+        db (Session): Database session.
+        user_id (int): The ID of the user.
+        avatar_url (Optional[str]): The uploaded avatar URL, or None if the upload failed.
+
+    Returns:
+        models.UserResponse: Updated user information.
+
+    Raises:
+        HTTPException: If the upload failed or the database update failed (status code 500).
     """
-    avatar_url = await cloudinary_utils.upload_avatar(file)
     if avatar_url:
-        updated_user_db = crud.update_user_avatar(db=db, user_id=current_admin.id, avatar_url=avatar_url)
+        updated_user_db = crud.update_user_avatar(db=db, user_id=user_id, avatar_url=avatar_url)
         if updated_user_db:
             # Convert database.UserDB to schemas.UserResponse before returning
             return models.UserResponse.model_validate(updated_user_db)
@@ -199,12 +220,110 @@ async def update_user_avatar(file: str = Form(...), current_admin: models.User =
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to upload avatar to Cloudinary")
 
 
+# Room for the multipart boundaries and part headers around the avatar file
+AVATAR_MULTIPART_OVERHEAD = 16 * 1024
+
+AVATAR_UPLOAD_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+async def capped_body(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """
+    Yields the request body, aborting with 413 as soon as more than ``limit`` bytes arrive.
+
+    Chunked requests carry no ``Content-Length`` to check up front, so the cap is enforced while reading.
+    """
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Avatar file is too large")
+        yield chunk
+
+
+async def read_upload(file: StarletteUploadFile, limit: int, chunk_size: int = 64 * 1024) -> bytes:
+    """
+    Reads an uploaded file in chunks, aborting with 413 once it exceeds ``limit`` bytes.
+    """
+    data = bytearray()
+    while chunk := await file.read(chunk_size):
+        data += chunk
+        if len(data) > limit:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Avatar file is too large")
+    return bytes(data)
+
+
+# Endpoint for uploading the avatar as a multipart file (available only to administrators)
+@router.post("/users/me/avatar/upload", response_model=models.UserResponse, openapi_extra=AVATAR_UPLOAD_SCHEMA, dependencies=[Depends(auth.get_current_active_user), Depends(auth.get_current_active_admin)])
+async def upload_user_avatar(request: Request, current_admin: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
+    """
+    Updates the current admin avatar from a multipart file upload (only available to admins).
+
+    Unlike ``/users/me/avatar``, the image is not base64 encoded: the multipart parser
+    streams it into a spooled temporary file (kept in memory up to 1 MB, then on disk).
+    Requests whose declared size exceeds ``AVATAR_MAX_BYTES`` are rejected before the body
+    is read, and the body is cut off as soon as it grows past the limit, so chunked
+    requests cannot stream an unbounded file either. The capped file is then resized,
+    deduplicated and uploaded by ``avatar_processing``.
+
+    Args:
+        request (Request): The incoming multipart request with a ``file`` part.
+        current_admin (models.User): The current admin executing the request.
+        db (Session, optional): Database session. Defaults to Depends(get_db).
+
+    Returns:
+        models.UserResponse: Updated admin information.
+
+    Raises:
+        HTTPException: If the file is missing (status code 422), too large (status code 413),
+            not an image (status code 415 or 400), or the upload or database update fails (status code 500).
+    """
+    max_body = cloudinary_utils.AVATAR_MAX_BYTES + AVATAR_MULTIPART_OVERHEAD
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Avatar file is too large")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Missing avatar file")
+
+    try:
+        async with aclosing(capped_body(request, max_body)) as body:
+            form = await MultiPartParser(request.headers, body, max_files=1, max_fields=0).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    try:
+        file = form.get("file")
+        if not isinstance(file, StarletteUploadFile):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Missing avatar file")
+        if file.size is not None and file.size > cloudinary_utils.AVATAR_MAX_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Avatar file is too large")
+        if not (file.content_type or "").startswith("image/"):
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Avatar must be an image")
+        avatar_url = await avatar_processing.store_avatar(db, await read_upload(file, cloudinary_utils.AVATAR_MAX_BYTES))
+    except avatar_processing.InvalidAvatarImage as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        await form.close()
+    return save_avatar_url(db, current_admin.id, avatar_url)
+
+
 # Endpoint for updating user roles (available only to administrators)
 class UserRoleUpdate(models.BaseModel):
     """Model for updating user role."""
     role: str
 
-@app.put("/users/{user_id}/role", response_model=models.UserResponse, dependencies=[Depends(auth.get_current_active_admin)])
+@router.put("/users/{user_id}/role", response_model=models.UserResponse, dependencies=[Depends(auth.get_current_active_admin)])
 async def update_user_role(user_id: int, role_update: UserRoleUpdate, db: Session = Depends(get_db)):
     """
     Updates the role of the specified user (only available to administrators).
@@ -230,24 +349,28 @@ async def update_user_role(user_id: int, role_update: UserRoleUpdate, db: Sessio
 
 
 # Endpoint for getting a list of all users (available only to administrators)
-@app.get("/users", response_model=List[models.UserResponse], dependencies=[Depends(auth.get_current_active_admin)])
-async def get_all_users(db: Session = Depends(get_db)):
+@router.get("/users", response_model=List[models.UserResponse], dependencies=[Depends(auth.get_current_active_admin)])
+async def get_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Returns a list of all registered users (only available to administrators).
 
     Args:
+        skip (int, optional): The number of users to skip. Defaults to 0.
+        limit (int, optional): The maximum number of users to return. Defaults to 100.
         db (Session, optional): Database session. Defaults to Depends(get_db).
 
     Returns:
         List[models.UserResponse]: List of information about all users.
     """
-    users = crud.get_users(db)
+    users = crud.get_users(db, skip=skip, limit=limit)
+    if serialization.JSON_FAST_PATH_ENABLED:
+        return serialization.trusted_rows_response(users, models.UserResponse)
     return users
 
 
 # user
 # Endpoint for obtaining information about the current user
-@app.get("/users/me", response_model=models.UserResponse, dependencies=[Depends(auth.get_current_active_user), Depends(rate_limit.limit_user_me)])
+@router.get("/users/me", response_model=models.UserResponse, dependencies=[Depends(auth.get_current_active_user), Depends(rate_limit.limit_user_me)])
 async def get_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
     """
     Returns information about the currently authenticated user.
@@ -263,14 +386,17 @@ async def get_users_me(current_user: models.User = Depends(auth.get_current_acti
 
 # verification email
 # Endpoint for sending email verification email
-@app.post("/send-verification-email", status_code=status.HTTP_202_ACCEPTED)
+@router.post("/send-verification-email", status_code=status.HTTP_202_ACCEPTED)
 async def send_verification(
     request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """
-    Sends an email with a verification link to the current user's email address.
+    Queues an email with a verification link to the current user's email address.
+
+    The email is delivered by the background outbox worker, so the response does not
+    wait for SMTP.
 
     Args:
         request (Request): FastAPI request object.
@@ -281,12 +407,12 @@ async def send_verification(
         dict: The message that the email was sent.
     """
     token = email_utils.generate_verification_token(current_user.email)
-    await email_utils.send_verification_email(current_user.email, token, app)
+    email_utils.queue_verification_email(db, current_user.email, token)
     return {"message": "Verification email sent"}
 
 
 # Token-based email verification endpoint
-@app.get("/verify-email", status_code=status.HTTP_200_OK)
+@router.get("/verify-email", status_code=status.HTTP_200_OK)
 async def verify_email(token: str, db: Session = Depends(get_db)):
     """
     Verify the user's email using the provided token.
@@ -309,7 +435,7 @@ async def verify_email(token: str, db: Session = Depends(get_db)):
 
 # contacts
 # Endpoints for contacts (requires authentication)
-@app.post("/contacts", response_model=models.Contact, status_code=status.HTTP_201_CREATED, dependencies=[Depends(auth.get_current_active_user)])
+@router.post("/contacts", response_model=models.Contact, status_code=status.HTTP_201_CREATED, dependencies=[Depends(auth.get_current_active_user)])
 async def create_contact(contact: models.ContactCreate, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
     """
     Creates a new contact for the current user.
@@ -325,50 +451,212 @@ async def create_contact(contact: models.ContactCreate, current_user: models.Use
     return crud.create_contact(db=db, contact=contact, user_id=current_user.id)
 
 
-@app.get("/contacts", response_model=List[models.Contact], dependencies=[Depends(auth.get_current_active_user)])
-async def read_contacts(skip: int = 0, limit: int = 100, first_name: str = None, last_name: str = None, email: str = None, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
+@router.post("/contacts/batch", response_model=models.ContactBatchResponse, dependencies=[Depends(auth.get_current_active_user)])
+async def create_contacts_batch(batch: models.ContactBatchCreate, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
+    """
+    Creates several contacts for the current user in one transaction.
+
+    Args:
+        batch (models.ContactBatchCreate): The contacts to create, at most ``CONTACT_BATCH_MAX_ITEMS``.
+        current_user (models.User): The current authenticated user.
+        db (Session, optional): Database session. Defaults to Depends(get_db).
+
+    Returns:
+        models.ContactBatchResponse: One result per contact: 201 with the created contact, or 409
+            if the email address is already in use.
+
+    Raises:
+        HTTPException: If a concurrent request claimed one of the email addresses (status code 409).
+    """
+    try:
+        results = crud.create_contacts(db, batch.items, user_id=current_user.id)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Batch conflicts with a concurrent change, nothing was created")
+    return models.ContactBatchResponse(results=results)
+
+
+@router.patch("/contacts/batch", response_model=models.ContactBatchResponse, dependencies=[Depends(auth.get_current_active_user)])
+async def update_contacts_batch(batch: models.ContactBatchUpdate, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
+    """
+    Applies several partial contact updates for the current user in one transaction.
+
+    Args:
+        batch (models.ContactBatchUpdate): The contact IDs and fields to change, at most ``CONTACT_BATCH_MAX_ITEMS``.
+        current_user (models.User): The current authenticated user.
+        db (Session, optional): Database session. Defaults to Depends(get_db).
+
+    Returns:
+        models.ContactBatchResponse: One result per item: 200 with the updated contact, 404 if the
+            contact is not found, 409 if the email address is in use or 422 if a required field is null.
+
+    Raises:
+        HTTPException: If a concurrent request claimed one of the email addresses (status code 409).
+    """
+    try:
+        results = crud.update_contacts(db, batch.items, user_id=current_user.id)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Batch conflicts with a concurrent change, nothing was updated")
+    return models.ContactBatchResponse(results=results)
+
+
+@router.delete("/contacts/batch", response_model=models.ContactBatchResponse, dependencies=[Depends(auth.get_current_active_user)])
+async def delete_contacts_batch(batch: models.ContactBatchDelete, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
+    """
+    Deletes several contacts of the current user with one statement.
+
+    Args:
+        batch (models.ContactBatchDelete): The IDs of the contacts to delete, at most ``CONTACT_BATCH_MAX_ITEMS``.
+        current_user (models.User): The current authenticated user.
+        db (Session, optional): Database session. Defaults to Depends(get_db).
+
+    Returns:
+        models.ContactBatchResponse: One result per ID: 200 if deleted, 404 if not found.
+    """
+    return models.ContactBatchResponse(results=crud.delete_contacts(db, batch.ids, user_id=current_user.id))
+
+
+def contact_ids(ids: Optional[str] = Query(None, description="Comma-separated contact IDs to fetch, e.g. 1,2,3")):
+    """
+    Dependency that parses the ``ids`` multi-get parameter of ``GET /contacts``.
+
+    Args:
+        ids (Optional[str]): The comma-separated contact IDs.
+
+    Returns:
+        Optional[List[int]]: The requested IDs, or None for no ID filter.
+
+    Raises:
+        HTTPException: If an ID is invalid or too many IDs are given (status code 400).
+    """
+    try:
+        return models.parse_contact_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def contact_fields(fields: Optional[str] = Query(None, description="Comma-separated contact fields to return, e.g. id,first_name,last_name")):
+    """
+    Dependency that parses the ``fields`` sparse fieldset parameter of contact reads.
+
+    Args:
+        fields (Optional[str]): The comma-separated field names.
+
+    Returns:
+        Optional[Tuple[str, ...]]: The requested fields, or None for all fields.
+
+    Raises:
+        HTTPException: If a field name is unknown (status code 400).
+    """
+    try:
+        return models.parse_contact_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/contacts", responses={200: {"model": List[Union[models.Contact, models.ContactFields]]}}, dependencies=[Depends(auth.get_current_active_user)])
+async def read_contacts(skip: int = 0, limit: int = 100, first_name: str = None, last_name: str = None, email: str = None, ids: Optional[List[int]] = Depends(contact_ids), fields: Optional[Tuple[str, ...]] = Depends(contact_fields), current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
     """
     Returns a list of contacts for the current user with optional filtering and pagination.
 
+    With ``ids``, only those contacts are fetched in one query (missing IDs are skipped and the
+    other filters and pagination are ignored). With ``fields``, only the requested columns are
+    selected from the database and only those fields are returned for each contact, so the
+    response is documented as either full ``Contact`` objects or ``ContactFields``.
+
     Args:
         skip (int, optional): The number of contacts to skip. Defaults to 0.
         limit (int, optional): The maximum number of contacts to return. Defaults to 100.
         first_name (str, optional): Filter by first name. Defaults to None.
         last_name (str, optional): Filter by last name. Defaults to None.
         email (str, optional): Filter by email. Defaults to None.
+        ids (Optional[List[int]]): Fetch only these contacts. Defaults to None.
+        fields (Optional[Tuple[str, ...]]): The sparse fieldset. Defaults to all fields.
         current_user (models.User): The currently authenticated user.
         db (Session, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
-        List[models.Contact]: A list of the user's contacts.
+        Response: The user's contacts, serialised with ``models.Contact`` or the sparse fieldset model.
     """
-    contacts = crud.get_contacts(db, user_id=current_user.id, skip=skip, limit=limit, first_name=first_name, last_name=last_name, email=email)
-    return contacts
+    if ids:
+        contacts = crud.get_contacts_by_ids(db, user_id=current_user.id, ids=ids, fields=fields)
+    else:
+        contacts = crud.get_contacts(db, user_id=current_user.id, skip=skip, limit=limit, first_name=first_name, last_name=last_name, email=email, fields=fields)
+    return serialization.rows_response(contacts, models.contact_fieldset_model(fields) if fields else models.Contact)
 
 
-@app.get("/contacts/{contact_id}", response_model=models.Contact, dependencies=[Depends(auth.get_current_active_user)])
-async def read_contact(contact_id: int, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
+@router.get("/contacts/changes", response_model=models.ContactChanges, dependencies=[Depends(auth.get_current_active_user)])
+async def read_contact_changes(since: int = Query(0, ge=0, description="The `version` returned by the previous sync, or 0 for a full sync"), after: Optional[int] = Query(None, ge=0, description="The `after` returned by the previous page"), limit: int = Query(500, ge=1, le=1000), current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
+    """
+    Returns the current user's contacts changed and deleted since a contact version.
+
+    Clients keep the returned ``version`` and pass it as ``since`` next time, instead of
+    re-reading the whole address book. While ``has_more`` is true they also pass the returned
+    ``after``, which marks where the page stopped within that version.
+
+    Args:
+        since (int, optional): The last version the client has seen. Defaults to 0 (full sync).
+        after (Optional[int], optional): The ``after`` of the previous page. Defaults to None.
+        limit (int, optional): The maximum number of changes per page. Defaults to 500.
+        current_user (models.User): The currently authenticated user.
+        db (Session, optional): The database session. Defaults to Depends(get_db).
+
+    Returns:
+        models.ContactChanges: The changed contacts, the IDs of deleted contacts and the new version.
+    """
+    return crud.get_contact_changes(db, user_id=current_user.id, since=since, limit=limit, after=after)
+
+
+@router.get("/contacts/events", response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_contact_events(current_user: models.User = Depends(auth.get_current_active_user_without_session)):
+    """
+    Streams the current user's contact changes as Server-Sent Events.
+
+    Each ``created``, ``updated`` or ``deleted`` event carries the contact IDs and the contact
+    version (also sent as the SSE ``id``); a ``resync`` event means events were dropped and the
+    client should catch up through ``/contacts/changes``. A comment line is sent as heartbeat
+    while the stream is idle. The user is authenticated with a short-lived database session,
+    so open streams hold no pooled connection.
+
+    Args:
+        current_user (models.User): The currently authenticated user.
+
+    Returns:
+        StreamingResponse: The ``text/event-stream`` response.
+
+    Raises:
+        HTTPException: If this worker has no stream capacity left (status code 503).
+    """
+    try:
+        subscription = contact_events.broker.subscribe(current_user.id)
+    except contact_events.TooManySubscribers:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many open event streams")
+    return contact_events.EventStreamResponse(subscription, contact_events.broker)
+
+
+@router.get("/contacts/{contact_id}", responses={200: {"model": Union[models.Contact, models.ContactFields]}}, dependencies=[Depends(auth.get_current_active_user)])
+async def read_contact(contact_id: int, fields: Optional[Tuple[str, ...]] = Depends(contact_fields), current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
     """
     Returns a specific contact by its ID for the current user.
 
     Args:
         contact_id (int): The ID of the contact to retrieve.
+        fields (Optional[Tuple[str, ...]]): The sparse fieldset. Defaults to all fields.
         current_user (models.User): The currently authenticated user.
         db (Session, optional): The database session. Defaults to Depends(get_db).
 
     Returns:
-        models.Contact: The requested contact information.
+        Response: The contact, serialised with ``models.Contact`` or the sparse fieldset model.
 
     Raises:
         HTTPException: If the contact with the given ID is not found for the current user (status code 404).
     """
-    db_contact = crud.get_contact(db, contact_id=contact_id, user_id=current_user.id)
+    db_contact = crud.get_contact(db, contact_id=contact_id, user_id=current_user.id, fields=fields)
     if db_contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return db_contact
+    return serialization.row_response(db_contact, models.contact_fieldset_model(fields) if fields else models.Contact)
 
 
-@app.put("/contacts/{contact_id}", response_model=models.Contact, dependencies=[Depends(auth.get_current_active_user)])
+@router.put("/contacts/{contact_id}", response_model=models.Contact, dependencies=[Depends(auth.get_current_active_user)])
 async def update_contact(contact_id: int, contact: models.ContactUpdate, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
     """
     Updates an existing contact with the provided data for the current user.
@@ -391,7 +679,7 @@ async def update_contact(contact_id: int, contact: models.ContactUpdate, current
     return db_contact
 
 
-@app.delete("/contacts/{contact_id}", response_model=models.Contact, dependencies=[Depends(auth.get_current_active_user)])
+@router.delete("/contacts/{contact_id}", response_model=models.Contact, dependencies=[Depends(auth.get_current_active_user)])
 async def delete_contact(contact_id: int, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
     """
     Deletes a specific contact by its ID for the current user.
@@ -416,7 +704,7 @@ async def delete_contact(contact_id: int, current_user: models.User = Depends(au
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
 
 
-@app.get("/birthdays", response_model=List[models.Contact], dependencies=[Depends(auth.get_current_active_user)])
+@router.get("/birthdays", response_model=List[models.Contact], dependencies=[Depends(auth.get_current_active_user)])
 async def get_upcoming_birthdays(current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
     """
     Returns a list of contacts with upcoming birthdays for the current user.
@@ -433,11 +721,13 @@ async def get_upcoming_birthdays(current_user: models.User = Depends(auth.get_cu
 
 # password
 # Endpoint for password reset request
-@app.post("/password-reset-request", status_code=status.HTTP_202_ACCEPTED)
+@router.post("/password-reset-request", status_code=status.HTTP_202_ACCEPTED)
 async def request_password_reset(body: models.PasswordResetRequest, request: Request, db: Session = Depends(get_db)):
     """
     Initiates a password reset request for the user with the provided email.
 
+    The reset email is queued in the outbox and delivered in the background.
+
     Args:
         body (models.PasswordResetRequest): An object containing the user's email.
         request (Request): The FastAPI request object.
@@ -450,19 +740,19 @@ async def request_password_reset(body: models.PasswordResetRequest, request: Req
     if user:
         token_db = crud.create_password_reset_token(db, email=body.email)
         reset_link = f"{request.base_url}password-reset/verify/{token_db.token}"
-        message = MessageSchema(
+        email_outbox.enqueue_email(
+            db,
+            recipient=body.email,
             subject="Password reset request",
-            recipients=[body.email],
             body=f"Follow this link to reset your password: {reset_link}",
             subtype="html" # Или "plain"
         )
-        await mail.send_message(message)
     # Important: Do not explicitly report whether an email was found. Avoid information leakage
     return {"message": "If this email address is registered, a password reset link will be sent to it."}
 
 
 # Password reset endpoint
-@app.post("/password-reset", status_code=status.HTTP_200_OK)
+@router.post("/password-reset", status_code=status.HTTP_200_OK)
 async def reset_password(body: models.PasswordReset, db: Session = Depends(get_db)):
     """
     Resets the user's password using the provided token and new password.
@@ -500,7 +790,7 @@ async def reset_password(body: models.PasswordReset, db: Session = Depends(get_d
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    hashed_password = auth.pwd_context.hash(body.new_password)
+    hashed_password = crud.get_password_hash(body.new_password)
     user.hashed_password = hashed_password
     db.commit()
     crud.delete_password_reset_token(db, token=body.token)
@@ -508,7 +798,7 @@ async def reset_password(body: models.PasswordReset, db: Session = Depends(get_d
 
 
 # Endpoint for checking the validity of the token (can be used by the client)
-@app.get("/password-reset/verify/{token}", response_model=models.PasswordResetToken)
+@router.get("/password-reset/verify/{token}", response_model=models.PasswordResetToken)
 async def verify_password_reset_token(token: str, db: Session = Depends(get_db)):
     """
     Verifies the validity of a password reset token.
@@ -535,3 +825,78 @@ async def verify_password_reset_token(token: str, db: Session = Depends(get_db))
     if expires_at_utc < datetime.now(timezone.utc):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or obsolete token")
     return models.PasswordResetToken(token=token_db.token, email=token_db.email, expires_at=token_db.expires_at)
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Builds the application.
+
+    Importing this module has no side effects beyond defining routes: the schema, the
+    outbox worker and the birthday scheduler are started by the application's lifespan,
+    so every worker process imports quickly and only opens connections once it serves.
+    The lifespan then warms the connection pools up (see ``health.warm_up``) and closes
+    them on shutdown.
+
+    Args:
+        settings (Optional[Settings]): The subsystems to wire in. Defaults to ``Settings.from_env()``.
+
+    Returns:
+        FastAPI: The configured application.
+    """
+    settings = settings or Settings.from_env()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.warmup = health.WarmupState(ready=not settings.warmup)
+        async with AsyncExitStack() as stack:
+            if settings.tracing:
+                stack.callback(tracing.configure_tracing().force_flush)
+            stack.push_async_callback(health.close_pools)
+            if trace_writer is not None:
+                stack.callback(trace_writer.close)
+            if monitor is not None:
+                await stack.enter_async_context(monitor.run())
+            if settings.create_schema:
+                await asyncio.to_thread(database.Base.metadata.create_all, bind=database.engine)
+            smtp_pool = None
+            if settings.outbox_worker:
+                worker = await stack.enter_async_context(email_outbox.run_outbox_worker(email_utils.get_conf()))
+                smtp_pool = worker.pool
+            if settings.birthday_scheduler:
+                await stack.enter_async_context(birthday_reminders.run_birthday_scheduler())
+            stack.callback(avatar_processing.shutdown_executor)
+            stack.push_async_callback(asyncio.to_thread, contact_events.broker.stop)
+            if settings.warmup:
+                warm_up = health.warm_up(app, app.state.warmup, smtp_pool)
+                if health.WARMUP_IN_BACKGROUND:
+                    stack.callback(asyncio.create_task(warm_up).cancel)
+                else:
+                    await warm_up
+            yield
+
+    app = FastAPI(default_response_class=serialization.default_response_class(), lifespan=lifespan)
+    app.state.settings = settings
+    if settings.compression:
+        compression.enable_compression(app)
+    trace_writer = request_trace.enable_request_trace(app) if settings.request_trace else None
+    monitor = loop_monitor.enable_loop_monitor(app) if settings.loop_monitor else None
+    if settings.profiling:
+        profiling.enable_profiling(app)
+    if settings.tracing:
+        tracing.enable_tracing(app)
+    if settings.server_timing:
+        server_timing.enable_server_timing(app)
+    if settings.admission_control:
+        admission.enable_admission_control(app)
+    # Added last so it is outermost: shed and rate-limited responses keep their CORS
+    # headers, and preflight requests are answered before admission control sees them.
+    cors.enable_cors(app)
+    rate_limit.init_rate_limit(app)
+    app.include_router(metrics.router)
+    app.include_router(health.router)
+    app.include_router(avatar_storage.router)
+    app.include_router(router)
+    return app
+
+
+app = create_app()
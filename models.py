@@ -1,9 +1,13 @@
 # models.py
 
-from typing import Optional
+import os
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type
 from datetime import date, datetime
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, create_model, field_validator
+
+CONTACT_BATCH_MAX_ITEMS = int(os.environ.get("CONTACT_BATCH_MAX_ITEMS", 100))
 
 # contacts
 class ContactBase(BaseModel):
@@ -46,12 +50,169 @@ class Contact(ContactBase):
     """
     id: int = Field(..., description="The unique identifier of the contact")
     user_id: int = Field(..., description="The ID of the user who owns this contact")
+    updated_at: Optional[datetime] = Field(None, description="The timestamp of the last change to the contact")
+    version: Optional[int] = Field(None, description="The owner's contact version at the last change")
 
     model_config = {
         "from_attributes": True
     }
 
 
+CONTACT_FIELDS = tuple(Contact.model_fields)
+
+ContactFields = create_model(
+    "ContactFields",
+    __doc__="Pydantic model for a contact read with a sparse fieldset: only the requested fields are present.",
+    **{name: (Optional[field.annotation], Field(None, description=field.description)) for name, field in Contact.model_fields.items()},
+)
+
+
+def parse_contact_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parses a comma-separated sparse fieldset such as ``"id,first_name,last_name"``.
+
+    Args:
+        value (Optional[str]): The requested field names, or None for all fields.
+
+    Returns:
+        Optional[Tuple[str, ...]]: The requested fields in ``Contact`` declaration order,
+            or None when all fields are requested.
+
+    Raises:
+        ValueError: If a name is not a ``Contact`` field or no field is given.
+    """
+    if value is None:
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested.difference(CONTACT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown contact fields: {', '.join(sorted(unknown))}")
+    if not requested:
+        raise ValueError("At least one contact field must be requested")
+    if len(requested) == len(CONTACT_FIELDS):
+        return None
+    return tuple(name for name in CONTACT_FIELDS if name in requested)
+
+
+@lru_cache(maxsize=None)
+def contact_fieldset_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Returns a Pydantic model with only the given ``Contact`` fields (cached per fieldset).
+
+    Args:
+        fields (Tuple[str, ...]): Field names as returned by ``parse_contact_fields``.
+
+    Returns:
+        Type[BaseModel]: The partial contact model.
+    """
+    return create_model(
+        "ContactFields_" + "_".join(fields),
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (Contact.model_fields[name].annotation, Contact.model_fields[name]) for name in fields},
+    )
+
+
+def _ensure_unique(ids: List[int]) -> List[int]:
+    if len(set(ids)) != len(ids):
+        raise ValueError("Contact IDs in a batch must be unique")
+    return ids
+
+
+class ContactBatchCreate(BaseModel):
+    """
+    Pydantic model for creating several contacts in one request.
+    """
+    items: List[ContactCreate] = Field(..., min_length=1, max_length=CONTACT_BATCH_MAX_ITEMS, description="The contacts to create")
+
+
+class ContactBatchUpdateItem(ContactUpdate):
+    """
+    Pydantic model for one entry of a batch update: the contact ID plus the fields to change.
+    """
+    id: int = Field(..., description="The ID of the contact to update")
+
+
+class ContactBatchUpdate(BaseModel):
+    """
+    Pydantic model for updating several contacts in one request.
+    """
+    items: List[ContactBatchUpdateItem] = Field(..., min_length=1, max_length=CONTACT_BATCH_MAX_ITEMS, description="The contacts to update")
+
+    @field_validator("items")
+    @classmethod
+    def unique_ids(cls, items: List[ContactBatchUpdateItem]) -> List[ContactBatchUpdateItem]:
+        _ensure_unique([item.id for item in items])
+        return items
+
+
+class ContactBatchDelete(BaseModel):
+    """
+    Pydantic model for deleting several contacts in one request.
+    """
+    ids: List[int] = Field(..., min_length=1, max_length=CONTACT_BATCH_MAX_ITEMS, description="The IDs of the contacts to delete")
+
+    @field_validator("ids")
+    @classmethod
+    def unique_ids(cls, ids: List[int]) -> List[int]:
+        return _ensure_unique(ids)
+
+
+class ContactBatchItemResult(BaseModel):
+    """
+    Pydantic model for the outcome of one batch item.
+    """
+    index: int = Field(..., description="The position of the item in the request")
+    id: Optional[int] = Field(None, description="The ID of the contact, if known")
+    status: int = Field(..., description="The HTTP status code for this item, e.g. 201, 200, 404 or 409")
+    detail: Optional[str] = Field(None, description="The reason the item failed")
+    contact: Optional[Contact] = Field(None, description="The created or updated contact")
+
+
+class ContactBatchResponse(BaseModel):
+    """
+    Pydantic model for the per-item results of a batch request, in request order.
+    """
+    results: List[ContactBatchItemResult] = Field(..., description="One result per request item")
+
+
+class ContactChanges(BaseModel):
+    """
+    Pydantic model for a page of contact changes returned by delta sync.
+    """
+    version: int = Field(..., description="The version to pass as `since` in the next request")
+    after: Optional[int] = Field(None, description="The contact ID to pass as `after` in the next request, set while `has_more` is true")
+    changed: List[Contact] = Field(..., description="Contacts created or updated since the requested version")
+    deleted: List[int] = Field(..., description="IDs of contacts deleted since the requested version; apply these before `changed`")
+    has_more: bool = Field(..., description="Whether more changes are waiting after this page")
+
+
+def parse_contact_ids(value: Optional[str]) -> Optional[List[int]]:
+    """
+    Parses a comma-separated list of contact IDs such as ``"1,2,3"``.
+
+    Args:
+        value (Optional[str]): The requested IDs, or None for no ID filter.
+
+    Returns:
+        Optional[List[int]]: The unique IDs in request order, or None.
+
+    Raises:
+        ValueError: If an ID is not an integer, no ID is given or more than
+            ``CONTACT_BATCH_MAX_ITEMS`` IDs are requested.
+    """
+    if value is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(",") if part.strip()))
+    except ValueError:
+        raise ValueError("Contact IDs must be integers")
+    if not ids:
+        raise ValueError("At least one contact ID must be given")
+    if len(ids) > CONTACT_BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {CONTACT_BATCH_MAX_ITEMS} contact IDs can be requested at once")
+    return ids
+
+
 # User
 class UserBase(BaseModel):
     """
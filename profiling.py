@@ -0,0 +1,334 @@
+# profiling.py
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, status
+from fastapi.responses import FileResponse
+from limits import parse as parse_rate_limit
+from starlette.datastructures import Headers
+
+import auth, database, metrics, models, rate_limit
+from redis_utils import hash_tag, redis_client
+
+logger = logging.getLogger(__name__)
+
+PROFILING_HEADER = os.environ.get("PROFILING_HEADER", "X-Profile")
+PROFILING_QUERY_PARAMETER = os.environ.get("PROFILING_QUERY_PARAMETER", "profile")
+PROFILING_INTERVAL_SECONDS = float(os.environ.get("PROFILING_INTERVAL_SECONDS", 0.001))
+PROFILING_MAX_SECONDS = float(os.environ.get("PROFILING_MAX_SECONDS", 30))
+PROFILING_RATE_LIMIT = os.environ.get("PROFILING_RATE_LIMIT", "10/minute")
+PROFILING_DIRECTORY = os.environ.get("PROFILING_DIRECTORY", "profiles")
+
+# Profile formats: file suffix and media type. "speedscope" opens in https://www.speedscope.app,
+# "collapsed" (folded stacks) feeds flamegraph.pl and most other flame graph tools.
+FORMATS = {
+    "speedscope": (".speedscope.json", "application/json"),
+    "collapsed": (".collapsed.txt", "text/plain"),
+}
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+AWAIT_FRAME = ("[await]", "", 0)
+
+profiles_counter = metrics.Counter(
+    "request_profiles_total", "Requests that asked to be profiled, by outcome", labelnames=("outcome",),
+)
+
+Frame = Tuple[str, str, int]
+
+
+def requested_format(scope) -> Optional[str]:
+    """
+    Returns the profile format a request asks for, or None when it does not ask for a profile.
+
+    A request asks with the ``PROFILING_HEADER`` header or the ``PROFILING_QUERY_PARAMETER``
+    query parameter; "collapsed" selects folded stacks, any other value except "0" and
+    "false" a speedscope profile. Only the raw header list and query string are scanned,
+    so requests without the flag pay next to nothing.
+    """
+    value = None
+    header = PROFILING_HEADER.lower().encode("latin-1")
+    for name, header_value in scope["headers"]:
+        if name == header:
+            value = header_value.decode("latin-1")
+            break
+    query_string = scope.get("query_string", b"")
+    if value is None and query_string and PROFILING_QUERY_PARAMETER.encode() in query_string:
+        values = parse_qs(query_string.decode("latin-1"), keep_blank_values=True).get(PROFILING_QUERY_PARAMETER)
+        value = values[0] if values else None
+    if value is None or value.strip().lower() in ("0", "false"):
+        return None
+    return "collapsed" if value.strip().lower() == "collapsed" else "speedscope"
+
+
+async def authorize_admin(headers: Headers) -> Optional[models.User]:
+    """
+    Returns the active administrator a request's bearer token belongs to, or None.
+
+    Runs the dependencies of admin-only endpoints (``auth.get_current_user``,
+    ``auth.get_current_active_user`` and ``auth.get_current_active_admin``) outside of
+    routing, so the middleware can check before the request is served.
+    """
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    db = database.SessionLocal()
+    try:
+        user = await auth.get_current_user(token, db, redis_client)
+        return await auth.get_current_active_admin(auth.get_current_active_user(user))
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+
+class Sampler:
+    """
+    Samples the stack of one asyncio task from a background thread.
+
+    While the task runs, a sample is the event loop thread's stack from the task's
+    coroutine inwards; while it waits, the chain of coroutines it is suspended in, ending
+    in an ``[await]`` frame. Time the request spends in worker threads (sync handlers,
+    ``asyncio.to_thread``) therefore shows up as waiting where it is awaited. Each sample
+    is weighted by the time since the previous one.
+
+    Args:
+        task (asyncio.Task): The task serving the request.
+        interval (float): Seconds between samples.
+        max_seconds (float): Sampling stops after this long.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float = PROFILING_INTERVAL_SECONDS, max_seconds: float = PROFILING_MAX_SECONDS):
+        self.task = task
+        self.loop = task.get_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.frames: List[Frame] = []
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.truncated = False
+        self._frame_indexes: Dict[Frame, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        last = time.perf_counter()
+        deadline = last + self.max_seconds
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            try:
+                stack = self.stack()
+            except Exception:  # the loop moved on while the stack was walked
+                stack = None
+            if stack:
+                self.samples.append([self._index(frame) for frame in stack])
+                self.weights.append(now - last)
+            last = now
+            if now > deadline:
+                self.truncated = True
+                return
+
+    def _index(self, frame: Frame) -> int:
+        index = self._frame_indexes.get(frame)
+        if index is None:
+            index = self._frame_indexes[frame] = len(self.frames)
+            self.frames.append(frame)
+        return index
+
+    @staticmethod
+    def _frame(frame) -> Frame:
+        code = frame.f_code
+        return code.co_qualname, code.co_filename, code.co_firstlineno
+
+    def stack(self) -> List[Frame]:
+        """
+        Returns the task's current stack, outermost frame first.
+        """
+        coroutine = self.task.get_coro()
+        if self.task.done():
+            return []
+        if asyncio.current_task(self.loop) is self.task:
+            root, frames = coroutine.cr_frame, []
+            frame = sys._current_frames().get(self.loop_thread_id)
+            while frame is not None:
+                frames.append(self._frame(frame))
+                if frame is root:
+                    break
+                frame = frame.f_back
+            frames.reverse()
+            return frames
+        frames, awaitable = [], coroutine
+        while awaitable is not None:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+            if frame is None:
+                break
+            frames.append(self._frame(frame))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+        frames.append(AWAIT_FRAME)
+        return frames
+
+    def speedscope(self, name: str) -> dict:
+        """
+        Returns the profile in the speedscope file format (one sampled profile).
+        """
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "contacts-app profiling",
+            "shared": {"frames": [{"name": frame_name, "file": file, "line": line} if file else {"name": frame_name}
+                                  for frame_name, file, line in self.frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(self.weights),
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+        }
+
+    def collapsed(self) -> str:
+        """
+        Returns the profile as folded stacks: one ``frame;frame;frame microseconds`` line per stack.
+        """
+        names = [f"{name} ({os.path.basename(file)}:{line})" if file else name for name, file, line in self.frames]
+        totals: Dict[str, float] = {}
+        for sample, weight in zip(self.samples, self.weights):
+            key = ";".join(names[index] for index in sample)
+            totals[key] = totals.get(key, 0.0) + weight
+        return "".join(f"{key} {round(total * 1_000_000)}\n" for key, total in totals.items())
+
+
+def profile_path(directory: str, profile_id: str, profile_format: str) -> str:
+    return os.path.join(directory, profile_id + FORMATS[profile_format][0])
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling single requests on demand.
+
+    A request carrying the profiling flag (see ``requested_format``) from an active
+    administrator (see ``authorize_admin``), within ``rate_limit`` per administrator, is
+    served under a ``Sampler``. The profile is written to ``directory`` once the request
+    is done and can be downloaded from ``GET /admin/profiles/{profile_id}``; the response
+    names it in the ``X-Profile-Id`` header. ``X-Profile-Status`` tells whether the
+    profile was stored, or the request was "denied" or "rate-limited" and served unprofiled.
+
+    Args:
+        app: The wrapped ASGI application.
+        authorize (Callable): Returns the administrator sending a request, or None.
+        directory (str): Where profiles are stored.
+        interval (float): Seconds between samples.
+        max_seconds (float): Longest stretch of a request that is sampled.
+        rate_limit (str): Profiles allowed per administrator, e.g. "10/minute".
+    """
+
+    def __init__(self, app, authorize: Callable[[Headers], Awaitable[Optional[models.User]]] = authorize_admin,
+                 directory: str = PROFILING_DIRECTORY, interval: float = PROFILING_INTERVAL_SECONDS,
+                 max_seconds: float = PROFILING_MAX_SECONDS, rate_limit: str = PROFILING_RATE_LIMIT):
+        self.app = app
+        self.authorize = authorize
+        self.directory = directory
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.rate_limit = parse_rate_limit(rate_limit)
+
+    async def __call__(self, scope, receive, send):
+        profile_format = requested_format(scope) if scope["type"] == "http" else None
+        if profile_format is None:
+            await self.app(scope, receive, send)
+            return
+
+        user = await self.authorize(Headers(scope=scope))
+        if user is None:
+            outcome = "denied"
+        elif not rate_limit.limiter.limiter.hit(self.rate_limit, "profiling", hash_tag(user.id)):
+            outcome = "rate-limited"
+        else:
+            outcome = "stored"
+        profiles_counter.inc(outcome=outcome)
+        profile_id = uuid.uuid4().hex if outcome == "stored" else None
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-status", outcome.encode()))
+                if profile_id:
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if profile_id is None:
+            await self.app(scope, receive, send_with_status)
+            return
+
+        sampler = Sampler(asyncio.current_task(), self.interval, self.max_seconds)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            sampler.stop()
+            name = f"{scope['method']} {scope['path']}"
+            await asyncio.to_thread(self.store, sampler, profile_id, profile_format, name)
+            logger.info("Profiled %s for user %s as %s (%d samples)", name, user.id, profile_id, len(sampler.samples))
+
+    def store(self, sampler: Sampler, profile_id: str, profile_format: str, name: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(profile_path(self.directory, profile_id, profile_format), "w", encoding="utf-8") as f:
+            if profile_format == "collapsed":
+                f.write(sampler.collapsed())
+            else:
+                json.dump(sampler.speedscope(name), f, separators=(",", ":"))
+
+
+router = APIRouter()
+
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(auth.get_current_active_admin)])
+async def get_profile(profile_id: str):
+    """
+    Downloads a stored request profile (available only to administrators).
+
+    Args:
+        profile_id (str): The ID from the ``X-Profile-Id`` header of the profiled response.
+
+    Returns:
+        FileResponse: The speedscope or folded stacks profile.
+
+    Raises:
+        HTTPException: If there is no such profile (status code 404).
+    """
+    if PROFILE_ID.match(profile_id):
+        for profile_format, (suffix, media_type) in FORMATS.items():
+            path = profile_path(PROFILING_DIRECTORY, profile_id, profile_format)
+            if os.path.exists(path):
+                return FileResponse(path, media_type=media_type, filename=profile_id + suffix)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+
+
+def enable_profiling(app: FastAPI):
+    """
+    Adds ``ProfilingMiddleware`` and the profile download endpoint to the application.
+
+    Args:
+        app (FastAPI): The FastAPI application instance.
+    """
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(router)
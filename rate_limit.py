@@ -1,11 +1,35 @@
 # rate_limit.py
 
+import os
+
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
 
-limiter = Limiter(key_func=get_remote_address)
+from redis_utils import hash_tag
+
+RATE_LIMIT_STORAGE_URI = os.environ.get("RATE_LIMIT_STORAGE_URI", "memory://")
+
+
+def rate_limit_key(request: Request) -> str:
+    """
+    Builds the rate-limit key for a request from the client address.
+
+    The address is wrapped in a Redis Cluster hash tag so that all counters for one
+    client (one per limit window) live in the same slot when the limiter storage is a
+    Redis Cluster (``RATE_LIMIT_STORAGE_URI=redis+cluster://...``).
+
+    Args:
+        request (Request): The incoming FastAPI request object.
+
+    Returns:
+        str: The hash-tagged client address, e.g. ``"{127.0.0.1}"``.
+    """
+    return hash_tag(get_remote_address(request))
+
+
+limiter = Limiter(key_func=rate_limit_key, storage_uri=RATE_LIMIT_STORAGE_URI)
 
 def init_rate_limit(app: FastAPI):
     """
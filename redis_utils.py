@@ -1,25 +1,509 @@
 # redis_utils.py
 
 import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
 import redis
+from redis.backoff import NoBackoff
+from redis.cluster import ClusterNode, RedisCluster
+from redis.retry import Retry
+from redis.sentinel import Sentinel
+
+import metrics
+
+logger = logging.getLogger(__name__)
 
+REDIS_MODE = os.environ.get("REDIS_MODE", "standalone").lower()
 REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
 REDIS_DB = int(os.environ.get("REDIS_DB", 0))
+REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD") or None
+REDIS_SENTINELS = os.environ.get("REDIS_SENTINELS", "")
+REDIS_SENTINEL_MASTER = os.environ.get("REDIS_SENTINEL_MASTER", "mymaster")
+REDIS_CLUSTER_NODES = os.environ.get("REDIS_CLUSTER_NODES", "")
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 0.5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get("REDIS_SOCKET_CONNECT_TIMEOUT", 0.5))
+REDIS_RETRIES = int(os.environ.get("REDIS_RETRIES", 0))
+REDIS_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("REDIS_BREAKER_FAILURE_THRESHOLD", 5))
+REDIS_BREAKER_RESET_SECONDS = float(os.environ.get("REDIS_BREAKER_RESET_SECONDS", 30))
+LOCAL_CACHE_MAX_ENTRIES = int(os.environ.get("LOCAL_CACHE_MAX_ENTRIES", 1024))
+LOCAL_CACHE_TTL_SECONDS = float(os.environ.get("LOCAL_CACHE_TTL_SECONDS", 60))
+
+def parse_nodes(spec: str) -> List[Tuple[str, int]]:
+    """
+    Parses a comma-separated list of ``host:port`` pairs.
+
+    Args:
+        spec (str): The node list, e.g. ``"sentinel-1:26379,sentinel-2:26379"``.
+
+    Returns:
+        List[Tuple[str, int]]: The parsed ``(host, port)`` pairs.
+
+    Raises:
+        ValueError: If the list is empty or an entry has no port.
+    """
+    nodes = []
+    for entry in filter(None, (item.strip() for item in spec.split(","))):
+        host, _, port = entry.rpartition(":")
+        if not host or not port:
+            raise ValueError(f"Invalid Redis node address: {entry!r}")
+        nodes.append((host, int(port)))
+    if not nodes:
+        raise ValueError("At least one Redis node address is required")
+    return nodes
+
+
+def create_redis_client(
+    mode: Optional[str] = None,
+    sentinels: Optional[List[Tuple[str, int]]] = None,
+    cluster_nodes: Optional[List[Tuple[str, int]]] = None,
+):
+    """
+    Creates a Redis client for the configured deployment topology.
+
+    ``standalone`` connects to ``REDIS_HOST:REDIS_PORT``; ``sentinel`` discovers the
+    ``REDIS_SENTINEL_MASTER`` master through ``REDIS_SENTINELS`` and follows failovers;
+    ``cluster`` bootstraps from ``REDIS_CLUSTER_NODES`` and routes each key to its slot.
+
+    Args:
+        mode (Optional[str]): ``standalone``, ``sentinel`` or ``cluster``. Defaults to ``REDIS_MODE``.
+        sentinels (Optional[List[Tuple[str, int]]]): Sentinel addresses. Defaults to ``REDIS_SENTINELS``.
+        cluster_nodes (Optional[List[Tuple[str, int]]]): Cluster startup nodes. Defaults to ``REDIS_CLUSTER_NODES``.
+
+    Returns:
+        redis.Redis | redis.cluster.RedisCluster: The configured client.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    mode = (mode or REDIS_MODE).lower()
+    timeouts = dict(socket_timeout=REDIS_SOCKET_TIMEOUT, socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT)
+    if mode == "standalone":
+        return redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=True,
+            retry=Retry(NoBackoff(), REDIS_RETRIES),
+            **timeouts,
+        )
+    if mode == "sentinel":
+        sentinel = Sentinel(
+            sentinels or parse_nodes(REDIS_SENTINELS),
+            sentinel_kwargs=dict(timeouts, retry=Retry(NoBackoff(), REDIS_RETRIES)),
+            **timeouts,
+        )
+        return sentinel.master_for(
+            REDIS_SENTINEL_MASTER,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            decode_responses=True,
+            retry=Retry(NoBackoff(), REDIS_RETRIES),
+        )
+    if mode == "cluster":
+        startup_nodes = [ClusterNode(host, port) for host, port in (cluster_nodes or parse_nodes(REDIS_CLUSTER_NODES))]
+        return RedisCluster(startup_nodes=startup_nodes, password=REDIS_PASSWORD, decode_responses=True, **timeouts)
+    raise ValueError(f"Unknown REDIS_MODE: {mode!r} (expected standalone, sentinel or cluster)")
+
+
+class LazyRedisClient:
+    """
+    A stand-in for a Redis client that creates the real client on first use.
+
+    Cluster clients contact their startup nodes as soon as they are constructed, so a
+    module-level client would make importing the application block on (or fail with) an
+    unreachable Redis. The proxy forwards attribute access, and ``isinstance`` checks, to
+    the client once it exists.
+
+    Args:
+        factory (Callable[[], Any]): Creates the client, e.g. ``create_redis_client``.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_client", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_setups", [])
+
+    def get_client(self):
+        """
+        Returns the wrapped client, creating it if needed.
+        """
+        client = self._client
+        if client is None:
+            with self._lock:
+                client = self._client
+                if client is None:
+                    client = self._factory()
+                    for setup in self._setups:
+                        setup(client)
+                    object.__setattr__(self, "_client", client)
+        return client
+
+    def add_setup(self, setup: Callable[[Any], None]):
+        """
+        Runs ``setup`` on the wrapped client: right away if it exists, otherwise once it is created.
+
+        Args:
+            setup (Callable[[Any], None]): Receives the client, e.g. ``tracing.instrument_redis``.
+        """
+        with self._lock:
+            if self._client is None:
+                self._setups.append(setup)
+                return
+        setup(self._client)
+
+    @property
+    def __class__(self):
+        return type(self.get_client())
+
+    def __getattr__(self, name: str):
+        return getattr(self.get_client(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.get_client(), name, value)
+
+    def close(self):
+        """
+        Closes the wrapped client's connections, if the client was ever created.
+        """
+        if self._client is not None:
+            self._client.close()
 
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+    def __repr__(self) -> str:
+        return repr(self._client) if self._client is not None else "<LazyRedisClient (not connected)>"
+
+
+redis_client = LazyRedisClient(create_redis_client)
 """
-Global Redis client instance.
+Global Redis client instance, created on first use.
 
-This client is configured using environment variables for host, port, and database.
-It automatically decodes responses from Redis as strings.
+The topology is selected with ``REDIS_MODE`` (standalone, sentinel or cluster) and
+configured from the matching environment variables. It automatically decodes responses
+from Redis as strings. Socket timeouts (without client-side retries by default) keep a
+slow or unreachable Redis from blocking request handlers; repeated failures are handled
+by the circuit breaker below.
 """
 
+
+def hash_tag(value) -> str:
+    """
+    Wraps a value in a Redis Cluster hash tag.
+
+    Only the part inside the braces is hashed, so every key sharing the tag maps to the
+    same slot and multi-key operations on them stay on one node.
+
+    Args:
+        value: The value identifying the group of keys (e.g. a user ID).
+
+    Returns:
+        str: The hash tag, e.g. ``"{42}"``.
+    """
+    return "{" + str(value) + "}"
+
+
+def cache_key(namespace: str, tag, *parts) -> str:
+    """
+    Builds a cache key of the form ``namespace:{tag}[:part...]``.
+
+    Args:
+        namespace (str): The key namespace, e.g. ``"user"``.
+        tag: The value used as the hash tag.
+        *parts: Optional suffix segments.
+
+    Returns:
+        str: The hash-tagged key.
+    """
+    return ":".join([namespace, hash_tag(tag), *map(str, parts)])
+
+
+def user_cache_key(user_id: int) -> str:
+    """
+    Returns the cache key of a user record, e.g. ``"user:{42}"``.
+    """
+    return cache_key("user", user_id)
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker guarding calls to an unreliable dependency.
+
+    The breaker starts ``closed``. After ``failure_threshold`` consecutive failures it
+    opens and rejects calls until ``reset_timeout`` seconds have passed; it then lets a
+    single trial call through (``half_open``) and closes again if that call succeeds.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Returns the breaker to the closed state and forgets recorded failures.
+        """
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """
+        str: The current state, moving from ``open`` to ``half_open`` once the reset timeout expires.
+        """
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Decides whether a call to the guarded dependency may be attempted.
+
+        Returns:
+            bool: True if the call may proceed, False if the caller should use its fallback.
+        """
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Records a successful call and closes the breaker.
+        """
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Redis circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """
+        Records a failed call, opening the breaker when the threshold is reached.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Redis circuit breaker opened after %d failure(s)", self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+
+class LocalTTLCache:
+    """
+    A bounded, thread-safe in-process cache with per-entry expiry and LRU eviction.
+
+    Used as a degraded-mode fallback while Redis is unavailable.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for ``key``, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Stores ``value`` under ``key`` for at most ``ttl`` seconds (capped by the cache TTL).
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+breaker = CircuitBreaker(REDIS_BREAKER_FAILURE_THRESHOLD, REDIS_BREAKER_RESET_SECONDS)
+"""Circuit breaker shared by every cache call made through this module."""
+
+fallback_cache = LocalTTLCache(LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_TTL_SECONDS)
+"""In-process cache used while the breaker is open or Redis calls fail."""
+
+_BREAKER_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+breaker_state_gauge = metrics.Gauge(
+    "redis_circuit_breaker_state", "Redis circuit breaker state (0=closed, 1=half_open, 2=open)"
+)
+breaker_state_gauge.set_function(lambda: _BREAKER_STATE_VALUES[breaker.state])
+
+fallback_counter = metrics.Counter(
+    "redis_cache_fallback_total",
+    "Cache operations served by the local fallback instead of Redis",
+    labelnames=("operation", "reason"),
+)
+
+fallback_cache_size_gauge = metrics.Gauge("redis_fallback_cache_entries", "Entries held in the local fallback cache")
+fallback_cache_size_gauge.set_function(lambda: len(fallback_cache))
+
+
+def _guarded(operation: str, call: Callable[[], Any]) -> tuple:
+    """
+    Runs a Redis call through the circuit breaker.
+
+    Args:
+        operation (str): The operation name used in metrics ("get", "setex", "delete").
+        call (Callable[[], Any]): The Redis call to perform.
+
+    Returns:
+        tuple: ``(True, result)`` if Redis answered, ``(False, None)`` if the fallback should be used.
+    """
+    if not breaker.allow_request():
+        fallback_counter.inc(operation=operation, reason="open")
+        return False, None
+    try:
+        result = call()
+    except (redis.RedisError, OSError) as e:
+        breaker.record_failure()
+        fallback_counter.inc(operation=operation, reason="error")
+        logger.warning("Redis %s failed, using fallback: %s", operation, e)
+        return False, None
+    breaker.record_success()
+    return True, result
+
+
+def cache_get(client: redis.Redis, key: str) -> Optional[str]:
+    """
+    Reads a cache entry, falling back to the local cache when Redis is unavailable.
+
+    Args:
+        client (redis.Redis): The Redis client.
+        key (str): The cache key.
+
+    Returns:
+        Optional[str]: The cached value, or None on a miss (callers then go to the database).
+    """
+    ok, value = _guarded("get", lambda: client.get(key))
+    if ok:
+        return value
+    return fallback_cache.get(key)
+
+
+def cache_setex(client: redis.Redis, key: str, ttl: int, value: str):
+    """
+    Writes a cache entry with an expiry, keeping it locally when Redis is unavailable.
+
+    Args:
+        client (redis.Redis): The Redis client.
+        key (str): The cache key.
+        ttl (int): The expiry in seconds.
+        value (str): The value to store.
+    """
+    ok, _ = _guarded("setex", lambda: client.setex(key, ttl, value))
+    if not ok:
+        fallback_cache.set(key, value, ttl)
+
+
+def cache_delete(client: redis.Redis, key: str):
+    """
+    Removes a cache entry from both Redis and the local fallback cache.
+
+    Args:
+        client (redis.Redis): The Redis client.
+        key (str): The cache key.
+    """
+    fallback_cache.delete(key)
+    _guarded("delete", lambda: client.delete(key))
+
+
+def acquire_lock(client: redis.Redis, key: str, ttl: int) -> bool:
+    """
+    Takes a best-effort, expiring lock shared by every worker (``SET key NX EX ttl``).
+
+    Args:
+        client (redis.Redis): The Redis client.
+        key (str): The lock key.
+        ttl (int): The lock lifetime in seconds.
+
+    Returns:
+        bool: True if the lock was acquired, False if another worker holds it or Redis is unavailable.
+    """
+    ok, acquired = _guarded("set", lambda: client.set(key, "1", nx=True, ex=ttl))
+    return bool(ok and acquired)
+
+
+def publish(client: redis.Redis, channel: str, message: str) -> bool:
+    """
+    Publishes a pub/sub message to every subscribed worker.
+
+    Args:
+        client (redis.Redis): The Redis client.
+        channel (str): The channel name.
+        message (str): The message payload.
+
+    Returns:
+        bool: True if Redis accepted the message, False if it is unavailable.
+    """
+    ok, _ = _guarded("publish", lambda: client.publish(channel, message))
+    return ok
+
+
+def ping(client: redis.Redis) -> bool:
+    """
+    Checks that Redis answers, opening a connection in the client's pool.
+
+    Args:
+        client (redis.Redis): The Redis client.
+
+    Returns:
+        bool: True if Redis answered, False if it is unavailable.
+    """
+    ok, _ = _guarded("ping", lambda: client.ping())
+    return ok
+
+
 async def get_redis():
     """
     Asynchronous dependency to provide the global Redis client.
 
     Returns:
-        redis.Redis: The configured Redis client instance.
+        redis.Redis | redis.cluster.RedisCluster: The configured Redis client instance.
     """
     return redis_client
@@ -0,0 +1,301 @@
+# request_trace.py
+
+import os
+import re
+import hmac
+import json
+import time
+import queue
+import random
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+
+import auth, metrics
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TRACE_PATH = os.environ.get("REQUEST_TRACE_PATH", "request_trace-{pid}.jsonl")
+REQUEST_TRACE_SAMPLE_RATE = float(os.environ.get("REQUEST_TRACE_SAMPLE_RATE", 1.0))
+REQUEST_TRACE_MAX_BODY_BYTES = int(os.environ.get("REQUEST_TRACE_MAX_BODY_BYTES", 64 * 1024))
+REQUEST_TRACE_EXCLUDE = os.environ.get("REQUEST_TRACE_EXCLUDE", "/metrics,/health/")
+
+# Values of these keys (query parameters, path parameters, body fields) are identifiers or
+# options rather than personal data, so they are recorded as they are.
+SAFE_KEYS = frozenset(("skip", "limit", "ids", "fields", "since", "version", "role", "grant_type", "subtype"))
+
+_PLACEHOLDER = re.compile(r"^<(email|password|token|date|phone|text):(\d+)>$")
+
+records_counter = metrics.Counter("request_trace_records_total", "Requests written to the request trace")
+
+
+def value_kind(key: str) -> str:
+    """
+    Classifies a field by its name: "email", "password", "token", "date", "phone" or "text".
+    """
+    key = key.lower()
+    if "password" in key:
+        return "password"
+    if "token" in key:
+        return "token"
+    if "email" in key or key == "username":
+        return "email"
+    if "birthday" in key or "date" in key:
+        return "date"
+    if "phone" in key:
+        return "phone"
+    return "text"
+
+
+def is_safe_key(key: str) -> bool:
+    key = key.lower()
+    return key in SAFE_KEYS or key == "id" or key.endswith("_id")
+
+
+def redact(key: str, value: Any) -> Any:
+    """
+    Replaces the personal data in a value with placeholders that keep its shape.
+
+    Numbers, booleans and nulls are kept, as are the values of ``SAFE_KEYS`` and ID keys.
+    Every other string becomes ``"<kind:length>"`` (see ``value_kind``), e.g.
+    ``"<email:21>"``; dictionaries and lists are redacted item by item.
+
+    Args:
+        key (str): The name of the field holding the value.
+        value (Any): The value, as decoded from JSON or a form.
+
+    Returns:
+        Any: The redacted value.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, dict):
+        return {item_key: redact(item_key, item) for item_key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(key, item) for item in value]
+    if is_safe_key(key):
+        return value
+    return f"<{value_kind(key)}:{len(str(value))}>"
+
+
+def parse_placeholder(value: Any) -> Optional[Tuple[str, int]]:
+    """
+    Returns the kind and length of a placeholder written by ``redact``, or None for any other value.
+    """
+    match = _PLACEHOLDER.match(value) if isinstance(value, str) else None
+    return (match.group(1), int(match.group(2))) if match else None
+
+
+def _pseudonym(value: str) -> str:
+    key = hashlib.sha256(f"request-trace:{auth.SECRET_KEY}".encode()).digest()
+    return hmac.new(key, value.lower().encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def identify(headers: Headers, body: Any) -> Tuple[str, Optional[str]]:
+    """
+    Classifies who sent a request without recording who it was.
+
+    A valid bearer token makes the class "user", an unreadable or expired one "invalid",
+    and no token "anonymous". The identity is a keyed hash of the token subject (the
+    user's email), or for anonymous requests of the ``username`` or ``email`` field of the
+    body (login and password reset), so requests of one person can be grouped on replay.
+
+    Args:
+        headers (Headers): The request headers.
+        body (Any): The decoded (not yet redacted) request body, if any.
+
+    Returns:
+        Tuple[str, Optional[str]]: The identity class and the pseudonymous identity.
+    """
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(authorization[7:], auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        except JWTError:
+            return "invalid", None
+        subject = payload.get("sub")
+        return "user", _pseudonym(str(subject)) if subject else None
+    if isinstance(body, dict):
+        for key in ("username", "email"):
+            if isinstance(body.get(key), str):
+                return "anonymous", _pseudonym(body[key])
+    return "anonymous", None
+
+
+def decode_body(content_type: str, body: bytes) -> Tuple[Any, bool]:
+    """
+    Decodes a JSON or form request body; returns the value and whether it could be decoded.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    if not body:
+        return None, True
+    try:
+        if media_type == "application/json":
+            return json.loads(body), True
+        if media_type == "application/x-www-form-urlencoded":
+            return {key: values[0] if len(values) == 1 else values
+                    for key, values in parse_qs(body.decode(), keep_blank_values=True).items()}, True
+    except (ValueError, UnicodeDecodeError):
+        pass
+    return None, False
+
+
+class TraceWriter:
+    """
+    Appends trace records to a JSONL file from a background thread, so requests never wait for the disk.
+
+    The file name is resolved, and the thread started, on the first record. With Gunicorn
+    ``preload_app`` the writer is created in the master, so ``{pid}`` in the path then
+    names each worker's own file.
+
+    Args:
+        path (str): The trace file; ``{pid}`` is replaced with the writing process ID.
+    """
+
+    def __init__(self, path: str = REQUEST_TRACE_PATH):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    path = self.path.format(pid=os.getpid())
+                    self._thread = threading.Thread(target=self._run, args=(path,), name="request-trace", daemon=True)
+                    self._thread.start()
+        self._queue.put(record)
+
+    def _run(self, path: str):
+        with open(path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+    def close(self):
+        """
+        Writes the queued records and stops the thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class RequestTraceMiddleware:
+    """
+    ASGI middleware recording the shape of sampled requests into a ``TraceWriter``.
+
+    Each record holds the method, route template, redacted path and query parameters,
+    request content type and size, the redacted body (JSON and form bodies up to
+    ``max_body_bytes``; other bodies only by size), the response status and size, the
+    start time and duration, and the identity class (see ``identify``). Secrets and
+    personal data never reach the trace: tokens are only verified, and string values
+    are replaced by placeholders (see ``redact``). The request body is observed as the
+    application reads it, never read ahead.
+
+    Args:
+        app: The wrapped ASGI application.
+        writer (TraceWriter): Where records go.
+        sample_rate (float): The share of requests recorded, from 0 to 1.
+        max_body_bytes (int): Larger bodies are recorded by size only.
+        exclude (Tuple[str, ...]): Path prefixes never recorded.
+    """
+
+    def __init__(self, app, writer: TraceWriter, sample_rate: float = REQUEST_TRACE_SAMPLE_RATE,
+                 max_body_bytes: int = REQUEST_TRACE_MAX_BODY_BYTES,
+                 exclude: Tuple[str, ...] = tuple(prefix for prefix in REQUEST_TRACE_EXCLUDE.split(",") if prefix)):
+        self.app = app
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["path"].startswith(self.exclude)
+                or (self.sample_rate < 1 and random.random() >= self.sample_rate)):
+            await self.app(scope, receive, send)
+            return
+
+        started_at, started = time.time(), time.perf_counter()
+        chunks, request_bytes, response_bytes, status = [], 0, 0, 0
+
+        async def receive_traced():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                request_bytes += len(body)
+                if request_bytes <= self.max_body_bytes:
+                    chunks.append(body)
+            return message
+
+        async def send_traced(message):
+            nonlocal response_bytes, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_traced, send_traced)
+        except Exception:
+            status = status or 500  # what the outer error middleware will answer
+            raise
+        finally:
+            self.record(scope, chunks, request_bytes, started_at, time.perf_counter() - started, status, response_bytes)
+
+    def record(self, scope, chunks, request_bytes: int, started_at: float, duration: float, status: int, response_bytes: int):
+        headers = Headers(scope=scope)
+        content_type = headers.get("content-type", "")
+        body, captured = None, False
+        if request_bytes <= self.max_body_bytes:
+            body, captured = decode_body(content_type, b"".join(chunks))
+        identity_class, identity = identify(headers, body)
+        route = scope.get("route")
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        self.writer.write({
+            "ts": round(started_at, 6),
+            "method": scope["method"],
+            "route": getattr(route, "path", None) or "<unmatched>",
+            "path_params": {key: redact(key, str(value)) for key, value in scope.get("path_params", {}).items()},
+            "query": {key: redact(key, values) for key, values in query.items()},
+            "content_type": content_type.split(";")[0].strip() or None,
+            "request_bytes": request_bytes,
+            "body": redact("", body),
+            "body_captured": captured,
+            "status": status,
+            "response_bytes": response_bytes,
+            "duration_ms": round(duration * 1000, 3),
+            "identity_class": identity_class,
+            "identity": identity,
+        })
+        records_counter.inc()
+
+
+def enable_request_trace(app: FastAPI, writer: Optional[TraceWriter] = None) -> TraceWriter:
+    """
+    Adds ``RequestTraceMiddleware`` to the application.
+
+    Args:
+        app (FastAPI): The FastAPI application instance.
+        writer (Optional[TraceWriter]): Where records go. Defaults to a writer of ``REQUEST_TRACE_PATH``.
+
+    Returns:
+        TraceWriter: The writer, which the caller closes on shutdown.
+    """
+    writer = writer or TraceWriter()
+    app.add_middleware(RequestTraceMiddleware, writer=writer)
+    return writer
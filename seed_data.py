@@ -0,0 +1,321 @@
+# seed_data.py
+
+import io
+import os
+import csv
+import math
+import time
+import random
+import logging
+import argparse
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import accumulate
+from typing import List, Optional, Tuple
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+import database
+from database import Base, ContactDB, UserDB
+
+logger = logging.getLogger(__name__)
+
+SEED_CHUNK_USERS = int(os.environ.get("SEED_CHUNK_USERS", 1000))
+
+# bcrypt hash (12 rounds) of SEED_PASSWORD. Every seeded user shares it, so seeding never hashes.
+SEED_PASSWORD = "seed-password"
+SEED_PASSWORD_HASH = "$2b$12$/tLv/BX6L9LwL7W449a18exGh5Mu3VJE.w9JNohD3h3VVUSAhSCU."
+
+# Rough popularity weights, so a few names are common and most are rare.
+FIRST_NAMES = (
+    ("Olena", 30), ("Oleksandr", 28), ("Maria", 26), ("Andrii", 25), ("Iryna", 22), ("Dmytro", 22),
+    ("Anna", 20), ("Serhii", 20), ("Natalia", 18), ("Volodymyr", 16), ("Tetiana", 15), ("Mykola", 14),
+    ("Yulia", 12), ("Ivan", 12), ("Kateryna", 11), ("Taras", 9), ("Sofia", 9), ("Oleh", 8),
+    ("Viktoria", 7), ("Bohdan", 7), ("Daria", 6), ("Yurii", 6), ("Khrystyna", 4), ("Roman", 4),
+    ("Zoriana", 2), ("Ostap", 2), ("Solomiia", 1), ("Yaroslav", 1),
+)
+LAST_NAMES = (
+    ("Melnyk", 30), ("Shevchenko", 28), ("Kovalenko", 26), ("Bondarenko", 24), ("Boyko", 22),
+    ("Tkachenko", 20), ("Kravchenko", 18), ("Kovalchuk", 17), ("Koval", 16), ("Oliinyk", 15),
+    ("Shevchuk", 14), ("Polishchuk", 12), ("Bondar", 11), ("Tkachuk", 10), ("Marchenko", 9),
+    ("Lysenko", 8), ("Rudenko", 7), ("Savchenko", 6), ("Petrenko", 5), ("Moroz", 4),
+    ("Kuzmenko", 3), ("Hnatiuk", 2), ("Yatsenko", 1), ("Ostapchuk", 1),
+)
+# Reserved example domains only, so mail sent to seeded users (e.g. birthday digests) reaches nobody.
+EMAIL_DOMAINS = (("example.com", 45), ("example.net", 25), ("example.org", 15), ("mail.example.com", 10), ("inbox.example.org", 5))
+EMAIL_FORMATS = (("{first}.{last}", 40), ("{first}{last}", 25), ("{f}.{last}", 20), ("{first}_{last}", 15))
+PHONE_OPERATORS = ("50", "63", "66", "67", "68", "73", "93", "95", "96", "97", "98", "99")
+NOTES = ("Met at the conference", "College friend", "Neighbour", "Works at the bank", "Call after 6 pm")
+NOTE_SHARE = 0.2
+
+AGE_MEAN, AGE_STDDEV, AGE_MIN, AGE_MAX = 38, 16, 1, 95
+MAX_CONTACTS_FACTOR = 20
+
+USER_COLUMNS = ("id", "username", "email", "hashed_password", "is_active", "is_verified", "created_at", "role", "contact_version")
+CONTACT_COLUMNS = ("first_name", "last_name", "email", "phone_number", "birthday", "additional_data", "user_id", "updated_at", "version")
+
+
+@dataclass
+class SeedReport:
+    """
+    Summary and throughput of a seeding run.
+    """
+    users: int = 0
+    contacts: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.users + self.contacts) / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def _weighted(choices) -> Tuple[tuple, List[int]]:
+    values, weights = zip(*choices)
+    return values, list(accumulate(weights))
+
+
+# Every (first name, last name, email local part) combination, weighted by the product of its
+# parts' weights, so a person is drawn with a single ``choices`` call.
+_PEOPLE, _PEOPLE_WEIGHTS = _weighted(
+    ((first, last, email_format.format(first=first.lower(), last=last.lower(), f=first[0].lower())),
+     first_weight * last_weight * format_weight)
+    for first, first_weight in FIRST_NAMES
+    for last, last_weight in LAST_NAMES
+    for email_format, format_weight in EMAIL_FORMATS
+)
+_DOMAINS, _DOMAIN_WEIGHTS = _weighted(EMAIL_DOMAINS)
+_NOTES, _NOTE_WEIGHTS = _weighted(((None, 1 - NOTE_SHARE),) + tuple((note, NOTE_SHARE / len(NOTES)) for note in NOTES))
+
+
+def random_birthday(rng: random.Random, reference: date) -> date:
+    """
+    Returns a birthday with a normally distributed age (clipped to 1-95 years) and a uniform day of the year.
+    """
+    age = min(max(rng.gauss(AGE_MEAN, AGE_STDDEV), AGE_MIN), AGE_MAX)
+    return date.fromordinal(reference.toordinal() - int(age * 365.2425))
+
+
+def random_phone_number(rng: random.Random) -> str:
+    return f"+380{rng.choice(PHONE_OPERATORS)}{int(rng.random() * 10_000_000):07d}"
+
+
+def contact_count(rng: random.Random, contacts_per_user: int, vary_contacts: bool = True) -> int:
+    """
+    Returns how many contacts one user gets.
+
+    With ``vary_contacts`` the count is log-normally distributed with a mean of
+    ``contacts_per_user`` (most users have a few contacts, some have very many), capped at
+    ``MAX_CONTACTS_FACTOR`` times the mean; otherwise every user gets ``contacts_per_user``.
+    """
+    if not vary_contacts or contacts_per_user <= 0:
+        return max(contacts_per_user, 0)
+    sigma = 1.0
+    count = int(rng.lognormvariate(math.log(contacts_per_user) - sigma ** 2 / 2, sigma))
+    return min(count, contacts_per_user * MAX_CONTACTS_FACTOR)
+
+
+def generate_chunk(
+    first_user_id: int,
+    users: int,
+    contacts_per_user: int,
+    *,
+    seed: int = 0,
+    vary_contacts: bool = True,
+    password_hash: str = SEED_PASSWORD_HASH,
+    reference: Optional[date] = None,
+) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Generates the rows of users ``first_user_id`` to ``first_user_id + users - 1`` and their contacts.
+
+    The random generator is seeded from ``seed`` and ``first_user_id``, so a chunk comes out
+    the same whichever worker generates it. Usernames and emails embed the user ID (and the
+    contact's position), so they are unique without any lookups.
+
+    Args:
+        first_user_id (int): The ID of the first user of the chunk.
+        users (int): The number of users in the chunk.
+        contacts_per_user (int): The mean number of contacts per user.
+        seed (int, optional): The random seed of the run. Defaults to 0.
+        vary_contacts (bool, optional): Whether contact counts vary between users (see ``contact_count``). Defaults to True.
+        password_hash (str, optional): The password hash shared by all users. Defaults to ``SEED_PASSWORD_HASH``.
+        reference (Optional[date], optional): The date ages are counted from. Defaults to today.
+
+    Returns:
+        Tuple[List[tuple], List[tuple]]: The user rows (in ``USER_COLUMNS`` order) and the contact rows (in ``CONTACT_COLUMNS`` order).
+    """
+    rng = random.Random(f"{seed}:{first_user_id}")
+    reference = reference or date.today()
+    now = datetime.now(timezone.utc)
+    counts = [contact_count(rng, contacts_per_user, vary_contacts) for _ in range(users)]
+    total = sum(counts)
+    people = rng.choices(_PEOPLE, cum_weights=_PEOPLE_WEIGHTS, k=users + total)
+    domains = rng.choices(_DOMAINS, cum_weights=_DOMAIN_WEIGHTS, k=users + total)
+    notes = rng.choices(_NOTES, cum_weights=_NOTE_WEIGHTS, k=total)
+
+    user_rows = []
+    for offset in range(users):
+        user_id = first_user_id + offset
+        local = people[offset][2]
+        created_at = now - timedelta(seconds=int(rng.random() * 3 * 365 * 24 * 3600))
+        user_rows.append((
+            user_id, f"{local}{user_id}", f"{local}{user_id}@{domains[offset]}", password_hash,
+            rng.random() < 0.97, rng.random() < 0.8, created_at, "user", 0,
+        ))
+
+    contact_rows = []
+    position = users
+    for offset, count in enumerate(counts):
+        user_id = first_user_id + offset
+        for index in range(count):
+            first, last, local = people[position]
+            contact_rows.append((
+                first, last, f"{local}.{user_id}.{index}@{domains[position]}", random_phone_number(rng),
+                random_birthday(rng, reference), notes[position - users], user_id, now, 0,
+            ))
+            position += 1
+    return user_rows, contact_rows
+
+
+def _copy_rows(connection: Connection, table: str, columns: Tuple[str, ...], rows: List[tuple]):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def write_chunk(connection: Connection, user_rows: List[tuple], contact_rows: List[tuple]):
+    """
+    Inserts generated rows in the current transaction of ``connection``.
+
+    PostgreSQL (psycopg2) gets them through ``COPY ... FROM STDIN``; other databases through
+    an executemany ``INSERT``.
+    """
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        _copy_rows(connection, UserDB.__tablename__, USER_COLUMNS, user_rows)
+        _copy_rows(connection, ContactDB.__tablename__, CONTACT_COLUMNS, contact_rows)
+        return
+    connection.execute(insert(UserDB), [dict(zip(USER_COLUMNS, row)) for row in user_rows])
+    if contact_rows:
+        connection.execute(insert(ContactDB), [dict(zip(CONTACT_COLUMNS, row)) for row in contact_rows])
+
+
+@lru_cache(maxsize=None)
+def _worker_engine(url: str) -> Engine:
+    return create_engine(url, pool_size=1, max_overflow=0)
+
+
+def _seed_chunk(engine: Engine, first_user_id: int, users: int, contacts_per_user: int, options: dict) -> Tuple[int, int]:
+    user_rows, contact_rows = generate_chunk(first_user_id, users, contacts_per_user, **options)
+    with engine.begin() as connection:
+        write_chunk(connection, user_rows, contact_rows)
+    return len(user_rows), len(contact_rows)
+
+
+def _seed_chunk_in_worker(url: str, first_user_id: int, users: int, contacts_per_user: int, options: dict) -> Tuple[int, int]:
+    return _seed_chunk(_worker_engine(url), first_user_id, users, contacts_per_user, options)
+
+
+def _reset_sequences(engine: Engine):
+    # Users are inserted with explicit IDs, which PostgreSQL sequences do not notice.
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT MAX(id) FROM users))"))
+
+
+def seed(
+    engine: Engine,
+    users: int,
+    contacts_per_user: int = 100,
+    *,
+    workers: int = 1,
+    chunk_users: int = SEED_CHUNK_USERS,
+    seed: int = 0,
+    vary_contacts: bool = True,
+    password_hash: str = SEED_PASSWORD_HASH,
+    reference: Optional[date] = None,
+) -> SeedReport:
+    """
+    Bulk-inserts ``users`` users and their contacts after the existing rows.
+
+    Users are split into chunks of ``chunk_users``; each chunk is generated and written in
+    its own transaction. With more than one worker the chunks are spread over processes,
+    each with its own connection (SQLite allows a single writer, so it always uses one).
+    Passwords are not hashed: every user gets ``password_hash``.
+
+    Args:
+        engine (Engine): The engine of the database to seed. Its tables must exist.
+        users (int): The number of users to add.
+        contacts_per_user (int, optional): The mean number of contacts per user. Defaults to 100.
+        workers (int, optional): The number of processes writing chunks. Defaults to 1.
+        chunk_users (int, optional): The number of users per chunk. Defaults to ``SEED_CHUNK_USERS``.
+        seed (int, optional): The random seed; the same seed generates the same data. Defaults to 0.
+        vary_contacts (bool, optional): Whether contact counts vary between users (see ``contact_count``). Defaults to True.
+        password_hash (str, optional): The password hash shared by all users. Defaults to ``SEED_PASSWORD_HASH``.
+        reference (Optional[date], optional): The date ages are counted from. Defaults to today.
+
+    Returns:
+        SeedReport: The number of rows inserted and the elapsed time.
+    """
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        first_user_id = (connection.execute(select(func.max(UserDB.id))).scalar() or 0) + 1
+    options = {"seed": seed, "vary_contacts": vary_contacts, "password_hash": password_hash, "reference": reference or date.today()}
+    chunks = [
+        (first_user_id + start, min(chunk_users, users - start))
+        for start in range(0, users, chunk_users)
+    ]
+    report = SeedReport()
+
+    if workers > 1 and engine.dialect.name != "sqlite":
+        url = engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_seed_chunk_in_worker, url, first, count, contacts_per_user, options) for first, count in chunks]
+            for future in futures:
+                inserted_users, inserted_contacts = future.result()
+                report.users += inserted_users
+                report.contacts += inserted_contacts
+    else:
+        for first, count in chunks:
+            inserted_users, inserted_contacts = _seed_chunk(engine, first, count, contacts_per_user, options)
+            report.users += inserted_users
+            report.contacts += inserted_contacts
+            logger.debug("Seeded users %d-%d", first, first + count - 1)
+
+    _reset_sequences(engine)
+    report.elapsed_seconds = time.perf_counter() - started
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-insert synthetic users and contacts.")
+    parser.add_argument("--users", type=int, required=True, help="number of users to add")
+    parser.add_argument("--contacts-per-user", type=int, default=100, help="mean number of contacts per user")
+    parser.add_argument("--fixed-contacts", action="store_true", help="give every user exactly --contacts-per-user contacts")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel writer processes (SQLite always uses one)")
+    parser.add_argument("--chunk-users", type=int, default=SEED_CHUNK_USERS, help="users per chunk (and transaction)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--password", default=None, help=f"password of every seeded user (default: {SEED_PASSWORD!r}, prehashed)")
+    parser.add_argument("--database-url", default=database.DATABASE_URL, help="database to seed (default: DATABASE_URL)")
+    parser.add_argument("--create-schema", action="store_true", help="create missing tables first")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    engine = create_engine(args.database_url)
+    if args.create_schema:
+        Base.metadata.create_all(bind=engine)
+    password_hash = SEED_PASSWORD_HASH
+    if args.password is not None:
+        import crud
+        password_hash = crud.get_password_hash(args.password)
+    result = seed(
+        engine, args.users, args.contacts_per_user, workers=args.workers, chunk_users=args.chunk_users,
+        seed=args.seed, vary_contacts=not args.fixed_contacts, password_hash=password_hash,
+    )
+    print(
+        f"users={result.users} contacts={result.contacts} elapsed={result.elapsed_seconds:.2f}s "
+        f"rows/s={result.rows_per_second:.0f}"
+    )
@@ -0,0 +1,179 @@
+# server.py
+"""
+Production entrypoint: a Gunicorn master supervising Uvicorn workers.
+
+Usage:
+    python server.py
+
+The application is imported once in the master before the workers are forked, so the
+interpreter, the imported modules and the route tables are shared copy-on-write between
+workers. Workers run on uvloop with the httptools HTTP parser and are replaced after
+``WEB_MAX_REQUESTS`` requests (plus a random jitter, so they do not all restart at once)
+to bound memory growth. ``uvicorn main:app --reload`` remains the development command.
+"""
+
+import os
+import math
+from dataclasses import replace
+from typing import Optional
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+WEB_BIND = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+WEB_CONCURRENCY = os.environ.get("WEB_CONCURRENCY")
+WEB_WORKERS_PER_CORE = float(os.environ.get("WEB_WORKERS_PER_CORE", 1))
+WEB_MAX_WORKERS = int(os.environ.get("WEB_MAX_WORKERS", 16))
+WEB_MAX_REQUESTS = int(os.environ.get("WEB_MAX_REQUESTS", 10000))
+WEB_MAX_REQUESTS_JITTER = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 1000))
+WEB_TIMEOUT = int(os.environ.get("WEB_TIMEOUT", 60))
+WEB_GRACEFUL_TIMEOUT = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+WEB_KEEPALIVE = int(os.environ.get("WEB_KEEPALIVE", 5))
+WEB_LOOP = os.environ.get("WEB_LOOP", "uvloop")
+WEB_HTTP = os.environ.get("WEB_HTTP", "httptools")
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """
+    Returns the container CPU quota (cgroup v2 ``cpu.max`` or v1 CFS quota), if one is set.
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as quota_file, \
+                open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as period_file:
+            quota, period = int(quota_file.read()), int(period_file.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> float:
+    """
+    Returns the CPUs this process may use: its CPU affinity, capped by a container quota.
+
+    Returns:
+        float: The usable CPUs (at least 1).
+    """
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except AttributeError:  # not available on macOS
+        cpus = float(os.cpu_count() or 1)
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, limit)
+    return max(cpus, 1.0)
+
+
+def worker_count(cpus: Optional[float] = None, concurrency: Optional[str] = WEB_CONCURRENCY,
+                 per_core: float = WEB_WORKERS_PER_CORE, max_workers: int = WEB_MAX_WORKERS) -> int:
+    """
+    Decides how many worker processes to run.
+
+    Each Uvicorn worker is a single event loop that can keep one core busy, so the default
+    is one worker per usable CPU. ``WEB_CONCURRENCY`` sets the count explicitly.
+
+    Args:
+        cpus (Optional[float]): Usable CPUs. Defaults to ``available_cpus()``.
+        concurrency (Optional[str]): An explicit worker count (``WEB_CONCURRENCY``).
+        per_core (float): Workers per CPU (``WEB_WORKERS_PER_CORE``).
+        max_workers (int): Upper bound for the computed count (``WEB_MAX_WORKERS``).
+
+    Returns:
+        int: The number of workers (at least 1).
+    """
+    if concurrency:
+        return max(int(concurrency), 1)
+    cpus = available_cpus() if cpus is None else cpus
+    return max(min(math.ceil(cpus * per_core), max_workers), 1)
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    """
+    Uvicorn worker on uvloop and httptools (``WEB_LOOP`` / ``WEB_HTTP`` select others).
+    """
+    CONFIG_KWARGS = {"loop": WEB_LOOP, "http": WEB_HTTP}
+
+
+def gunicorn_options(workers: Optional[int] = None) -> dict:
+    """
+    Returns the Gunicorn settings of the production server.
+
+    Args:
+        workers (Optional[int]): The worker count. Defaults to ``worker_count()``.
+
+    Returns:
+        dict: Gunicorn setting names and values.
+    """
+    options = {
+        "bind": WEB_BIND,
+        "workers": workers or worker_count(),
+        "worker_class": f"{__name__}.ProductionUvicornWorker",
+        "preload_app": True,
+        "max_requests": WEB_MAX_REQUESTS,
+        "max_requests_jitter": WEB_MAX_REQUESTS_JITTER,
+        "timeout": WEB_TIMEOUT,
+        "graceful_timeout": WEB_GRACEFUL_TIMEOUT,
+        "keepalive": WEB_KEEPALIVE,
+        "accesslog": "-",
+        "errorlog": "-",
+        "post_fork": post_fork,
+    }
+    if os.path.isdir("/dev/shm"):
+        # Heartbeat files on tmpfs; a disk-backed /tmp can stall workers in containers.
+        options["worker_tmp_dir"] = "/dev/shm"
+    return options
+
+
+def load_app():
+    """
+    Imports and builds the application in the master process.
+
+    The schema is created here once, instead of by every worker's lifespan, and the
+    connection pool used for it is disposed so no connection is shared across the fork.
+
+    Returns:
+        FastAPI: The application served by every worker.
+    """
+    import database
+    from main import create_app
+    from settings import Settings
+
+    settings = Settings.from_env()
+    if settings.create_schema:
+        database.Base.metadata.create_all(bind=database.engine)
+        database.engine.dispose()
+    return create_app(replace(settings, create_schema=False))
+
+
+def post_fork(server, worker):
+    """
+    Makes sure a forked worker never reuses a pooled connection of the master.
+    """
+    import database
+    database.engine.dispose(close=False)
+
+
+class ProductionServer(BaseApplication):
+    """
+    Gunicorn application serving ``load_app()`` with ``gunicorn_options()``.
+    """
+
+    def __init__(self, options: Optional[dict] = None):
+        self.options = options if options is not None else gunicorn_options()
+        super().__init__()
+
+    def load_config(self):
+        for name, value in self.options.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        return load_app()
+
+
+if __name__ == "__main__":
+    ProductionServer().run()
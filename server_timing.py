@@ -0,0 +1,211 @@
+# server_timing.py
+
+import os
+import time
+import asyncio
+import functools
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import database, redis_utils
+
+SERVER_TIMING_AUDIENCE = os.environ.get("SERVER_TIMING_AUDIENCE", "admins").lower()
+
+# Metric names in header order; "total" is always last.
+METRICS = ("auth", "db", "cache", "hash", "render")
+
+
+class RequestTimings:
+    """
+    The durations accumulated while serving one request, in seconds per metric.
+
+    Attributes:
+        durations (Dict[str, float]): Time spent per metric name.
+        admin (bool): Whether the request was authenticated as an administrator.
+    """
+    __slots__ = ("durations", "active", "admin")
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.active = set()
+        self.admin = False
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        """
+        Formats the ``Server-Timing`` header value, in milliseconds, e.g. ``"db;dur=3.2, total;dur=5.1"``.
+        """
+        parts = [f"{name};dur={self.durations[name] * 1000:.1f}" for name in METRICS if name in self.durations]
+        parts.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations.items() if name not in METRICS)
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("server_timings", default=None)
+
+
+def current() -> Optional[RequestTimings]:
+    """
+    Returns the timings of the request being served, or None outside timed requests.
+    """
+    return _timings.get()
+
+
+class timer:
+    """
+    Context manager adding the time spent in a block to a metric of the current request.
+
+    Outside timed requests it only looks up a context variable. A block nested in a
+    running timer of the same metric is not counted twice.
+
+    Args:
+        name (str): The metric, e.g. "db".
+    """
+    __slots__ = ("name", "timings", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.timings = None
+
+    def __enter__(self):
+        timings = _timings.get()
+        if timings is not None and self.name not in timings.active:
+            timings.active.add(self.name)
+            self.timings = timings
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.started)
+            self.timings.active.discard(self.name)
+            self.timings = None
+
+
+def timed(name: str):
+    """
+    Decorates a function, sync or async, to count its duration in a ``timer``.
+    """
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timer(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def note_user(user):
+    """
+    Records who the current request is authenticated as, which decides whether it gets the header.
+    """
+    timings = _timings.get()
+    if timings is not None:
+        timings.admin = getattr(user, "role", None) == "admin"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._server_timer = timer("db").__enter__()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    server_timer = getattr(context, "_server_timer", None)
+    if server_timer is not None:
+        server_timer.__exit__(None, None, None)
+
+
+def _handle_error(exception_context):
+    server_timer = getattr(exception_context.execution_context, "_server_timer", None)
+    if server_timer is not None:
+        server_timer.__exit__(None, None, None)
+
+
+def instrument_engine(engine: Engine):
+    """
+    Counts every SQL statement of an engine as "db" time.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def instrument_redis(client):
+    """
+    Counts every command of a Redis client as "cache" time.
+    """
+    execute_command = client.execute_command
+    if getattr(execute_command, "_server_timed", False):
+        return
+    timed_execute_command = timed("cache")(execute_command)
+    timed_execute_command._server_timed = True
+    client.execute_command = timed_execute_command
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a ``Server-Timing`` header with the request's timings.
+
+    The header lists the time spent authenticating (``auth``, which includes its own
+    database and cache calls), in SQL statements (``db``), Redis commands (``cache``),
+    password hashing (``hash``) and response encoding (``render``), plus the ``total``
+    until the response started, in milliseconds. Only metrics that took time are listed.
+
+    With ``audience`` "admins" the header is only added for requests authenticated as an
+    administrator (see ``note_user``), and requests without credentials are not timed at
+    all; with "everyone" every response carries it.
+
+    Args:
+        app: The wrapped ASGI application.
+        audience (str): "admins" or "everyone".
+    """
+
+    def __init__(self, app, audience: str = SERVER_TIMING_AUDIENCE):
+        self.app = app
+        self.everyone = audience == "everyone"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.everyone or any(name == b"authorization" for name, _ in scope["headers"])):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = RequestTimings()
+        token = _timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and (self.everyone or timings.admin):
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header(time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+
+
+def enable_server_timing(app: FastAPI):
+    """
+    Adds ``ServerTimingMiddleware`` to the application and times the database engine and the Redis client.
+
+    Args:
+        app (FastAPI): The FastAPI application instance.
+    """
+    instrument_engine(database.engine)
+    redis_utils.redis_client.add_setup(instrument_redis)
+    app.add_middleware(ServerTimingMiddleware)
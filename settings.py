@@ -0,0 +1,68 @@
+# settings.py
+
+import os
+from dataclasses import dataclass
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).lower() == "true"
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Options deciding which subsystems ``main.create_app`` wires into an application.
+
+    Settings of the subsystems themselves (pool sizes, timeouts, URLs) stay with their
+    modules; these flags only choose what the application starts.
+
+    Attributes:
+        create_schema (bool): Create missing tables at startup (default: True).
+        outbox_worker (bool): Run the email outbox worker in this process (default: True).
+        birthday_scheduler (bool): Run the daily birthday reminder job in this process (default: False).
+        compression (bool): Compress responses with ``CompressionMiddleware`` (default: True).
+        warmup (bool): Warm up connection pools, password hashing and models at startup (default: True).
+        request_trace (bool): Record sampled request shapes with ``RequestTraceMiddleware`` (default: False).
+        loop_monitor (bool): Report event loop stalls with ``loop_monitor.LoopMonitor`` (default: False).
+        profiling (bool): Let administrators profile single requests with ``profiling.ProfilingMiddleware`` (default: False).
+        tracing (bool): Record OpenTelemetry spans with ``tracing.TracingMiddleware`` and instrumented clients (default: False).
+        server_timing (bool): Add a ``Server-Timing`` header with ``server_timing.ServerTimingMiddleware`` (default: True).
+        admission_control (bool): Limit concurrent requests per route class with
+            ``admission.AdmissionControlMiddleware`` (default: True).
+    """
+    create_schema: bool = True
+    outbox_worker: bool = True
+    birthday_scheduler: bool = False
+    compression: bool = True
+    warmup: bool = True
+    request_trace: bool = False
+    loop_monitor: bool = False
+    profiling: bool = False
+    tracing: bool = False
+    server_timing: bool = True
+    admission_control: bool = True
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Reads the settings from ``DATABASE_CREATE_SCHEMA``, ``OUTBOX_WORKER_ENABLED``,
+        ``BIRTHDAY_REMINDER_SCHEDULER_ENABLED``, ``COMPRESSION_ENABLED``, ``WARMUP_ENABLED``,
+        ``REQUEST_TRACE_ENABLED``, ``LOOP_MONITOR_ENABLED``, ``PROFILING_ENABLED``,
+        ``TRACING_ENABLED``, ``SERVER_TIMING_ENABLED`` and ``ADMISSION_CONTROL_ENABLED``.
+
+        Returns:
+            Settings: The settings for this process.
+        """
+        return cls(
+            create_schema=_flag("DATABASE_CREATE_SCHEMA", "true"),
+            outbox_worker=_flag("OUTBOX_WORKER_ENABLED", "true"),
+            birthday_scheduler=_flag("BIRTHDAY_REMINDER_SCHEDULER_ENABLED", "false"),
+            compression=_flag("COMPRESSION_ENABLED", "true"),
+            warmup=_flag("WARMUP_ENABLED", "true"),
+            request_trace=_flag("REQUEST_TRACE_ENABLED", "false"),
+            loop_monitor=_flag("LOOP_MONITOR_ENABLED", "false"),
+            profiling=_flag("PROFILING_ENABLED", "false"),
+            tracing=_flag("TRACING_ENABLED", "false"),
+            server_timing=_flag("SERVER_TIMING_ENABLED", "true"),
+            admission_control=_flag("ADMISSION_CONTROL_ENABLED", "true"),
+        )
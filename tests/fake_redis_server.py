@@ -0,0 +1,189 @@
+# tests/fake_redis_server.py
+
+import socketserver
+import threading
+import time
+
+from redis.crc import key_slot
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    """
+    Handles one client connection speaking a small subset of RESP.
+    """
+
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        if not header.startswith(b"*"):
+            return header.strip().decode().split()
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        server = self.server.owner
+        resp3 = False
+        while True:
+            try:
+                command = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if command is None:
+                return
+            if server.latency:
+                time.sleep(server.latency)
+            server.commands.append(command)
+            if command[0].upper() == "HELLO" and command[1:2] == ["3"]:
+                resp3 = True
+            try:
+                self.wfile.write(encode(server.execute(command), resp3))
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+
+class Reply(bytes):
+    """
+    A pre-encoded RESP reply (status or error line) passed through unchanged.
+    """
+
+
+OK = Reply(b"+OK\r\n")
+
+
+def encode(value, resp3: bool = False) -> bytes:
+    """
+    Encodes a Python value as a RESP2 reply, or RESP3 once the client sent ``HELLO 3``.
+    """
+    if isinstance(value, Reply):
+        return bytes(value)
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, dict):
+        if resp3:
+            return b"%%%d\r\n" % len(value) + b"".join(encode(k, resp3) + encode(v, resp3) for k, v in value.items())
+        value = [item for pair in value.items() for item in pair]
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item, resp3) for item in value)
+    data = str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+KEY_COMMANDS = {"GET", "SET", "SETEX", "DEL", "EXISTS"}
+
+# COMMAND reply entries: name, arity, flags, first key, last key, key step
+COMMAND_TABLE = [
+    ["get", 2, ["readonly"], 1, 1, 1],
+    ["set", -3, ["write"], 1, 1, 1],
+    ["setex", 4, ["write"], 1, 1, 1],
+    ["del", -2, ["write"], 1, -1, 1],
+    ["exists", -2, ["readonly"], 1, -1, 1],
+    ["ping", -1, ["fast"], 0, 0, 0],
+]
+
+
+class FakeRedisServer:
+    """
+    A local, threaded stand-in for a Redis node.
+
+    Supports HELLO, PING, GET, SET, SETEX, DEL and EXISTS with string values, and sleeps
+    ``latency`` seconds before answering each command so tests can exercise client
+    timeouts and the circuit breaker against a real socket.
+
+    Several instances can be combined into multi-node topologies:
+
+    * ``sentinel_masters`` makes the server answer ``SENTINEL MASTERS`` like a Sentinel,
+      mapping service names to the ``(host, port)`` of a master.
+    * ``cluster`` (a shared list of ``(first_slot, last_slot, server)`` ranges) makes the
+      server answer ``CLUSTER SLOTS`` and reply ``MOVED``/``CROSSSLOT`` for keys it does
+      not own, like a Redis Cluster node.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.data = {}
+        self.commands = []
+        self.sentinel_masters = None
+        self.cluster = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "FakeRedisServer":
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RESPHandler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _check_slots(self, keys):
+        """
+        Returns a MOVED/CROSSSLOT error if this cluster node must not serve ``keys``.
+        """
+        slots = {key_slot(key.encode()) for key in keys}
+        if len(slots) > 1:
+            return Reply(b"-CROSSSLOT Keys in request don't hash to the same slot\r\n")
+        slot = slots.pop()
+        for first, last, owner in self.cluster:
+            if first <= slot <= last and owner is not self:
+                return Reply(b"-MOVED %d 127.0.0.1:%d\r\n" % (slot, owner.port))
+        return None
+
+    def execute(self, command):
+        """
+        Executes one command and returns the reply value (encoded by the handler).
+        """
+        name = command[0].upper()
+        args = command[1:]
+        if name == "SENTINEL" and self.sentinel_masters is not None:
+            if args[0].upper() == "MASTERS":
+                return [
+                    {"name": service, "ip": host, "port": str(port), "flags": "master", "num-other-sentinels": "0"}
+                    for service, (host, port) in self.sentinel_masters.items()
+                ]
+            if args[0].upper() == "GET-MASTER-ADDR-BY-NAME":
+                host, port = self.sentinel_masters[args[1]]
+                return [host, str(port)]
+        if name == "CLUSTER" and self.cluster is not None and args[0].upper() == "SLOTS":
+            return [[first, last, ["127.0.0.1", owner.port, f"node-{owner.port}"]] for first, last, owner in self.cluster]
+        if name in KEY_COMMANDS and self.cluster is not None:
+            keys = args[:1] if name in {"GET", "SET", "SETEX"} else args
+            error = self._check_slots(keys)
+            if error is not None:
+                return error
+        if name == "HELLO":
+            return {"server": "redis", "version": "7.4.0", "proto": 3, "id": 1, "mode": "standalone", "role": "master", "modules": []}
+        if name == "COMMAND":
+            return COMMAND_TABLE
+        if name == "PING":
+            return Reply(b"+PONG\r\n")
+        if name == "GET":
+            return self.data.get(args[0])
+        if name == "SET":
+            if "NX" in (arg.upper() for arg in args[2:]) and args[0] in self.data:
+                return None
+            self.data[args[0]] = args[1]
+            return OK
+        if name == "SETEX":
+            self.data[args[0]] = args[2]
+            return OK
+        if name == "DEL":
+            return sum(1 for key in args if self.data.pop(key, None) is not None)
+        if name == "EXISTS":
+            return sum(1 for key in args if key in self.data)
+        # CLIENT SETINFO, SELECT and other connection set-up commands
+        return OK
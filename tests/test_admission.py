@@ -0,0 +1,172 @@
+# tests/test_admission.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import httpx
+from fastapi import FastAPI
+
+import admission
+import main
+from settings import Settings
+
+
+class TestClassify(unittest.TestCase):
+    """
+    Tests the mapping of requests to route classes.
+    """
+
+    def test_routes_are_classified(self):
+        self.assertEqual(admission.classify("POST", "/login"), "cpu")
+        self.assertEqual(admission.classify("POST", "/password-reset-request"), "cpu")
+        self.assertEqual(admission.classify("GET", "/contacts"), "db")
+        self.assertEqual(admission.classify("DELETE", "/contacts/batch"), "db")
+        self.assertEqual(admission.classify("GET", "/users/me"), "cheap")
+        self.assertEqual(admission.classify("GET", "/contacts/5"), "default")
+        self.assertEqual(admission.classify("GET", "/login"), "default")
+
+    def test_exempt_paths_have_no_class(self):
+        self.assertIsNone(admission.classify("GET", "/health/ready", ("/health/", "/metrics")))
+
+    def test_parse_budgets(self):
+        self.assertEqual(admission.parse_budgets("cpu=4, db=8", int), {"cpu": 4, "db": 8})
+        with self.assertRaises(ValueError):
+            admission.parse_budgets("cpu")
+
+
+class TestBudget(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests the per-class concurrency limit and wait queue.
+    """
+
+    async def test_waiting_requests_are_admitted_in_order_or_rejected(self):
+        budget = admission.Budget("test", limit=1, max_queue=1, timeout=1)
+        self.assertIsNone(await budget.acquire())
+        waiting = asyncio.create_task(budget.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(await budget.acquire(), "queue_full")
+
+        budget.release()
+        self.assertIsNone(await waiting)
+        self.assertEqual(budget.in_flight, 1)
+        budget.release()
+        self.assertEqual(budget.in_flight, 0)
+
+    async def test_wait_times_out(self):
+        budget = admission.Budget("test", limit=1, max_queue=1, timeout=0.05)
+        await budget.acquire()
+        self.assertEqual(await budget.acquire(), "timeout")
+        budget.release()
+        self.assertEqual(budget.in_flight, 0)
+        self.assertIsNone(await budget.acquire())
+
+    async def test_slot_handed_over_as_the_wait_times_out_is_returned(self):
+        budget = admission.Budget("test", limit=1, max_queue=1, timeout=1)
+        await budget.acquire()
+
+        async def release_then_time_out(waiter, timeout):
+            budget.release()
+            raise asyncio.TimeoutError
+
+        with patch.object(admission.asyncio, "wait_for", release_then_time_out):
+            self.assertEqual(await budget.acquire(), "timeout")
+        self.assertEqual(budget.in_flight, 0)
+        self.assertIsNone(await budget.acquire())
+
+    async def test_cancelled_waiters_give_up_their_place(self):
+        budget = admission.Budget("test", limit=1, max_queue=2, timeout=1)
+        await budget.acquire()
+        cancelled = asyncio.create_task(budget.acquire())
+        waiting = asyncio.create_task(budget.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+        budget.release()
+        self.assertIsNone(await waiting)
+        self.assertEqual(budget.in_flight, 1)
+
+
+class TestAdmissionControlMiddleware(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests that overload of one route class is shed without affecting the others.
+    """
+
+    async def asyncSetUp(self):
+        self.release = asyncio.Event()
+        app = FastAPI()
+
+        @app.post("/login")
+        async def login():
+            await self.release.wait()
+            return {"ok": True}
+
+        @app.get("/users/me")
+        async def me():
+            return {"ok": True}
+
+        @app.get("/health/live")
+        async def live():
+            await self.release.wait()
+            return {"ok": True}
+
+        app.add_middleware(
+            admission.AdmissionControlMiddleware,
+            limits={"cpu": 1, "cheap": 1}, queue_limits={"cpu": 1}, timeouts={"cpu": 0.1}, retry_after=3,
+            exempt=("/health/",),
+        )
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        admission.rejected_counter.reset()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_overloaded_class_is_shed_with_retry_after(self):
+        first = asyncio.create_task(self.client.post("/login"))
+        await asyncio.sleep(0.02)
+        queued, full = await asyncio.gather(self.client.post("/login"), self.client.post("/login"))
+
+        self.assertEqual({queued.status_code, full.status_code}, {503})
+        self.assertEqual(queued.headers["retry-after"], "3")
+        self.assertEqual(admission.rejected_counter.value(route_class="cpu", reason="timeout"), 1)
+        self.assertEqual(admission.rejected_counter.value(route_class="cpu", reason="queue_full"), 1)
+        # Cheap requests are served while logins are saturated.
+        self.assertEqual((await self.client.get("/users/me")).status_code, 200)
+        self.release.set()
+        self.assertEqual((await first).status_code, 200)
+
+    async def test_exempt_paths_and_unlimited_classes_are_not_limited(self):
+        checks = [asyncio.create_task(self.client.get("/health/live")) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        self.release.set()
+        self.assertEqual([(await check).status_code for check in checks], [200, 200, 200])
+
+    def test_create_app_adds_the_middleware_by_default(self):
+        enabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+        disabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False, admission_control=False))
+        self.assertIn(admission.AdmissionControlMiddleware, [middleware.cls for middleware in enabled.user_middleware])
+        self.assertNotIn(admission.AdmissionControlMiddleware, [middleware.cls for middleware in disabled.user_middleware])
+
+    async def test_shed_cross_origin_requests_carry_cors_headers(self):
+        app = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            with patch.object(admission.Budget, "acquire", AsyncMock(return_value="queue_full")):
+                shed = await client.post("/login", headers={"Origin": "http://example.com"})
+                preflight = await client.options("/login", headers={
+                    "Origin": "http://example.com", "Access-Control-Request-Method": "POST",
+                })
+
+        self.assertEqual(shed.status_code, 503)
+        self.assertIn("retry-after", shed.headers)
+        self.assertIn("access-control-allow-origin", shed.headers)
+        self.assertEqual(preflight.status_code, 200)
+        self.assertIn("access-control-allow-origin", preflight.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
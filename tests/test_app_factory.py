@@ -0,0 +1,85 @@
+# tests/test_app_factory.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tempfile
+import subprocess
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import birthday_reminders
+import email_outbox
+import main
+from settings import Settings
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class TestImportSideEffects(unittest.TestCase):
+    """
+    Tests that importing the application opens no connections and creates nothing.
+    """
+
+    def test_import_needs_no_services(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database_path = os.path.join(directory, "app.db")
+            env = {key: value for key, value in os.environ.items() if not key.startswith("MAIL_")}
+            env.update(
+                DATABASE_URL=f"sqlite:///{database_path}",
+                SECRET_KEY="secret",
+                REDIS_MODE="cluster",
+                REDIS_CLUSTER_NODES="127.0.0.1:1",
+            )
+            result = subprocess.run(
+                [sys.executable, "-c", "import main; assert main.app.state.settings.create_schema"],
+                cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertFalse(os.path.exists(database_path))
+
+
+class TestCreateApp(unittest.TestCase):
+    """
+    Tests that ``create_app`` starts the selected subsystems with the lifespan.
+    """
+
+    def test_settings_from_env(self):
+        with patch.dict(os.environ, {"OUTBOX_WORKER_ENABLED": "false", "BIRTHDAY_REMINDER_SCHEDULER_ENABLED": "true"}):
+            settings = Settings.from_env()
+        self.assertFalse(settings.outbox_worker)
+        self.assertTrue(settings.birthday_scheduler)
+        self.assertTrue(settings.create_schema)
+
+    def test_lifespan_runs_selected_subsystems(self):
+        settings = Settings(create_schema=False, outbox_worker=True, birthday_scheduler=True, compression=False, warmup=False)
+        with patch.object(email_outbox.OutboxWorker, "start") as start, \
+                patch.object(email_outbox.OutboxWorker, "stop") as stop, \
+                patch.object(birthday_reminders, "_scheduler_loop") as scheduler_loop, \
+                patch.object(main.database.Base.metadata, "create_all") as create_all:
+            app = main.create_app(settings)
+            with TestClient(app):
+                start.assert_called_once()
+                stop.assert_not_called()
+            stop.assert_awaited_once()
+        scheduler_loop.assert_called_once()
+        create_all.assert_not_called()
+        self.assertIs(app.state.settings, settings)
+
+    def test_disabled_subsystems_are_not_started(self):
+        settings = Settings(create_schema=True, outbox_worker=False, birthday_scheduler=False, warmup=False)
+        with patch.object(email_outbox, "run_outbox_worker") as run_outbox_worker, \
+                patch.object(birthday_reminders, "run_birthday_scheduler") as run_birthday_scheduler, \
+                patch.object(main.database.Base.metadata, "create_all") as create_all:
+            with TestClient(main.create_app(settings)) as client:
+                self.assertEqual(client.get("/metrics").status_code, 200)
+        run_outbox_worker.assert_not_called()
+        run_birthday_scheduler.assert_not_called()
+        create_all.assert_called_once_with(bind=main.database.engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -88,7 +88,7 @@ async def test_get_current_user_valid_token(mock_db, mock_redis):
 
     user = await get_current_user(token=access_token, db=mock_db, redis=mock_redis)
     assert user == test_user
-    mock_redis.get.assert_called_once_with("user:1")
+    mock_redis.get.assert_called_once_with("user:{1}")
     crud.get_user.assert_called_once_with(mock_db, user_id=1)
     mock_redis.setex.assert_called_once()
 
@@ -102,7 +102,7 @@ async def test_get_current_user_valid_token_from_cache(mock_db, mock_redis):
     user = await get_current_user(token=access_token, db=mock_db, redis=mock_redis)
     assert user.id == test_user.id
     assert user.email == test_user.email
-    mock_redis.get.assert_called_once_with("user:1")
+    mock_redis.get.assert_called_once_with("user:{1}")
     crud.get_user.assert_not_called()
     mock_redis.setex.assert_not_called()
 
@@ -141,7 +141,7 @@ async def test_get_current_user_user_not_found(mock_db, mock_redis):
         await get_current_user(token=access_token, db=mock_db, redis=mock_redis)
     assert excinfo.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert "Could not validate credentials" in excinfo.value.detail
-    mock_redis.get.assert_called_once_with("user:999")
+    mock_redis.get.assert_called_once_with("user:{999}")
     crud.get_user.assert_called_once_with(mock_db, user_id=999)
     mock_redis.setex.assert_not_called()
 
@@ -155,8 +155,8 @@ async def test_get_current_user_invalid_cached_data(mock_db, mock_redis):
 
     user = await get_current_user(token=access_token, db=mock_db, redis=mock_redis)
     assert user == test_user
-    mock_redis.get.assert_called_once_with("user:1")
-    mock_redis.delete.assert_called_once_with("user:1")
+    mock_redis.get.assert_called_once_with("user:{1}")
+    mock_redis.delete.assert_called_once_with("user:{1}")
     crud.get_user.assert_called_once_with(mock_db, user_id=1)
     mock_redis.setex.assert_called_once()
 
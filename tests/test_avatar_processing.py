@@ -0,0 +1,160 @@
+# tests/test_avatar_processing.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import avatar_processing
+import avatar_storage
+import crud
+from database import AvatarDB, Base
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def encode_image(size=(1200, 800), color=(200, 30, 30), format="JPEG", mode="RGB"):
+    output = io.BytesIO()
+    Image.new(mode, size, color).save(output, format=format)
+    return output.getvalue()
+
+
+class TestProcessImage(unittest.TestCase):
+    """
+    Tests the resize and re-encode step.
+    """
+
+    def test_photo_is_cropped_to_square_webp(self):
+        data = encode_image()
+        content = avatar_processing.process_image(data, size=256)
+        with Image.open(io.BytesIO(content)) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (256, 256))
+        self.assertLess(len(content), len(data))
+
+    def test_output_is_deterministic(self):
+        data = encode_image()
+        self.assertEqual(avatar_processing.process_image(data), avatar_processing.process_image(data))
+
+    def test_transparency_is_kept(self):
+        content = avatar_processing.process_image(encode_image(color=(0, 0, 0, 0), format="PNG", mode="RGBA"), size=64)
+        with Image.open(io.BytesIO(content)) as image:
+            self.assertEqual(image.mode, "RGBA")
+
+    def test_exif_orientation_is_applied(self):
+        image = Image.new("RGB", (400, 200), (255, 0, 0))
+        image.paste((0, 0, 255), (200, 0, 400, 200))
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90 degrees clockwise: the red left half ends up on top
+        output = io.BytesIO()
+        image.save(output, format="JPEG", exif=exif)
+
+        content = avatar_processing.process_image(output.getvalue(), size=64)
+        with Image.open(io.BytesIO(content)) as avatar:
+            top, bottom = avatar.convert("RGB").getpixel((32, 4)), avatar.convert("RGB").getpixel((32, 60))
+        self.assertGreater(top[0], top[2])
+        self.assertGreater(bottom[2], bottom[0])
+
+    def test_invalid_and_oversized_images_are_rejected(self):
+        with self.assertRaises(avatar_processing.InvalidAvatarImage):
+            avatar_processing.process_image(b"not an image")
+        with self.assertRaises(avatar_processing.InvalidAvatarImage):
+            avatar_processing.process_image(encode_image(size=(1000, 1000)), max_pixels=1000)
+
+    def test_pixel_limit_is_exact(self):
+        max_image_pixels = Image.MAX_IMAGE_PIXELS
+        with self.assertRaises(avatar_processing.InvalidAvatarImage):
+            avatar_processing.process_image(encode_image(size=(150, 100)), max_pixels=10_000)
+        with self.assertRaises(avatar_processing.InvalidAvatarImage):
+            avatar_processing.process_image(encode_image(size=(101, 100)), max_pixels=10_000)
+        self.assertTrue(avatar_processing.process_image(encode_image(size=(100, 100)), max_pixels=10_000))
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, max_image_pixels)
+
+    def test_decode_base64_image(self):
+        self.assertEqual(avatar_processing.decode_base64_image("data:image/png;base64,aGVsbG8="), b"hello")
+        self.assertEqual(avatar_processing.decode_base64_image("aGVsbG8="), b"hello")
+        with self.assertRaises(avatar_processing.InvalidAvatarImage):
+            avatar_processing.decode_base64_image("not base64!")
+
+
+class TestStoreAvatar(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests the process-pool pipeline and content-hash deduplication.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        avatar_processing.upload_bytes_counter.reset()
+        avatar_processing.dedup_hits_counter.reset()
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        avatar_processing.shutdown_executor()
+
+    async def test_repeated_image_is_uploaded_once(self):
+        data = encode_image()
+        with patch("cloudinary.uploader.upload", return_value={"url": "http://example.com/a.webp"}) as upload:
+            first = await avatar_processing.store_avatar(self.db, data)
+            second = await avatar_processing.store_avatar(self.db, data)
+
+        self.assertEqual(first, second)
+        self.assertEqual(upload.call_count, 1)
+        self.assertTrue(upload.call_args.kwargs["public_id"].startswith("avatars/"))
+        stored = self.db.query(AvatarDB).one()
+        self.assertEqual(upload.call_args.kwargs["public_id"], f"avatars/{stored.content_hash}")
+        self.assertEqual(avatar_processing.dedup_hits_counter.value(), 1)
+        self.assertEqual(avatar_processing.upload_bytes_counter.value(), stored.size_bytes)
+        self.assertLess(stored.size_bytes, len(data))
+
+    async def test_failed_upload_is_not_recorded(self):
+        with patch("cloudinary.uploader.upload", side_effect=RuntimeError("boom")):
+            self.assertIsNone(await avatar_processing.store_avatar(self.db, encode_image()))
+        self.assertEqual(self.db.query(AvatarDB).count(), 0)
+
+    async def test_invalid_image_raises(self):
+        with self.assertRaises(avatar_processing.InvalidAvatarImage):
+            await avatar_processing.preprocess_avatar(b"not an image")
+
+    async def test_preprocessing_can_be_disabled(self):
+        data = encode_image()
+        with patch.object(avatar_processing, "AVATAR_PREPROCESSING_ENABLED", False), \
+                patch("cloudinary.uploader.upload", return_value={"url": "http://example.com/raw.jpg"}) as upload:
+            self.assertEqual(await avatar_processing.store_avatar(self.db, data), "http://example.com/raw.jpg")
+        self.assertEqual(upload.call_args.args[0].getvalue(), data)
+        self.assertEqual(avatar_processing.upload_bytes_counter.value(), len(data))
+
+    def test_create_avatar_returns_existing_row_on_conflict(self):
+        first = crud.create_avatar(self.db, "a" * 64, "http://example.com/1.webp", 10, "cloudinary")
+        second = crud.create_avatar(self.db, "a" * 64, "http://example.com/2.webp", 10, "cloudinary")
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.url, "http://example.com/1.webp")
+
+    async def test_switching_backend_stores_the_image_again(self):
+        data = encode_image()
+        with patch("cloudinary.uploader.upload", return_value={"url": "http://example.com/a.webp"}):
+            self.assertEqual(await avatar_processing.store_avatar(self.db, data), "http://example.com/a.webp")
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.object(avatar_storage, "storage", avatar_storage.LocalAvatarStorage(directory, "/avatars")):
+            url = await avatar_processing.store_avatar(self.db, data)
+            self.assertTrue(url.startswith("/avatars/"))
+            self.assertEqual(await avatar_processing.store_avatar(self.db, data), url)
+        self.assertEqual(sorted(avatar.backend for avatar in self.db.query(AvatarDB)), ["cloudinary", "local"])
+
+
+if __name__ == "__main__":
+    unittest.main()
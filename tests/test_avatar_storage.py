@@ -0,0 +1,152 @@
+# tests/test_avatar_storage.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+import hashlib
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import avatar_processing
+import avatar_storage
+from database import Base, UserDB
+from main import app, get_db
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+CONTENT = b"webp bytes"
+CONTENT_HASH = hashlib.sha256(CONTENT).hexdigest()
+
+
+class TestStorageBackends(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests the storage backends in isolation.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    async def test_local_save_is_idempotent(self):
+        storage = avatar_storage.LocalAvatarStorage(self.directory.name, base_url="/avatars/")
+        url = await storage.save(CONTENT_HASH, CONTENT, "image/webp")
+        self.assertEqual(url, f"/avatars/{CONTENT_HASH}.webp")
+        self.assertEqual(await storage.save(CONTENT_HASH, CONTENT, "image/webp"), url)
+        self.assertEqual(os.listdir(self.directory.name), [f"{CONTENT_HASH}.webp"])
+        with open(storage.path_for(f"{CONTENT_HASH}.webp"), "rb") as file:
+            self.assertEqual(file.read(), CONTENT)
+
+    async def test_s3_puts_immutable_object(self):
+        client = MagicMock()
+        storage = avatar_storage.S3AvatarStorage(bucket="media", endpoint_url="http://minio:9000", client=client)
+        url = await storage.save(CONTENT_HASH, CONTENT, "image/webp")
+        self.assertEqual(url, f"http://minio:9000/media/avatars/{CONTENT_HASH}.webp")
+        client.put_object.assert_called_once_with(
+            Bucket="media", Key=f"avatars/{CONTENT_HASH}.webp", Body=CONTENT,
+            ContentType="image/webp", CacheControl=avatar_storage.IMMUTABLE_CACHE_CONTROL,
+        )
+
+    async def test_s3_failure_returns_none(self):
+        client = MagicMock()
+        client.put_object.side_effect = OSError("unreachable")
+        storage = avatar_storage.S3AvatarStorage(bucket="media", client=client)
+        with self.assertLogs("avatar_storage", "ERROR") as logs:
+            self.assertIsNone(await storage.save(CONTENT_HASH, CONTENT, "image/webp"))
+        self.assertIn("unreachable", logs.output[0])
+
+    async def test_cloudinary_uses_hash_public_id(self):
+        with patch("cloudinary.uploader.upload", return_value={"url": "http://example.com/a.webp"}) as upload:
+            url = await avatar_storage.CloudinaryAvatarStorage().save(CONTENT_HASH, CONTENT, "image/webp")
+        self.assertEqual(url, "http://example.com/a.webp")
+        self.assertEqual(upload.call_args.kwargs["public_id"], f"avatars/{CONTENT_HASH}")
+
+    def test_create_storage(self):
+        self.assertIsInstance(avatar_storage.create_storage("local"), avatar_storage.LocalAvatarStorage)
+        self.assertIsInstance(avatar_storage.create_storage("cloudinary"), avatar_storage.CloudinaryAvatarStorage)
+        with self.assertRaises(ValueError):
+            avatar_storage.create_storage("ftp")
+        with patch.object(avatar_storage, "AVATAR_S3_BUCKET", None):
+            with self.assertRaises(ValueError):
+                avatar_storage.S3AvatarStorage(bucket=None)
+
+
+class TestLocalAvatarServing(unittest.TestCase):
+    """
+    Tests uploading through the API with the local backend and serving the result.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = patch.object(avatar_storage, "storage", avatar_storage.LocalAvatarStorage(self.directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.admin = UserDB(username="admin", email="admin@example.com", hashed_password="hashed", role="admin")
+        self.db.add(self.admin)
+        self.db.commit()
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: self.admin
+        app.dependency_overrides[auth.get_current_active_admin] = lambda: self.admin
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        avatar_processing.shutdown_executor()
+
+    def upload_avatar(self):
+        image = io.BytesIO()
+        Image.new("RGB", (300, 200), "green").save(image, format="PNG")
+        with patch("cloudinary.uploader.upload") as cloudinary_upload:
+            response = self.client.post("/users/me/avatar/upload", files={"file": ("a.png", image.getvalue(), "image/png")})
+        cloudinary_upload.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        return response.json()["avatar_url"]
+
+    def test_uploaded_avatar_is_served_with_immutable_caching(self):
+        avatar_url = self.upload_avatar()
+        self.assertRegex(avatar_url, r"^/avatars/[0-9a-f]{64}\.webp$")
+
+        response = self.client.get(avatar_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "image/webp")
+        self.assertEqual(response.headers["cache-control"], "public, max-age=31536000, immutable")
+        content_hash = avatar_url.rsplit("/", 1)[1].split(".")[0]
+        self.assertEqual(response.headers["etag"], f'"{content_hash}"')
+        self.assertEqual(hashlib.sha256(response.content).hexdigest(), content_hash)
+
+        cached = self.client.get(avatar_url, headers={"If-None-Match": response.headers["etag"]})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+
+    def test_unknown_or_invalid_names_are_not_found(self):
+        self.assertEqual(self.client.get(f"/avatars/{'0' * 64}.webp").status_code, 404)
+        self.assertEqual(self.client.get("/avatars/..%2F..%2Fetc%2Fpasswd").status_code, 404)
+        self.assertEqual(self.client.get("/avatars/database.py").status_code, 404)
+
+    def test_serving_is_disabled_for_remote_backends(self):
+        avatar_url = self.upload_avatar()
+        with patch.object(avatar_storage, "storage", avatar_storage.CloudinaryAvatarStorage()):
+            self.assertEqual(self.client.get(avatar_url).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
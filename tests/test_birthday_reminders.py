@@ -0,0 +1,160 @@
+# tests/test_birthday_reminders.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import unittest
+from datetime import date, datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import birthday_reminders
+import crud
+import email_outbox
+from database import Base, ContactDB, EmailOutboxDB, UserDB
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class TestBirthdayReminders(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests the all-users birthday digest job against an in-memory SQLite database.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def add_user(self, name, is_active=True, birthdays=()):
+        user = UserDB(username=name, email=f"{name}@example.com", hashed_password="hashed", is_active=is_active)
+        self.db.add(user)
+        self.db.flush()
+        for index, birthday in enumerate(birthdays):
+            self.db.add(ContactDB(
+                first_name=f"{name}{index}", last_name="Contact", email=f"{name}{index}@contacts.com",
+                phone_number=f"{user.id}{index}", birthday=birthday, user_id=user.id,
+            ))
+        self.db.commit()
+        return user
+
+    def test_upcoming_birthday_filter_matches_per_user_query(self):
+        user = self.add_user("alice", birthdays=[date(1990, 6, 3), date(1985, 6, 20), date(2000, 5, 31)])
+        upcoming = crud.get_upcoming_birthdays(self.db, user.id, today=date(2025, 5, 30))
+        self.assertEqual(sorted(contact.first_name for contact in upcoming), ["alice0", "alice2"])
+
+    def test_window_wraps_year_and_handles_february_29(self):
+        self.add_user("bob", birthdays=[date(1990, 1, 2), date(1992, 2, 29)])
+        digests = list(birthday_reminders.iter_birthday_digests(self.db, date(2025, 12, 30), days=7))
+        self.assertEqual([len(digest.contacts) for digest in digests], [1])
+        self.assertEqual(digests[0].contacts[0][2], date(1990, 1, 2))
+
+        digests = list(birthday_reminders.iter_birthday_digests(self.db, date(2025, 2, 25), days=7))
+        self.assertEqual([contact[0] for contact in digests[0].contacts], ["bob1"])
+        self.assertEqual(birthday_reminders.next_birthday(date(1992, 2, 29), date(2025, 2, 25)), date(2025, 2, 28))
+
+    def test_digests_are_grouped_per_active_user(self):
+        alice = self.add_user("alice", birthdays=[date(1990, 6, 3), date(1991, 6, 4), date(1990, 9, 1)])
+        self.add_user("carol", is_active=False, birthdays=[date(1990, 6, 3)])
+        dave = self.add_user("dave", birthdays=[date(1970, 6, 5)])
+        self.add_user("erin", birthdays=[date(1970, 12, 5)])
+
+        digests = list(birthday_reminders.iter_birthday_digests(self.db, date(2025, 6, 1), days=7))
+
+        self.assertEqual([digest.user_id for digest in digests], [alice.id, dave.id])
+        self.assertEqual([contact[0] for contact in digests[0].contacts], ["alice0", "alice1"])
+
+    async def test_run_queues_one_digest_per_user_and_reports_throughput(self):
+        for index in range(7):
+            self.add_user(f"user{index}", birthdays=[date(1990, 6, 2), date(1990, 6, 3)])
+        self.add_user("nobody", birthdays=[date(1990, 1, 1)])
+
+        report = await birthday_reminders.run_birthday_reminders(
+            session_factory=TestingSessionLocal, today=date(2025, 6, 1), batch_size=3, concurrency=2,
+        )
+
+        self.assertEqual((report.users, report.contacts, report.emails_queued), (7, 14, 7))
+        self.assertGreater(report.elapsed_seconds, 0)
+        self.assertGreater(report.users_per_second, 0)
+        self.assertAlmostEqual(report.contacts_per_second, 2 * report.users_per_second)
+        queued = self.db.query(EmailOutboxDB).order_by(EmailOutboxDB.recipient).all()
+        self.assertEqual([message.recipient for message in queued], [f"user{index}@example.com" for index in range(7)])
+        self.assertTrue(all(message.status == email_outbox.PENDING for message in queued))
+        self.assertIn("user00 Contact", queued[0].body)
+
+    async def test_run_without_matches_queues_nothing(self):
+        self.add_user("alice", birthdays=[date(1990, 1, 1)])
+        report = await birthday_reminders.run_birthday_reminders(session_factory=TestingSessionLocal, today=date(2025, 6, 1))
+        self.assertEqual((report.users, report.emails_queued), (0, 0))
+        self.assertEqual(self.db.query(EmailOutboxDB).count(), 0)
+
+    async def test_writer_failure_stops_the_reader(self):
+        for index in range(20):
+            self.add_user(f"user{index}", birthdays=[date(1990, 6, 2)])
+        sessions = []
+
+        def session_factory():
+            sessions.append(TestingSessionLocal())
+            return sessions[-1]
+
+        with patch.object(birthday_reminders, "_enqueue_batch", side_effect=RuntimeError("outbox is down")):
+            with self.assertRaises(RuntimeError):
+                await asyncio.wait_for(birthday_reminders.run_birthday_reminders(
+                    session_factory=session_factory, today=date(2025, 6, 1), batch_size=1, concurrency=2,
+                ), timeout=5)
+        self.assertTrue(all(not session.in_transaction() for session in sessions))
+
+    async def test_rerun_after_partial_failure_queues_each_digest_once(self):
+        for index in range(6):
+            self.add_user(f"user{index}", birthdays=[date(1990, 6, 2)])
+        enqueue_batch = birthday_reminders._enqueue_batch
+        calls = 0
+
+        def fail_after_first_batch(session_factory, messages):
+            nonlocal calls
+            calls += 1
+            if calls > 1:
+                raise RuntimeError("outbox is down")
+            return enqueue_batch(session_factory, messages)
+
+        with patch.object(birthday_reminders, "_enqueue_batch", side_effect=fail_after_first_batch):
+            with self.assertRaises(RuntimeError):
+                await birthday_reminders.run_birthday_reminders(
+                    session_factory=TestingSessionLocal, today=date(2025, 6, 1), batch_size=2, concurrency=1,
+                )
+        self.assertEqual(self.db.query(EmailOutboxDB).count(), 2)
+
+        report = await birthday_reminders.run_birthday_reminders(session_factory=TestingSessionLocal, today=date(2025, 6, 1), batch_size=2)
+        self.assertEqual((report.users, report.emails_queued), (6, 4))
+        recipients = [message.recipient for message in self.db.query(EmailOutboxDB)]
+        self.assertEqual(sorted(recipients), [f"user{index}@example.com" for index in range(6)])
+
+    async def test_failed_scheduled_run_is_retried_the_same_day(self):
+        run = AsyncMock(side_effect=[RuntimeError("outbox is down"), None, asyncio.CancelledError()])
+        with patch.object(birthday_reminders, "seconds_until_next_run", return_value=0), \
+                patch.object(birthday_reminders, "BIRTHDAY_REMINDER_RETRY_SECONDS", 0), \
+                patch.object(birthday_reminders, "run_birthday_reminders", run), \
+                patch.object(birthday_reminders.redis_utils, "acquire_lock", return_value=True) as acquire_lock:
+            with self.assertRaises(asyncio.CancelledError):
+                await birthday_reminders._scheduler_loop()
+        self.assertEqual(run.await_count, 3)
+        self.assertEqual(run.await_args_list[0], run.await_args_list[1])
+        self.assertEqual(acquire_lock.call_count, 2)
+
+    def test_seconds_until_next_run(self):
+        now = datetime(2025, 6, 1, 6, 30, tzinfo=timezone.utc)
+        self.assertEqual(birthday_reminders.seconds_until_next_run(now, hour=7), 1800)
+        self.assertEqual(birthday_reminders.seconds_until_next_run(now, hour=6), 23.5 * 3600)
+
+
+if __name__ == "__main__":
+    unittest.main()
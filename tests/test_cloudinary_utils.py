@@ -0,0 +1,174 @@
+# tests/test_cloudinary_utils.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import io
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import cloudinary_utils
+from database import Base, UserDB
+from main import app, capped_body, get_db
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def slow_upload(source, **options):
+    time.sleep(0.2)
+    return {"url": "http://example.com/avatar.png"}
+
+
+class TestUploadAvatar(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests that Cloudinary uploads run off the event loop and honour the timeout.
+    """
+
+    async def test_upload_does_not_block_event_loop(self):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        with patch("cloudinary.uploader.upload", side_effect=slow_upload):
+            url = await cloudinary_utils.upload_avatar_content(b"image bytes", public_id="avatars/abc")
+        task.cancel()
+
+        self.assertEqual(url, "http://example.com/avatar.png")
+        self.assertGreater(ticks, 5)
+
+    async def test_upload_timeout_returns_none(self):
+        with patch("cloudinary.uploader.upload", side_effect=slow_upload), \
+                patch.object(cloudinary_utils, "AVATAR_UPLOAD_TIMEOUT_SECONDS", 0.05), \
+                self.assertLogs("cloudinary_utils", "WARNING") as logs:
+            self.assertIsNone(await cloudinary_utils.upload_avatar_content(b"image bytes", public_id="avatars/abc"))
+        self.assertIn("timed out", logs.output[0])
+
+    async def test_upload_error_returns_none(self):
+        with patch("cloudinary.uploader.upload", side_effect=RuntimeError("boom")), \
+                self.assertLogs("cloudinary_utils", "WARNING") as logs:
+            self.assertIsNone(await cloudinary_utils.upload_avatar_content(b"image bytes", public_id="avatars/abc"))
+        self.assertIn("boom", logs.output[0])
+
+    async def test_upload_content_is_not_overwritten(self):
+        with patch("cloudinary.uploader.upload", return_value={"url": "http://example.com/a.png"}) as upload:
+            self.assertEqual(await cloudinary_utils.upload_avatar_content(b"image bytes", public_id="avatars/abc"), "http://example.com/a.png")
+        self.assertEqual(upload.call_args.args[0].getvalue(), b"image bytes")
+        self.assertEqual((upload.call_args.kwargs["public_id"], upload.call_args.kwargs["overwrite"]), ("avatars/abc", False))
+
+
+class TestAvatarUploadEndpoint(unittest.TestCase):
+    """
+    Tests the multipart avatar upload endpoint.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.admin = UserDB(username="admin", email="admin@example.com", hashed_password="hashed", role="admin")
+        self.db.add(self.admin)
+        self.db.commit()
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: self.admin
+        app.dependency_overrides[auth.get_current_active_admin] = lambda: self.admin
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def post_avatar(self, content=None, content_type="image/png"):
+        if content is None:
+            content = io.BytesIO()
+            Image.new("RGB", (32, 32), "red").save(content, format="PNG")
+            content = content.getvalue()
+        return self.client.post("/users/me/avatar/upload", files={"file": ("avatar.png", content, content_type)})
+
+    def test_upload_stores_avatar_url(self):
+        with patch("cloudinary.uploader.upload", return_value={"url": "http://example.com/new.png"}) as upload:
+            response = self.post_avatar()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["avatar_url"], "http://example.com/new.png")
+        self.assertEqual(upload.call_count, 1)
+        self.db.refresh(self.admin)
+        self.assertEqual(self.admin.avatar_url, "http://example.com/new.png")
+
+    def test_oversized_file_is_rejected_before_upload(self):
+        with patch.object(cloudinary_utils, "AVATAR_MAX_BYTES", 1024), patch("cloudinary.uploader.upload") as upload:
+            self.assertEqual(self.post_avatar(b"x" * 2048).status_code, 413)
+            self.assertEqual(self.post_avatar(b"x" * 64 * 1024).status_code, 413)
+        upload.assert_not_called()
+
+    def test_chunked_upload_is_cut_off_at_the_limit(self):
+        def body():
+            yield b'--boundary\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\nContent-Type: image/png\r\n\r\n'
+            yield from (b"x" * 1024 for _ in range(64))
+            yield b"\r\n--boundary--\r\n"
+
+        with patch.object(cloudinary_utils, "AVATAR_MAX_BYTES", 1024), patch("cloudinary.uploader.upload") as upload:
+            response = self.client.post(
+                "/users/me/avatar/upload", content=body(),
+                headers={"content-type": "multipart/form-data; boundary=boundary"},
+            )
+        self.assertEqual(response.status_code, 413)
+        upload.assert_not_called()
+
+    def test_capped_body_stops_reading_past_the_limit(self):
+        received = []
+
+        class ChunkedRequest:
+            async def stream(self):
+                for _ in range(64):
+                    received.append(1)
+                    yield b"x" * 1024
+
+        async def read_all():
+            return [chunk async for chunk in capped_body(ChunkedRequest(), 4096)]
+
+        with self.assertRaises(HTTPException) as raised:
+            asyncio.run(read_all())
+        self.assertEqual(raised.exception.status_code, 413)
+        self.assertEqual(len(received), 5)
+
+    def test_non_image_is_rejected(self):
+        with patch("cloudinary.uploader.upload") as upload:
+            response = self.post_avatar(b"text", content_type="text/plain")
+        self.assertEqual(response.status_code, 415)
+        upload.assert_not_called()
+
+    def test_undecodable_image_is_rejected(self):
+        with patch("cloudinary.uploader.upload") as upload:
+            response = self.post_avatar(b"\x89PNG not really")
+        self.assertEqual(response.status_code, 400)
+        upload.assert_not_called()
+
+    def test_missing_file_is_rejected(self):
+        response = self.client.post("/users/me/avatar/upload", files={"other": ("a.png", b"x", "image/png")})
+        self.assertEqual(response.status_code, 422)
+
+    def test_failed_upload_returns_500(self):
+        with patch("cloudinary.uploader.upload", side_effect=RuntimeError("boom")):
+            response = self.post_avatar()
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["detail"], "Failed to upload avatar to Cloudinary")
+
+
+if __name__ == "__main__":
+    unittest.main()
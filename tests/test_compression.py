@@ -0,0 +1,206 @@
+# tests/test_compression.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import gzip
+import json
+import tempfile
+import unittest
+from datetime import date
+
+from fastapi import FastAPI
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import compression
+from database import Base, ContactDB, UserDB
+from main import app, get_db
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+BODY = json.dumps([{"first_name": f"First{index}", "last_name": "Last"} for index in range(200)])
+
+
+class TestNegotiate(unittest.TestCase):
+    """
+    Tests ``Accept-Encoding`` negotiation.
+    """
+
+    def test_server_preference_breaks_ties(self):
+        self.assertEqual(compression.negotiate("gzip, br, zstd", ("zstd", "br", "gzip")), "zstd")
+        self.assertEqual(compression.negotiate("gzip, br", ("zstd", "br", "gzip")), "br")
+
+    def test_client_quality_wins(self):
+        self.assertEqual(compression.negotiate("br;q=0.5, gzip;q=0.9", ("br", "gzip")), "gzip")
+        self.assertEqual(compression.negotiate("*;q=0.1, gzip;q=0", ("gzip", "br")), "br")
+
+    def test_no_acceptable_coding(self):
+        self.assertIsNone(compression.negotiate(None, ("gzip",)))
+        self.assertIsNone(compression.negotiate("identity", ("gzip",)))
+        self.assertIsNone(compression.negotiate("gzip;q=0", ("gzip",)))
+        self.assertIsNone(compression.negotiate("deflate", ("gzip",)))
+
+
+class TestPrecompressedCache(unittest.TestCase):
+    """
+    Tests the size bound of the compressed body cache.
+    """
+
+    def test_evicts_least_recently_used(self):
+        cache = compression.PrecompressedCache(max_bytes=10)
+        first, second, third = (cache.key("gzip", body) for body in (b"a", b"b", b"c"))
+        cache.set(first, b"1234")
+        cache.set(second, b"1234")
+        cache.get(first)
+        cache.set(third, b"1234")
+        self.assertIsNone(cache.get(second))
+        self.assertEqual(cache.get(first), b"1234")
+        self.assertEqual(cache.size, 8)
+        cache.set(cache.key("gzip", b"big"), b"x" * 11)
+        self.assertEqual(len(cache), 2)
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+    """
+    Tests the middleware on a small application.
+    """
+
+    def setUp(self):
+        self.cache = compression.PrecompressedCache()
+        demo = FastAPI()
+        demo.add_middleware(
+            compression.CompressionMiddleware, minimum_size=500, encodings=("zstd", "br", "gzip"),
+            content_types=("application/json", "text/"), cache=self.cache,
+        )
+
+        @demo.get("/json")
+        def json_body():
+            return Response(BODY, media_type="application/json", headers={"ETag": '"v1"'})
+
+        @demo.get("/small")
+        def small():
+            return PlainTextResponse("tiny")
+
+        @demo.get("/png")
+        def png():
+            return Response(b"\x89PNG" + b"0" * 2000, media_type="image/png")
+
+        @demo.get("/stream")
+        def stream():
+            return StreamingResponse(iter(["data: 1\n\n" * 100, "data: 2\n\n" * 100]), media_type="text/event-stream")
+
+        @demo.get("/encoded")
+        def encoded():
+            return Response(gzip.compress(BODY.encode()), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+        self.client = TestClient(demo)
+
+    def raw_get(self, url, accept_encoding):
+        with self.client.stream("GET", url, headers={"Accept-Encoding": accept_encoding}) as response:
+            return response, b"".join(response.iter_raw())
+
+    def test_each_coding_round_trips(self):
+        decoders = {"gzip": gzip.decompress}
+        if compression.brotli is not None:
+            decoders["br"] = compression.brotli.decompress
+        if compression.zstandard is not None:
+            decoders["zstd"] = compression.zstandard.ZstdDecompressor().decompress
+        for encoding, decode in decoders.items():
+            response, raw = self.raw_get("/json", encoding)
+            self.assertEqual(response.headers["content-encoding"], encoding)
+            self.assertEqual(int(response.headers["content-length"]), len(raw))
+            self.assertLess(len(raw), len(BODY))
+            self.assertEqual(decode(raw).decode(), BODY)
+            self.assertEqual(response.headers["vary"], "Accept-Encoding")
+            self.assertEqual(response.headers["etag"], 'W/"v1"')
+
+    def test_identity_when_not_accepted(self):
+        response, raw = self.raw_get("/json", "identity")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(raw.decode(), BODY)
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+
+    def test_thresholds_and_allowlist(self):
+        for url in ("/small", "/png", "/stream", "/encoded"):
+            response, raw = self.raw_get(url, "gzip")
+            self.assertEqual(response.status_code, 200)
+            if url == "/encoded":
+                self.assertEqual(gzip.decompress(raw).decode(), BODY)
+            else:
+                self.assertNotIn("content-encoding", response.headers, url)
+        self.assertNotIn("vary", self.raw_get("/png", "gzip")[0].headers)
+
+    def test_repeated_bodies_are_served_precompressed(self):
+        hits = compression.cache_hits_counter.value(encoding="gzip")
+        self.raw_get("/json", "gzip")
+        self.raw_get("/json", "gzip")
+        self.raw_get("/json", "gzip")
+        self.assertEqual(compression.cache_hits_counter.value(encoding="gzip") - hits, 2)
+        self.assertEqual(len(self.cache), 1)
+
+
+    def test_start_is_sent_before_pathsend(self):
+        with tempfile.NamedTemporaryFile(suffix=".json") as file:
+            file.write(BODY.encode())
+            file.flush()
+            middleware = compression.CompressionMiddleware(FileResponse(file.name), encodings=("gzip",))
+            scope = {
+                "type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")],
+                "extensions": {"http.response.pathsend": {}},
+            }
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                sent.append(message)
+
+            asyncio.run(middleware(scope, receive, send))
+        self.assertEqual([message["type"] for message in sent], ["http.response.start", "http.response.pathsend"])
+        self.assertEqual(sent[1]["path"], file.name)
+
+
+class TestContactsCompression(unittest.TestCase):
+    """
+    Tests that the application compresses large contact pages.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.user = UserDB(username="user", email="user@example.com", hashed_password="hashed")
+        self.db.add(self.user)
+        self.db.flush()
+        self.db.add_all(
+            ContactDB(first_name=f"First{index}", last_name="Last", email=f"c{index}@example.com", phone_number="555",
+                      birthday=date(1990, 1, 1), user_id=self.user.id)
+            for index in range(50)
+        )
+        self.db.commit()
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: self.user
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def test_contacts_page_is_compressed(self):
+        response = self.client.get("/contacts", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(len(response.json()), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+# tests/test_contact_changes.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import unittest
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+from database import Base, ContactDB, UserDB
+from main import app, get_db
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def contact_payload(index: int) -> dict:
+    return {
+        "first_name": f"First{index}", "last_name": f"Last{index}", "email": f"contact{index}@example.com",
+        "phone_number": f"555-{index:04d}", "birthday": "1990-01-15",
+    }
+
+
+class TestContactChanges(unittest.TestCase):
+    """
+    Tests contact versions, tombstones and the ``/contacts/changes`` delta sync endpoint.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.user = UserDB(username="user", email="user@example.com", hashed_password="hashed")
+        self.other = UserDB(username="other", email="other@example.com", hashed_password="hashed")
+        self.db.add_all([self.user, self.other])
+        self.db.commit()
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: self.user
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def changes(self, since: int, **params) -> dict:
+        response = self.client.get("/contacts/changes", params={"since": since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_every_write_bumps_the_version(self):
+        first = self.client.post("/contacts", json=contact_payload(1)).json()
+        second = self.client.post("/contacts", json=contact_payload(2)).json()
+        self.assertEqual((first["version"], second["version"]), (1, 2))
+        self.assertIsNotNone(first["updated_at"])
+
+        updated = self.client.put(f"/contacts/{first['id']}", json={"first_name": "Renamed"}).json()
+        self.assertEqual(updated["version"], 3)
+        self.assertGreaterEqual(updated["updated_at"], first["updated_at"])
+
+        self.client.delete(f"/contacts/{second['id']}")
+        batch = self.client.post("/contacts/batch", json={"items": [contact_payload(3), contact_payload(4)]}).json()
+        self.assertEqual({result["contact"]["version"] for result in batch["results"]}, {5})
+
+        changes = self.changes(since=3)
+        self.assertEqual(changes["version"], 5)
+        self.assertEqual(changes["deleted"], [second["id"]])
+        self.assertEqual([contact["email"] for contact in changes["changed"]], ["contact3@example.com", "contact4@example.com"])
+        self.assertFalse(changes["has_more"])
+
+    def test_full_sync_and_empty_delta(self):
+        legacy = ContactDB(user_id=self.user.id, **{**contact_payload(0), "birthday": date(1990, 1, 15)})
+        foreign = ContactDB(user_id=self.other.id, **{**contact_payload(9), "birthday": date(1990, 1, 15)})
+        self.db.add_all([legacy, foreign])
+        self.db.commit()
+        created = self.client.post("/contacts", json=contact_payload(1)).json()
+
+        changes = self.changes(since=0)
+        self.assertEqual([contact["id"] for contact in changes["changed"]], [legacy.id, created["id"]])
+        self.assertEqual(changes["version"], 1)
+        self.assertEqual(self.changes(since=changes["version"]), {"version": 1, "after": None, "changed": [], "deleted": [], "has_more": False})
+
+    def test_batch_update_and_delete_leave_versions_and_tombstones(self):
+        ids = [result["id"] for result in self.client.post("/contacts/batch", json={"items": [contact_payload(i) for i in range(3)]}).json()["results"]]
+        self.client.patch("/contacts/batch", json={"items": [{"id": ids[0], "last_name": "Changed"}]})
+        self.client.request("DELETE", "/contacts/batch", json={"ids": ids[1:]})
+
+        changes = self.changes(since=1)
+        self.assertEqual([(contact["id"], contact["version"]) for contact in changes["changed"]], [(ids[0], 2)])
+        self.assertEqual(changes["deleted"], ids[1:])
+        self.assertEqual(changes["version"], 3)
+
+    def sync(self, since: int, limit: int) -> list:
+        pages, after = [], None
+        while True:
+            page = self.changes(since=since, limit=limit, **({} if after is None else {"after": after}))
+            pages.append(page)
+            if not page["has_more"]:
+                return pages
+            since, after = page["version"], page["after"]
+
+    def test_pages_split_a_version_at_the_limit(self):
+        self.client.post("/contacts", json=contact_payload(0))
+        self.client.post("/contacts/batch", json={"items": [contact_payload(i) for i in range(1, 4)]})
+        self.client.post("/contacts", json=contact_payload(4))
+
+        pages = self.sync(since=0, limit=2)
+        self.assertEqual([(page["version"], len(page["changed"]), page["has_more"]) for page in pages], [(2, 2, True), (2, 2, True), (3, 1, False)])
+        emails = [contact["email"] for page in pages for contact in page["changed"]]
+        self.assertEqual(emails, [f"contact{index}@example.com" for index in range(5)])
+
+    def test_full_sync_pages_through_unversioned_contacts(self):
+        self.db.add_all(
+            ContactDB(user_id=self.user.id, **{**contact_payload(index), "birthday": date(1990, 1, 15)})
+            for index in range(25)
+        )
+        self.db.commit()
+
+        pages = self.sync(since=0, limit=10)
+        self.assertEqual([len(page["changed"]) for page in pages], [10, 10, 5])
+        self.assertEqual([page["version"] for page in pages], [0, 0, 0])
+        self.assertEqual(len({contact["id"] for page in pages for contact in page["changed"]}), 25)
+
+    def test_deletions_within_a_version_are_paged(self):
+        ids = [result["id"] for result in self.client.post("/contacts/batch", json={"items": [contact_payload(i) for i in range(3)]}).json()["results"]]
+        self.client.request("DELETE", "/contacts/batch", json={"ids": ids})
+
+        pages = self.sync(since=1, limit=2)
+        self.assertEqual([page["deleted"] for page in pages], [ids[:2], ids[2:]])
+        self.assertEqual(pages[-1]["version"], 2)
+
+    def test_changes_use_the_version_index(self):
+        plans = []
+
+        def explain(conn, cursor, statement, parameters, context, executemany):
+            if "version >" in statement and statement.lstrip().upper().startswith("SELECT"):
+                plans.append(conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall())
+
+        event.listen(engine, "before_cursor_execute", explain)
+        try:
+            self.changes(since=0)
+        finally:
+            event.remove(engine, "before_cursor_execute", explain)
+        self.assertEqual(len(plans), 2)
+        for plan in plans:
+            self.assertTrue(any("_user_id_version" in str(row) for row in plan), plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
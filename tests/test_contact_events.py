@@ -0,0 +1,246 @@
+# tests/test_contact_events.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import asyncio
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+
+import auth
+import crud
+import contact_events
+import database
+import models
+from database import Base, UserDB
+from main import app, get_db
+from redis_utils import get_redis
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+CONTACT = models.ContactCreate(
+    first_name="Ada", last_name="Lovelace", email="ada@example.com", phone_number="555-0100", birthday=date(1815, 12, 10),
+)
+
+
+class TestEventPublishing(unittest.TestCase):
+    """
+    Tests that crud writes publish contact events after commit only.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.user = UserDB(username="user", email="user@example.com", hashed_password="hashed")
+        self.db.add(self.user)
+        self.db.commit()
+        patcher = patch.object(contact_events, "publish", return_value=True)
+        self.publish = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def published(self):
+        return [(call.args[1], json.loads(call.args[2])) for call in self.publish.call_args_list]
+
+    def test_writes_publish_to_the_owner_channel(self):
+        contact = crud.create_contact(self.db, CONTACT, self.user.id)
+        crud.update_contact(self.db, contact.id, self.user.id, models.ContactUpdate(first_name="Augusta"))
+        crud.delete_contact(self.db, contact.id, self.user.id)
+
+        channel = f"contact-events:{{{self.user.id}}}"
+        self.assertEqual(self.published(), [
+            (channel, {"type": "created", "user_id": self.user.id, "ids": [contact.id], "version": 1}),
+            (channel, {"type": "updated", "user_id": self.user.id, "ids": [contact.id], "version": 2}),
+            (channel, {"type": "deleted", "user_id": self.user.id, "ids": [contact.id], "version": 3}),
+        ])
+
+    def test_batch_writes_publish_one_event(self):
+        results = crud.create_contacts(self.db, [CONTACT, CONTACT.model_copy(update={"email": "byron@example.com"})], self.user.id)
+        [(_, payload)] = self.published()
+        self.assertEqual(payload["ids"], [result.id for result in results])
+
+    def test_rolled_back_changes_are_not_published(self):
+        contact_events.record(self.db, self.user.id, contact_events.CREATED, [1], 1)
+        self.db.rollback()
+        self.db.commit()
+        self.publish.assert_not_called()
+
+    def test_falls_back_to_local_delivery_without_redis(self):
+        self.publish.return_value = False
+        with patch.object(contact_events.broker, "dispatch") as dispatch:
+            crud.create_contact(self.db, CONTACT, self.user.id)
+        self.assertEqual(dispatch.call_args.args[0]["type"], "created")
+
+
+class TestBroker(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests fan-out, bounded buffers and the SSE stream.
+    """
+
+    async def test_dispatch_reaches_only_the_owner(self):
+        broker = contact_events.ContactEventBroker(queue_size=10)
+        mine, other = broker.subscribe(1), broker.subscribe(2)
+        broker.dispatch({"type": "created", "user_id": 1, "ids": [5], "version": 1})
+        self.assertEqual((await mine.get(1))["ids"], [5])
+        self.assertIsNone(await other.get(0.01))
+        broker.unsubscribe(mine)
+        broker.unsubscribe(other)
+        self.assertEqual(broker.subscriber_count, 0)
+
+    async def test_slow_consumer_gets_a_single_resync(self):
+        broker = contact_events.ContactEventBroker(queue_size=3)
+        subscription = broker.subscribe(1)
+        for version in range(10):
+            subscription.push({"type": "updated", "user_id": 1, "ids": [1], "version": version})
+        self.assertLessEqual(subscription.queue.qsize(), 3)
+        events = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+        self.assertEqual(events[0], {"type": "resync"})
+        self.assertEqual(events.count({"type": "resync"}), 1)
+
+    async def test_subscriber_limit(self):
+        broker = contact_events.ContactEventBroker(max_subscribers=1)
+        broker.subscribe(1)
+        self.assertFalse(broker.has_capacity())
+        with self.assertRaises(contact_events.TooManySubscribers):
+            broker.subscribe(2)
+
+    async def test_listener_relays_redis_messages(self):
+        payload = {"type": "deleted", "user_id": 7, "ids": [3], "version": 4}
+        messages = [{"type": "pmessage", "data": json.dumps(payload)}]
+
+        def get_message(timeout):
+            if messages:
+                return messages.pop()
+            time.sleep(0.01)
+            return None
+
+        client = MagicMock()
+        client.pubsub.return_value.get_message.side_effect = get_message
+        broker = contact_events.ContactEventBroker(client)
+        subscription = broker.subscribe(7)
+        try:
+            self.assertEqual(await subscription.get(5), payload)
+        finally:
+            await asyncio.to_thread(broker.stop)
+        client.pubsub.return_value.psubscribe.assert_called_once_with("contact-events:{*}")
+
+    async def test_stream_sends_heartbeats_and_events(self):
+        broker = contact_events.ContactEventBroker()
+        stream = contact_events.stream(broker.subscribe(1), heartbeat_seconds=0.01)
+        self.assertTrue((await anext(stream)).startswith("retry: "))
+        self.assertEqual(await anext(stream), ": heartbeat\n\n")
+        broker.dispatch({"type": "updated", "user_id": 1, "ids": [2], "version": 6})
+        message = await anext(stream)
+        self.assertEqual(message, 'id: 6\nevent: updated\ndata: {"type": "updated", "ids": [2], "version": 6}\n\n')
+        await stream.aclose()
+
+
+class TestEventsEndpoint(unittest.TestCase):
+    """
+    Tests the ``/contacts/events`` endpoint.
+    """
+
+    def setUp(self):
+        self.user = MagicMock(id=1, is_active=True)
+        app.dependency_overrides[auth.get_current_active_user_without_session] = lambda: self.user
+        self.client = TestClient(app)
+        patcher = patch.object(contact_events, "broker", contact_events.ContactEventBroker())
+        self.broker = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def test_streams_server_sent_events(self):
+        async def finite_stream(subscription, heartbeat_seconds):
+            yield f"event: created\ndata: {subscription.user_id}\n\n"
+
+        with patch.object(contact_events, "stream", finite_stream):
+            response = self.client.get("/contacts/events")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        self.assertEqual(response.headers["cache-control"], "no-cache")
+        self.assertEqual(response.text, "event: created\ndata: 1\n\n")
+        self.assertEqual(self.broker.subscriber_count, 0)
+
+    def test_rejects_streams_over_capacity(self):
+        self.broker.max_subscribers = 0
+        self.assertEqual(self.client.get("/contacts/events").status_code, 503)
+
+    def test_rejects_streams_when_capacity_runs_out_at_subscribe(self):
+        with patch.object(self.broker, "subscribe", side_effect=contact_events.TooManySubscribers()):
+            self.assertEqual(self.client.get("/contacts/events").status_code, 503)
+
+
+class TestEventStreamConnections(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests that open event streams do not hold a pooled database connection.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.directory.name}/events.db", poolclass=QueuePool)
+        Base.metadata.create_all(bind=self.engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        with session_factory() as db:
+            user = UserDB(username="user", email="user@example.com", hashed_password="hashed")
+            db.add(user)
+            db.commit()
+            self.token = auth.create_access_token({"sub": user.email, "id": user.id})
+        for patcher in (
+            patch.object(database, "SessionLocal", session_factory),
+            patch.object(contact_events, "broker", contact_events.ContactEventBroker()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        app.dependency_overrides[get_redis] = lambda: MagicMock(get=MagicMock(return_value=None))
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    async def test_open_stream_holds_no_connection(self):
+        disconnected = asyncio.Event()
+        messages = asyncio.Queue()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": "/contacts/events", "raw_path": b"/contacts/events", "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {self.token}".encode())],
+            "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+        }
+        server = asyncio.create_task(app(scope, receive, messages.put))
+        start = await asyncio.wait_for(messages.get(), 5)
+        self.assertEqual(start["status"], 200)
+        body = await asyncio.wait_for(messages.get(), 5)
+        self.assertTrue(body["body"].startswith(b"retry: "))
+
+        self.assertEqual(self.engine.pool.checkedout(), 0)
+        self.assertEqual(contact_events.broker.subscriber_count, 1)
+
+        disconnected.set()
+        await asyncio.wait_for(server, 5)
+        self.assertEqual(contact_events.broker.subscriber_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
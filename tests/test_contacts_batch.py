@@ -0,0 +1,148 @@
+# tests/test_contacts_batch.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import models
+from database import Base, ContactDB, UserDB
+from main import app, get_db
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def contact_payload(index: int, **overrides) -> dict:
+    payload = {
+        "first_name": f"First{index}", "last_name": f"Last{index}", "email": f"contact{index}@example.com",
+        "phone_number": f"555-{index:04d}", "birthday": "1990-01-15", "additional_data": None,
+    }
+    payload.update(overrides)
+    return payload
+
+
+class TestContactsBatch(unittest.TestCase):
+    """
+    Tests the batch create, update, delete and multi-get contact endpoints.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.user = UserDB(username="user", email="user@example.com", hashed_password="hashed")
+        self.other = UserDB(username="other", email="other@example.com", hashed_password="hashed")
+        self.db.add_all([self.user, self.other])
+        self.db.flush()
+        self.contacts = [
+            ContactDB(user_id=self.user.id, **{**contact_payload(index), "birthday": date(1990, 1, 15)})
+            for index in range(3)
+        ]
+        self.foreign = ContactDB(user_id=self.other.id, **{**contact_payload(99), "birthday": date(1990, 1, 15)})
+        self.db.add_all([*self.contacts, self.foreign])
+        self.db.commit()
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self.record_statement)
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: self.user
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        event.remove(engine, "before_cursor_execute", self.record_statement)
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def writes(self):
+        """Returns the contact write statements, leaving out the owner's contact version bump."""
+        return [
+            statement for statement in self.statements
+            if statement.lstrip().split()[0].upper() in ("INSERT", "UPDATE", "DELETE") and not statement.lstrip().upper().startswith("UPDATE USERS")
+        ]
+
+    def test_batch_create_reports_each_item(self):
+        items = [contact_payload(10), contact_payload(1), contact_payload(11), contact_payload(12, email="contact10@example.com")]
+        response = self.client.post("/contacts/batch", json={"items": items})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [201, 409, 201, 409])
+        self.assertEqual([result["index"] for result in results], [0, 1, 2, 3])
+        self.assertEqual(results[0]["contact"]["email"], "contact10@example.com")
+        self.assertEqual(results[2]["contact"]["user_id"], self.user.id)
+        self.assertEqual(results[0]["id"], results[0]["contact"]["id"])
+        self.assertEqual(len(self.writes()), 1)
+        self.assertEqual(self.db.query(ContactDB).filter(ContactDB.user_id == self.user.id).count(), 5)
+
+    def test_batch_update_reports_each_item(self):
+        first, second, third = (contact.id for contact in self.contacts)
+        items = [
+            {"id": first, "first_name": "Renamed"},
+            {"id": self.foreign.id, "first_name": "Stolen"},
+            {"id": second, "email": "contact2@example.com"},
+            {"id": third, "phone_number": None},
+            {"id": 12345, "first_name": "Ghost"},
+        ]
+        response = self.client.patch("/contacts/batch", json={"items": items})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [200, 404, 409, 422, 404])
+        self.assertEqual(results[0]["contact"]["first_name"], "Renamed")
+        self.assertEqual(results[0]["contact"]["last_name"], "Last0")
+        self.assertEqual(len(self.writes()), 1)
+        self.db.expire_all()
+        self.assertEqual(self.db.get(ContactDB, self.foreign.id).first_name, "First99")
+
+    def test_batch_update_can_clear_optional_fields(self):
+        contact_id = self.contacts[0].id
+        response = self.client.patch("/contacts/batch", json={"items": [{"id": contact_id, "additional_data": "note"}]})
+        self.assertEqual(response.json()["results"][0]["contact"]["additional_data"], "note")
+        response = self.client.patch("/contacts/batch", json={"items": [{"id": contact_id, "additional_data": None}]})
+        self.assertEqual(response.json()["results"][0]["status"], 200)
+        self.assertIsNone(response.json()["results"][0]["contact"]["additional_data"])
+
+    def test_batch_delete_reports_each_item(self):
+        ids = [self.contacts[0].id, self.foreign.id, self.contacts[2].id]
+        response = self.client.request("DELETE", "/contacts/batch", json={"ids": ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["status"] for result in response.json()["results"]], [200, 404, 200])
+        self.assertEqual(len(self.writes()), 2)  # DELETE ... RETURNING and the tombstone INSERT
+        remaining = {contact.id for contact in self.db.query(ContactDB)}
+        self.assertEqual(remaining, {self.contacts[1].id, self.foreign.id})
+
+    def test_multi_get_returns_only_owned_contacts(self):
+        ids = f"{self.contacts[2].id},{self.foreign.id},{self.contacts[0].id},404"
+        response = self.client.get(f"/contacts?ids={ids}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([contact["id"] for contact in response.json()], [self.contacts[0].id, self.contacts[2].id])
+
+        response = self.client.get(f"/contacts?ids={self.contacts[1].id}&fields=id,email")
+        self.assertEqual(response.json(), [{"id": self.contacts[1].id, "email": "contact1@example.com"}])
+
+    def test_multi_get_rejects_invalid_ids(self):
+        self.assertEqual(self.client.get("/contacts?ids=1,two").status_code, 400)
+        self.assertEqual(self.client.get("/contacts?ids=,").status_code, 400)
+
+    def test_batch_sizes_are_bounded(self):
+        with patch.object(models, "CONTACT_BATCH_MAX_ITEMS", 2):
+            self.assertEqual(self.client.get("/contacts?ids=1,2,3").status_code, 400)
+        too_many = [contact_payload(100 + index) for index in range(models.CONTACT_BATCH_MAX_ITEMS + 1)]
+        self.assertEqual(self.client.post("/contacts/batch", json={"items": too_many}).status_code, 422)
+        self.assertEqual(self.client.post("/contacts/batch", json={"items": []}).status_code, 422)
+        self.assertEqual(self.client.request("DELETE", "/contacts/batch", json={"ids": [1, 1]}).status_code, 422)
+        self.assertEqual(self.writes(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+# tests/test_email_outbox.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+import socket
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from aiosmtpd.controller import Controller
+from fastapi.testclient import TestClient
+from fastapi_mail import ConnectionConfig
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import email_outbox
+from database import Base, EmailOutboxDB, UserDB
+from main import app, get_db
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class RecordingHandler:
+    """
+    aiosmtpd handler that records delivered messages and SMTP sessions.
+    """
+    def __init__(self):
+        self.messages = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def smtp_conf(port: int) -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="user",
+        MAIL_PASSWORD="password",
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=port,
+        MAIL_FROM="noreply@example.com",
+        MAIL_FROM_NAME="Contacts",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+        TIMEOUT=5,
+    )
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestEmailOutbox(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests the outbox queue and background sender against a local aiosmtpd server.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.handler = RecordingHandler()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=unused_port())
+        self.controller.start()
+
+    def tearDown(self):
+        self.controller.stop()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def make_worker(self, port=None, pool_size=1):
+        pool = email_outbox.SMTPConnectionPool(smtp_conf(port or self.controller.port), size=pool_size)
+        return email_outbox.OutboxWorker(pool, session_factory=TestingSessionLocal, batch_size=10)
+
+    async def test_worker_delivers_batch_over_one_reused_connection(self):
+        for index in range(3):
+            email_outbox.enqueue_email(self.db, f"user{index}@example.com", "Hello", f"Message {index}")
+        worker = self.make_worker(pool_size=1)
+
+        self.assertEqual(await worker.run_once(), 3)
+        await worker.pool.close()
+
+        self.assertEqual(sorted(envelope.rcpt_tos[0] for envelope in self.handler.messages),
+                         ["user0@example.com", "user1@example.com", "user2@example.com"])
+        self.assertEqual(self.handler.sessions, 1)
+        self.db.expire_all()
+        statuses = {message.status for message in self.db.query(EmailOutboxDB).all()}
+        self.assertEqual(statuses, {email_outbox.SENT})
+        self.assertEqual(await worker.run_once(), 0)
+
+    async def test_unreachable_server_schedules_retry_with_backoff(self):
+        message = email_outbox.enqueue_email(self.db, "user@example.com", "Hello", "Body")
+        worker = self.make_worker(port=unused_port())
+        before = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        self.assertEqual(await worker.run_once(), 1)
+
+        self.db.expire_all()
+        stored = self.db.get(EmailOutboxDB, message.id)
+        self.assertEqual(stored.status, email_outbox.PENDING)
+        self.assertEqual(stored.attempts, 1)
+        self.assertIsNotNone(stored.last_error)
+        self.assertGreaterEqual(stored.next_attempt_at, before + email_outbox.backoff_delay(1) - timedelta(seconds=1))
+        self.assertEqual(await worker.run_once(), 0)  # not due yet
+
+    async def test_message_fails_permanently_after_max_attempts(self):
+        message = email_outbox.enqueue_email(self.db, "user@example.com", "Hello", "Body")
+        worker = self.make_worker(port=unused_port())
+        with patch.object(email_outbox, "OUTBOX_MAX_ATTEMPTS", 2), patch.object(email_outbox, "OUTBOX_BACKOFF_BASE_SECONDS", 0):
+            await worker.run_once()
+            await worker.run_once()
+            self.assertEqual(await worker.run_once(), 0)
+
+        self.db.expire_all()
+        stored = self.db.get(EmailOutboxDB, message.id)
+        self.assertEqual(stored.status, email_outbox.FAILED)
+        self.assertEqual(stored.attempts, 2)
+
+    async def test_expired_lease_is_reclaimed(self):
+        email_outbox.enqueue_email(self.db, "user@example.com", "Hello", "Body")
+        now = datetime.now(timezone.utc)
+        self.assertEqual(len(email_outbox.claim_due_messages(self.db, 10, now=now)), 1)
+        self.assertEqual(email_outbox.claim_due_messages(self.db, 10, now=now), [])
+        later = now + timedelta(seconds=email_outbox.OUTBOX_LEASE_SECONDS + 1)
+        self.assertEqual(len(email_outbox.claim_due_messages(self.db, 10, now=later)), 1)
+
+    async def test_background_worker_drains_outbox(self):
+        email_outbox.enqueue_email(self.db, "user@example.com", "Hello", "Body")
+        worker = self.make_worker()
+        worker.poll_interval = 0.05
+        worker.start()
+        deadline = time.monotonic() + 5
+        while not self.handler.messages and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await worker.stop()
+        self.assertEqual(len(self.handler.messages), 1)
+
+
+class TestOutboxEndpoints(unittest.TestCase):
+    """
+    Tests that mail-sending endpoints only enqueue and answer 202 without touching SMTP.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.db.add(UserDB(username="user", email="user@example.com", hashed_password="hashed"))
+        self.db.commit()
+        app.dependency_overrides[get_db] = lambda: self.db
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def test_password_reset_request_is_queued(self):
+        with patch("aiosmtplib.SMTP.connect") as connect:
+            response = self.client.post("/password-reset-request", json={"email": "user@example.com"})
+        self.assertEqual(response.status_code, 202)
+        connect.assert_not_called()
+        queued = self.db.query(EmailOutboxDB).all()
+        self.assertEqual(len(queued), 1)
+        self.assertEqual(queued[0].recipient, "user@example.com")
+        self.assertEqual(queued[0].status, email_outbox.PENDING)
+        self.assertIn("password-reset/verify/", queued[0].body)
+
+
+if __name__ == "__main__":
+    unittest.main()
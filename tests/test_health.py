@@ -0,0 +1,133 @@
+# tests/test_health.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+import email_outbox
+import health
+import main
+from settings import Settings
+
+
+class TestWarmupSteps(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests the individual warm-up steps.
+    """
+
+    def test_database_connections_stay_pooled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'warm.db')}", pool_size=3)
+            self.assertEqual(health.warm_database(engine, connections=3), 3)
+            self.assertEqual(engine.pool.checkedin(), 3)
+            self.assertEqual(engine.pool.checkedout(), 0)
+            engine.dispose()
+
+    async def test_smtp_pool_opens_up_to_its_size(self):
+        pool = email_outbox.SMTPConnectionPool(MagicMock(), size=2)
+        with patch.object(pool, "_connect", AsyncMock(side_effect=lambda: MagicMock(is_connected=True))) as connect:
+            self.assertEqual(await pool.warm(5), 2)
+            self.assertEqual(await pool.warm(5), 2)
+        self.assertEqual(connect.await_count, 2)
+
+    async def test_failed_steps_are_reported(self):
+        state = health.WarmupState()
+        failures = health.warmup_failures_counter.value(step="redis")
+        with patch.object(health, "warm_database", return_value=5), \
+                patch.object(health.redis_utils, "ping", return_value=False), \
+                patch.object(health, "warm_password_hashing"), \
+                patch.object(health, "warm_models"):
+            await health.warm_up(MagicMock(), state)
+        self.assertTrue(state.ready)
+        self.assertEqual(state.steps["database"], health.OK)
+        self.assertEqual(state.steps["redis"], "failed: ConnectionError")
+        self.assertEqual(set(state.failed_required), {"redis"})
+        self.assertNotIn("smtp", state.steps)
+        self.assertEqual(health.warmup_failures_counter.value(step="redis") - failures, 1)
+
+    async def test_slow_steps_time_out(self):
+        state = health.WarmupState()
+
+        async def hang(count):
+            await asyncio.sleep(10)
+
+        smtp_pool = MagicMock(warm=hang)
+        with patch.object(health, "warm_database"), patch.object(health.redis_utils, "ping", return_value=True), \
+                patch.object(health, "warm_password_hashing"), patch.object(health, "warm_models"):
+            await health.warm_up(MagicMock(), state, smtp_pool=smtp_pool, timeout=0.05)
+        self.assertEqual(state.steps["smtp"], "failed: TimeoutError")
+        self.assertEqual(state.steps["redis"], health.OK)
+        self.assertEqual(state.failed_required, {})
+
+
+class TestReadiness(unittest.TestCase):
+    """
+    Tests the readiness endpoint and the warm-up in the application lifespan.
+    """
+
+    def setUp(self):
+        self.settings = Settings(create_schema=False, outbox_worker=False)
+
+    def test_not_ready_until_warmed_up(self):
+        app = main.create_app(self.settings)
+        client = TestClient(app)
+        app.state.warmup = health.WarmupState()
+        response = client.get("/health/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "warming_up")
+        app.state.warmup.ready = True
+        self.assertEqual(client.get("/health/ready").status_code, 200)
+        self.assertEqual(client.get("/health/live").json(), {"status": "alive"})
+
+    def test_not_ready_while_a_required_step_fails(self):
+        app = main.create_app(self.settings)
+        client = TestClient(app)
+        database_up = False
+
+        async def warm_database():
+            if not database_up:
+                raise ConnectionError("database is down")
+
+        app.state.warmup = health.WarmupState(ready=True, steps={"smtp": "failed: TimeoutError"})
+        asyncio.run(health._run_step(app.state.warmup, "database", warm_database, timeout=1))
+        response = client.get("/health/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "failing")
+
+        database_up = True
+        response = client.get("/health/ready")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["steps"], {"smtp": "failed: TimeoutError", "database": "ok"})
+
+    def test_lifespan_warms_up_before_serving_and_closes_pools(self):
+        async def warm_up(app, state, smtp_pool=None):
+            state.steps["database"] = health.OK
+            state.ready = True
+
+        with patch.object(health, "warm_up", side_effect=warm_up) as warm, \
+                patch.object(health, "close_pools", AsyncMock()) as close_pools:
+            with TestClient(main.create_app(self.settings)) as client:
+                response = client.get("/health/ready")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["steps"], {"database": "ok"})
+                close_pools.assert_not_awaited()
+            close_pools.assert_awaited_once()
+        warm.assert_called_once()
+
+    def test_ready_immediately_without_warmup(self):
+        with patch.object(health, "warm_up") as warm, patch.object(health, "close_pools", AsyncMock()):
+            with TestClient(main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))) as client:
+                self.assertEqual(client.get("/health/ready").status_code, 200)
+        warm.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
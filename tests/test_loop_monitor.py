@@ -0,0 +1,86 @@
+# tests/test_loop_monitor.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import time
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import loop_monitor
+import main
+from settings import Settings
+
+
+def build_app(monitor: loop_monitor.LoopMonitor) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with monitor.run():
+            yield
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/slow/{item_id}")
+    async def slow(item_id: int):
+        time.sleep(0.3)  # blocks the event loop
+        return {"id": item_id}
+
+    @app.get("/fast")
+    async def fast():
+        await asyncio.sleep(0.3)
+        return {}
+
+    app.add_middleware(loop_monitor.LoopMonitorMiddleware, monitor=monitor)
+    return app
+
+
+class TestLoopMonitor(unittest.TestCase):
+    """
+    Tests that blocking callbacks are reported with their stack and route.
+    """
+
+    def setUp(self):
+        loop_monitor.blocked_counter.reset()
+        self.monitor = loop_monitor.LoopMonitor(interval=0.01, threshold=0.1)
+
+    def test_blocking_handler_is_logged_with_stack_and_route(self):
+        with TestClient(build_app(self.monitor)) as client, self.assertLogs("loop_monitor", "WARNING") as logs:
+            self.assertEqual(client.get("/slow/7").json(), {"id": 7})
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("GET /slow/7 (route /slow/{item_id})", logs.output[0])
+        self.assertIn("time.sleep(0.3)", logs.output[0])
+        self.assertEqual(loop_monitor.blocked_counter.value(route="/slow/{item_id}"), 1)
+
+    def test_awaiting_handler_is_not_reported(self):
+        lag_count = loop_monitor.lag_histogram.count()
+        with TestClient(build_app(self.monitor)) as client:
+            client.get("/fast")
+        self.assertEqual(loop_monitor.blocked_counter.value(route="/fast"), 0)
+        self.assertGreater(loop_monitor.lag_histogram.count(), lag_count)
+
+    def test_blocking_outside_requests_is_reported_as_background(self):
+        async def block():
+            async with self.monitor.run():
+                await asyncio.sleep(0.02)
+                time.sleep(0.3)
+                await asyncio.sleep(0.02)
+
+        with self.assertLogs("loop_monitor", "WARNING"):
+            asyncio.run(block())
+        self.assertEqual(loop_monitor.blocked_counter.value(route="<background>"), 1)
+
+    def test_create_app_adds_the_middleware_when_enabled(self):
+        enabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False, loop_monitor=True))
+        disabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+        self.assertIn(loop_monitor.LoopMonitorMiddleware, [middleware.cls for middleware in enabled.user_middleware])
+        self.assertNotIn(loop_monitor.LoopMonitorMiddleware, [middleware.cls for middleware in disabled.user_middleware])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,6 +22,7 @@ import crud
 import auth
 import email_utils
 import cloudinary_utils
+import avatar_processing
 import database
 
 ADMINTOKEN = os.environ.get("ADMINTOKEN")
@@ -260,11 +261,11 @@ def test_create_admin_email_exists(test_app, mock_admin):
 def test_update_user_avatar_success(test_app, mock_admin):
     mock_db = test_app.app.dependency_overrides[get_db]()
     test_app.app.dependency_overrides[auth.get_current_active_admin] = MagicMock(return_value=mock_admin)
-    cloudinary_utils.upload_avatar = MagicMock(return_value="http://example.com/avatar.jpg")
+    avatar_processing.store_avatar = AsyncMock(return_value="http://example.com/avatar.jpg")
     crud.update_user_avatar = MagicMock(return_value=mock_admin)
     response = test_app.post(
         "/users/me/avatar",
-        data={"file": "base64_encoded_image"},
+        data={"file": "YmFzZTY0X2VuY29kZWRfaW1hZ2U="},
         headers={"Authorization": f"Bearer {ADMINTOKEN}"}
     )
     assert response.status_code == 200
@@ -274,10 +275,10 @@ def test_update_user_avatar_success(test_app, mock_admin):
 def test_update_user_avatar_upload_fails(test_app, mock_admin):
     mock_db = test_app.app.dependency_overrides[get_db]()
     test_app.app.dependency_overrides[auth.get_current_active_admin] = MagicMock(return_value=mock_admin)
-    cloudinary_utils.upload_avatar = MagicMock(return_value=None)
+    avatar_processing.store_avatar = AsyncMock(return_value=None)
     response = test_app.post(
         "/users/me/avatar",
-        data={"file": "base64_encoded_image"},
+        data={"file": "YmFzZTY0X2VuY29kZWRfaW1hZ2U="},
         headers={"Authorization": f"Bearer {ADMINTOKEN}"}
     )
     assert response.status_code == 500
@@ -287,11 +288,11 @@ def test_update_user_avatar_upload_fails(test_app, mock_admin):
 def test_update_user_avatar_db_fails(test_app, mock_admin):
     mock_db = test_app.app.dependency_overrides[get_db]()
     test_app.app.dependency_overrides[auth.get_current_active_admin] = MagicMock(return_value=mock_admin)
-    cloudinary_utils.upload_avatar = MagicMock(return_value="http://example.com/avatar.jpg")
+    avatar_processing.store_avatar = AsyncMock(return_value="http://example.com/avatar.jpg")
     crud.update_user_avatar = MagicMock(return_value=None)
     response = test_app.post(
         "/users/me/avatar",
-        data={"file": "base64_encoded_image"},
+        data={"file": "YmFzZTY0X2VuY29kZWRfaW1hZ2U="},
         headers={"Authorization": f"Bearer {ADMINTOKEN}"}
     )
     assert response.status_code == 500
@@ -489,7 +490,8 @@ def test_read_contacts_with_filters(test_app, mock_user, mock_contact):
         limit=100,
         first_name="Test",
         last_name=None,
-        email="test.contact@example.com"
+        email="test.contact@example.com",
+        fields=None
     )
     test_app.app.dependency_overrides.clear()
 
@@ -502,7 +504,7 @@ def test_read_contact_success(test_app, mock_user, mock_contact):
     assert response.status_code == 200
     assert response.json()["id"] == 1
     assert response.json()["first_name"] == "Test"
-    crud.get_contact.assert_called_once_with(mock_db, contact_id=1, user_id=mock_user.id)
+    crud.get_contact.assert_called_once_with(mock_db, contact_id=1, user_id=mock_user.id, fields=None)
     test_app.app.dependency_overrides.clear()
 
 # add usertoken
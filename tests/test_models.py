@@ -10,6 +10,9 @@ from datetime import date, datetime, timedelta
 from pydantic import ValidationError
 
 from models import (
+    CONTACT_FIELDS,
+    contact_fieldset_model,
+    parse_contact_fields,
     ContactBase,
     ContactCreate,
     ContactUpdate,
@@ -194,5 +197,26 @@ class TestUserModels(unittest.TestCase):
         self.assertEqual(reset_token.expires_at, expiry)
 
 
+class TestContactFieldsets(unittest.TestCase):
+
+    def test_parse_contact_fields(self):
+        self.assertIsNone(parse_contact_fields(None))
+        self.assertEqual(parse_contact_fields("last_name, id,first_name"), ("first_name", "last_name", "id"))
+        self.assertIsNone(parse_contact_fields(",".join(CONTACT_FIELDS)))
+        with self.assertRaises(ValueError):
+            parse_contact_fields("id,hashed_password")
+        with self.assertRaises(ValueError):
+            parse_contact_fields(" , ")
+
+    def test_contact_fieldset_model(self):
+        model = contact_fieldset_model(("first_name", "email", "id"))
+        self.assertIs(model, contact_fieldset_model(("first_name", "email", "id")))
+        self.assertEqual(list(model.model_fields), ["first_name", "email", "id"])
+        contact = model(first_name="John", email="john@example.com", id=1)
+        self.assertEqual(contact.model_dump(), {"first_name": "John", "email": "john@example.com", "id": 1})
+        with self.assertRaises(ValidationError):
+            model(first_name="John", email="not-an-email", id=1)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,161 @@
+# tests/test_profiling.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import time
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+import auth
+import main
+import models
+import profiling
+import rate_limit
+from settings import Settings
+
+NOW = datetime.now(timezone.utc)
+ADMIN = models.User(id=1, email="admin@example.com", username="admin", password="hashed", role="admin", is_active=True, created_at=NOW)
+USER = models.User(id=2, email="user@example.com", username="user", password="hashed", role="user", is_active=True, created_at=NOW)
+
+
+def busy_wait(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def build_app(directory: str, user=ADMIN, **options) -> FastAPI:
+    async def authorize(headers):
+        return user
+
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        busy_wait(0.05)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    app.add_middleware(profiling.ProfilingMiddleware, authorize=authorize, directory=directory, **options)
+    return app
+
+
+class TestRequestedFormat(unittest.TestCase):
+    """
+    Tests the detection of the profiling flag.
+    """
+
+    def scope(self, headers=(), query_string=b""):
+        return {"type": "http", "headers": list(headers), "query_string": query_string}
+
+    def test_header_and_query_parameter_select_a_format(self):
+        self.assertEqual(profiling.requested_format(self.scope([(b"x-profile", b"1")])), "speedscope")
+        self.assertEqual(profiling.requested_format(self.scope([(b"x-profile", b"collapsed")])), "collapsed")
+        self.assertEqual(profiling.requested_format(self.scope(query_string=b"limit=5&profile=true")), "speedscope")
+
+    def test_requests_without_the_flag_are_not_profiled(self):
+        self.assertIsNone(profiling.requested_format(self.scope([(b"accept", b"*/*")], b"limit=5")))
+        self.assertIsNone(profiling.requested_format(self.scope([(b"x-profile", b"0")])))
+        self.assertIsNone(profiling.requested_format(self.scope(query_string=b"profile_picture=1")))
+
+
+class TestAuthorizeAdmin(unittest.IsolatedAsyncioTestCase):
+    """
+    Tests that only active administrators may profile.
+    """
+
+    async def test_admin_token_is_authorized(self):
+        with patch("auth.get_current_user", AsyncMock(return_value=ADMIN)) as get_current_user:
+            self.assertEqual(await profiling.authorize_admin(Headers({"authorization": "Bearer token"})), ADMIN)
+        self.assertEqual(get_current_user.call_args.args[0], "token")
+
+    async def test_other_users_and_bad_tokens_are_not(self):
+        with patch("auth.get_current_user", AsyncMock(return_value=USER)):
+            self.assertIsNone(await profiling.authorize_admin(Headers({"authorization": "Bearer token"})))
+        with patch("auth.get_current_user", AsyncMock(side_effect=HTTPException(status_code=401))):
+            self.assertIsNone(await profiling.authorize_admin(Headers({"authorization": "Bearer nope"})))
+        self.assertIsNone(await profiling.authorize_admin(Headers({})))
+
+
+class TestProfilingMiddleware(unittest.TestCase):
+    """
+    Tests profiling single requests on demand.
+    """
+
+    def setUp(self):
+        rate_limit.limiter.reset()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_flagged_admin_request_stores_a_speedscope_profile(self):
+        client = TestClient(build_app(self.directory.name))
+        response = client.get("/slow", headers={"X-Profile": "1"})
+
+        self.assertEqual(response.json(), {"ok": True})
+        self.assertEqual(response.headers["x-profile-status"], "stored")
+        path = profiling.profile_path(self.directory.name, response.headers["x-profile-id"], "speedscope")
+        with open(path) as f:
+            profile = json.load(f)
+        [sampled] = profile["profiles"]
+        self.assertEqual(sampled["type"], "sampled")
+        self.assertEqual(len(sampled["samples"]), len(sampled["weights"]))
+        names = {frame["name"] for frame in profile["shared"]["frames"]}
+        self.assertIn("busy_wait", names)
+        self.assertIn("[await]", names)
+
+    def test_collapsed_profile_has_folded_stacks(self):
+        client = TestClient(build_app(self.directory.name))
+        response = client.get("/slow", params={"profile": "collapsed"})
+        with open(profiling.profile_path(self.directory.name, response.headers["x-profile-id"], "collapsed")) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any("busy_wait (test_profiling.py" in line for line in lines))
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+
+    def test_unflagged_and_unauthorized_requests_are_not_profiled(self):
+        self.assertNotIn("x-profile-status", TestClient(build_app(self.directory.name)).get("/slow").headers)
+        response = TestClient(build_app(self.directory.name, user=None)).get("/slow", headers={"X-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["x-profile-status"], "denied")
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_profiles_are_rate_limited_per_admin(self):
+        client = TestClient(build_app(self.directory.name, rate_limit="1/minute"))
+        self.assertEqual(client.get("/slow", headers={"X-Profile": "1"}).headers["x-profile-status"], "stored")
+        response = client.get("/slow", headers={"X-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["x-profile-status"], "rate-limited")
+        self.assertNotIn("x-profile-id", response.headers)
+
+    def test_profile_download_is_admin_only(self):
+        app = FastAPI()
+        app.include_router(profiling.router)
+        client = TestClient(app)
+        with patch("profiling.PROFILING_DIRECTORY", self.directory.name):
+            profile_id = "0" * 32
+            with open(profiling.profile_path(self.directory.name, profile_id, "speedscope"), "w") as f:
+                f.write("{}")
+            app.dependency_overrides[auth.get_current_active_admin] = lambda: ADMIN
+            self.assertEqual(client.get(f"/admin/profiles/{profile_id}").json(), {})
+            self.assertEqual(client.get("/admin/profiles/..%2F..%2Fetc%2Fpasswd").status_code, 404)
+            app.dependency_overrides.clear()
+            self.assertEqual(client.get(f"/admin/profiles/{profile_id}").status_code, 401)
+
+    def test_create_app_adds_the_middleware_when_enabled(self):
+        enabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False, profiling=True))
+        disabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+        self.assertIn(profiling.ProfilingMiddleware, [middleware.cls for middleware in enabled.user_middleware])
+        self.assertNotIn(profiling.ProfilingMiddleware, [middleware.cls for middleware in disabled.user_middleware])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,11 +4,20 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import time
 import unittest
 from unittest.mock import patch
 import redis
+from redis.backoff import NoBackoff
+from redis.cluster import RedisCluster
+from redis.crc import key_slot
+from redis.retry import Retry
+from starlette.requests import Request
 
 import redis_utils
+import rate_limit
+import metrics
+from fake_redis_server import FakeRedisServer
 
 os.environ["REDIS_HOST"] = "test_host"
 os.environ["REDIS_PORT"] = "1234"
@@ -47,5 +56,204 @@ class TestRedisUtils(unittest.IsolatedAsyncioTestCase):
             self.assertEqual(redis_utils_default.redis_client.connection_pool.connection_kwargs.get('db'), 0)
             self.assertTrue(redis_utils_default.redis_client.connection_pool.connection_kwargs.get('decode_responses'))
 
+
+class FakeClock:
+    """
+    Manually advanced clock for breaker and cache expiry tests.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Tests for the CircuitBreaker and LocalTTLCache building blocks.
+    """
+
+    def test_breaker_opens_after_threshold_and_recovers(self):
+        clock = FakeClock()
+        breaker = redis_utils.CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow_request())
+
+        clock.now = 10
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # only one trial call at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_failed_trial_reopens_breaker(self):
+        clock = FakeClock()
+        breaker = redis_utils.CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+        breaker.record_failure()
+        clock.now = 5
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+    def test_local_cache_expiry_and_eviction(self):
+        clock = FakeClock()
+        cache = redis_utils.LocalTTLCache(max_entries=2, ttl=10, clock=clock)
+        cache.set("a", "1")
+        cache.set("b", "2", ttl=3600)  # capped by the cache TTL
+        cache.get("a")
+        cache.set("c", "3")  # evicts the least recently used key ("b")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        clock.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 1)
+
+
+class TestRedisDegradedMode(unittest.TestCase):
+    """
+    Tests the cache helpers against a local fake Redis that injects latency.
+    """
+
+    def setUp(self):
+        self.server = FakeRedisServer().start()
+        self.client = redis.Redis(
+            host="127.0.0.1", port=self.server.port, decode_responses=True,
+            socket_timeout=0.05, socket_connect_timeout=0.05, retry=Retry(NoBackoff(), 0),
+        )
+        self.breaker = redis_utils.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        self.fallback_cache = redis_utils.LocalTTLCache(max_entries=16, ttl=60)
+        patcher_breaker = patch.object(redis_utils, "breaker", self.breaker)
+        patcher_cache = patch.object(redis_utils, "fallback_cache", self.fallback_cache)
+        patcher_breaker.start()
+        patcher_cache.start()
+        self.addCleanup(patcher_breaker.stop)
+        self.addCleanup(patcher_cache.stop)
+        redis_utils.fallback_counter.reset()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_healthy_redis_round_trip(self):
+        redis_utils.cache_setex(self.client, "user:1", 60, "cached")
+        self.assertEqual(self.server.data["user:1"], "cached")
+        self.assertEqual(redis_utils.cache_get(self.client, "user:1"), "cached")
+        redis_utils.cache_delete(self.client, "user:1")
+        self.assertNotIn("user:1", self.server.data)
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(len(self.fallback_cache), 0)
+
+    def test_slow_redis_opens_breaker_and_uses_local_cache(self):
+        self.server.latency = 0.2
+
+        self.assertIsNone(redis_utils.cache_get(self.client, "user:1"))
+        redis_utils.cache_setex(self.client, "user:1", 60, "cached")
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(redis_utils.fallback_counter.value(operation="get", reason="error"), 1)
+        self.assertEqual(redis_utils.fallback_counter.value(operation="setex", reason="error"), 1)
+
+        # While the breaker is open, calls return immediately from the local cache.
+        commands_sent = len(self.server.commands)
+        started = time.monotonic()
+        self.assertEqual(redis_utils.cache_get(self.client, "user:1"), "cached")
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertEqual(len(self.server.commands), commands_sent)
+        self.assertEqual(redis_utils.fallback_counter.value(operation="get", reason="open"), 1)
+
+        redis_utils.cache_delete(self.client, "user:1")
+        self.assertIsNone(redis_utils.cache_get(self.client, "user:1"))
+
+    def test_breaker_state_is_exported(self):
+        self.server.latency = 0.2
+        redis_utils.cache_get(self.client, "user:1")
+        redis_utils.cache_get(self.client, "user:1")
+        exposition = metrics.render_latest()
+        self.assertIn("redis_circuit_breaker_state 2", exposition)
+        self.assertIn('redis_cache_fallback_total{operation="get",reason="error"} 2', exposition)
+
+    def test_acquire_lock_is_exclusive(self):
+        self.assertTrue(redis_utils.acquire_lock(self.client, "job:{daily}", 60))
+        self.assertFalse(redis_utils.acquire_lock(self.client, "job:{daily}", 60))
+        self.server.latency = 0.2
+        self.assertFalse(redis_utils.acquire_lock(self.client, "job:{other}", 60))
+
+
+class TestRedisTopologies(unittest.TestCase):
+    """
+    Tests Sentinel and Cluster connection modes against local multi-node stand-ins.
+    """
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def start_server(self):
+        server = FakeRedisServer().start()
+        self.servers.append(server)
+        return server
+
+    def test_parse_nodes(self):
+        self.assertEqual(redis_utils.parse_nodes("a:26379, b:26380"), [("a", 26379), ("b", 26380)])
+        with self.assertRaises(ValueError):
+            redis_utils.parse_nodes("a")
+        with self.assertRaises(ValueError):
+            redis_utils.parse_nodes("")
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            redis_utils.create_redis_client("replicated")
+
+    def test_sentinel_mode_discovers_master(self):
+        master = self.start_server()
+        sentinel = self.start_server()
+        sentinel.sentinel_masters = {redis_utils.REDIS_SENTINEL_MASTER: ("127.0.0.1", master.port)}
+        # The first sentinel is unreachable; discovery must move on to the next one.
+        client = redis_utils.create_redis_client("sentinel", sentinels=[("127.0.0.1", 1), ("127.0.0.1", sentinel.port)])
+        self.assertIsInstance(client, redis.Redis)
+
+        redis_utils.cache_setex(client, redis_utils.user_cache_key(7), 60, "cached")
+        self.assertEqual(master.data["user:{7}"], "cached")
+        self.assertEqual(redis_utils.cache_get(client, redis_utils.user_cache_key(7)), "cached")
+        client.close()
+
+    def test_cluster_mode_routes_hash_tagged_keys(self):
+        first, second = self.start_server(), self.start_server()
+        topology = [(0, 8191, first), (8192, 16383, second)]
+        first.cluster = second.cluster = topology
+        client = redis_utils.create_redis_client("cluster", cluster_nodes=[("127.0.0.1", first.port)])
+        self.assertIsInstance(client, RedisCluster)
+
+        for user_id in range(8):
+            client.set(redis_utils.user_cache_key(user_id), user_id)
+        self.assertTrue(first.data and second.data)  # keys are spread across both nodes
+        for user_id in range(8):
+            owner = first if key_slot(str(user_id).encode()) <= 8191 else second
+            self.assertEqual(owner.data[f"user:{{{user_id}}}"], str(user_id))
+
+        # Keys sharing a hash tag live in one slot, so multi-key commands are accepted by a single node.
+        session_key = redis_utils.cache_key("user", 3, "sessions")
+        client.set(session_key, "1")
+        node = first if key_slot(b"3") <= 8191 else second
+        commands_before = len(node.commands)
+        self.assertEqual(client.delete(redis_utils.user_cache_key(3), session_key), 2)
+        self.assertIn(["DEL", "user:{3}", session_key], node.commands[commands_before:])
+        client.close()
+
+    def test_key_layout_uses_hash_tags(self):
+        self.assertEqual(redis_utils.user_cache_key(42), "user:{42}")
+        self.assertEqual(redis_utils.cache_key("user", 42, "sessions"), "user:{42}:sessions")
+        self.assertEqual(key_slot(b"user:{42}"), key_slot(b"user:{42}:sessions"))
+
+        request = Request({"type": "http", "client": ("10.0.0.1", 1234), "headers": []})
+        self.assertEqual(rate_limit.rate_limit_key(request), "{10.0.0.1}")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,181 @@
+# tests/test_request_trace.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import tempfile
+import unittest
+from datetime import timedelta
+
+from fastapi import FastAPI, Form
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from starlette.datastructures import Headers
+
+import auth
+import main
+import request_trace
+from settings import Settings
+
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+class Item(BaseModel):
+    name: str
+    email: str
+    quantity: int
+
+
+def build_app(writer, **options) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/items/{item_id}")
+    async def create_item(item_id: int, item: Item, q: str = None, limit: int = 10):
+        return {"id": item_id, "name": item.name}
+
+    @app.post("/login")
+    async def login(username: str = Form(...), password: str = Form(...)):
+        return {"username": username}
+
+    @app.get("/fail")
+    async def fail():
+        raise RuntimeError("boom")
+
+    @app.get("/metrics")
+    async def get_metrics():
+        return {}
+
+    app.add_middleware(request_trace.RequestTraceMiddleware, writer=writer, **options)
+    return app
+
+
+class TestRedact(unittest.TestCase):
+    """
+    Tests the redaction of personal data in recorded values.
+    """
+
+    def test_strings_become_placeholders_of_their_kind(self):
+        redacted = request_trace.redact("", {
+            "email": "olena@example.com", "password": "secret", "birthday": "1990-01-01",
+            "phone_number": "+380501234567", "first_name": "Olena", "contact_id": "12",
+            "limit": "50", "quantity": 3, "active": True, "tags": ["a", "bc"], "note": None,
+        })
+        self.assertEqual(redacted, {
+            "email": "<email:17>", "password": "<password:6>", "birthday": "<date:10>",
+            "phone_number": "<phone:13>", "first_name": "<text:5>", "contact_id": "12",
+            "limit": "50", "quantity": 3, "active": True, "tags": ["<text:1>", "<text:2>"], "note": None,
+        })
+
+    def test_placeholders_are_parsed_back(self):
+        self.assertEqual(request_trace.parse_placeholder("<email:17>"), ("email", 17))
+        self.assertIsNone(request_trace.parse_placeholder("olena@example.com"))
+        self.assertIsNone(request_trace.parse_placeholder(5))
+
+
+class TestIdentify(unittest.TestCase):
+    """
+    Tests the identity class and pseudonym of a request.
+    """
+
+    def test_valid_token_is_a_user_with_a_pseudonym(self):
+        token = auth.create_access_token({"sub": "olena@example.com", "id": 1}, expires_delta=timedelta(minutes=5))
+        identity_class, identity = request_trace.identify(Headers({"authorization": f"Bearer {token}"}), None)
+        self.assertEqual(identity_class, "user")
+        self.assertNotIn("olena", identity)
+        # A login with the same email maps to the same identity.
+        self.assertEqual(request_trace.identify(Headers({}), {"username": "Olena@example.com"}), ("anonymous", identity))
+
+    def test_unreadable_token_is_invalid(self):
+        self.assertEqual(request_trace.identify(Headers({"authorization": "Bearer nope"}), None), ("invalid", None))
+
+    def test_no_token_is_anonymous(self):
+        self.assertEqual(request_trace.identify(Headers({}), None), ("anonymous", None))
+
+
+class TestRequestTraceMiddleware(unittest.TestCase):
+    """
+    Tests that sampled requests are recorded redacted, without changing what the application sees.
+    """
+
+    def test_json_request_is_recorded_redacted(self):
+        writer = ListWriter()
+        client = TestClient(build_app(writer))
+        body = {"name": "Olena", "email": "olena@example.com", "quantity": 2}
+        response = client.post("/items/7", params={"q": "secret search", "limit": 5}, json=body)
+
+        self.assertEqual(response.json(), {"id": 7, "name": "Olena"})
+        [record] = writer.records
+        self.assertEqual(record["method"], "POST")
+        self.assertEqual(record["route"], "/items/{item_id}")
+        self.assertEqual(record["path_params"], {"item_id": "7"})
+        self.assertEqual(record["query"], {"q": ["<text:13>"], "limit": ["5"]})
+        self.assertEqual(record["body"], {"name": "<text:5>", "email": "<email:17>", "quantity": 2})
+        self.assertTrue(record["body_captured"])
+        self.assertEqual(record["content_type"], "application/json")
+        self.assertEqual(record["request_bytes"], len(response.request.content))
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["response_bytes"], len(response.content))
+        self.assertEqual(record["identity_class"], "anonymous")
+        self.assertNotIn("olena", json.dumps(record).lower())
+
+    def test_form_login_is_recorded_with_an_identity(self):
+        writer = ListWriter()
+        client = TestClient(build_app(writer))
+        self.assertEqual(client.post("/login", data={"username": "olena@example.com", "password": "secret"}).status_code, 200)
+        [record] = writer.records
+        self.assertEqual(record["body"], {"username": "<email:17>", "password": "<password:6>"})
+        self.assertIsNotNone(record["identity"])
+        self.assertNotIn("secret", json.dumps(record))
+
+    def test_large_bodies_are_recorded_by_size_only(self):
+        writer = ListWriter()
+        client = TestClient(build_app(writer, max_body_bytes=10))
+        client.post("/items/1", json={"name": "Olena", "email": "olena@example.com", "quantity": 1})
+        [record] = writer.records
+        self.assertIsNone(record["body"])
+        self.assertFalse(record["body_captured"])
+
+    def test_failures_are_recorded_as_server_errors(self):
+        writer = ListWriter()
+        client = TestClient(build_app(writer), raise_server_exceptions=False)
+        self.assertEqual(client.get("/fail").status_code, 500)
+        self.assertEqual(writer.records[0]["status"], 500)
+
+    def test_excluded_and_unsampled_requests_are_not_recorded(self):
+        writer = ListWriter()
+        TestClient(build_app(writer)).get("/metrics")
+        TestClient(build_app(writer, sample_rate=0.0)).post("/items/1", json={"name": "a", "email": "b", "quantity": 1})
+        self.assertEqual(writer.records, [])
+
+    def test_create_app_adds_the_middleware_when_enabled(self):
+        enabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False, request_trace=True))
+        disabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+        self.assertIn(request_trace.RequestTraceMiddleware, [middleware.cls for middleware in enabled.user_middleware])
+        self.assertNotIn(request_trace.RequestTraceMiddleware, [middleware.cls for middleware in disabled.user_middleware])
+
+
+class TestTraceWriter(unittest.TestCase):
+    """
+    Tests the background JSONL writer.
+    """
+
+    def test_records_are_appended_to_the_file_of_the_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = request_trace.TraceWriter(os.path.join(directory, "trace-{pid}.jsonl"))
+            writer.write({"route": "/a"})
+            writer.write({"route": "/b"})
+            writer.close()
+            with open(os.path.join(directory, f"trace-{os.getpid()}.jsonl")) as f:
+                self.assertEqual([json.loads(line)["route"] for line in f], ["/a", "/b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
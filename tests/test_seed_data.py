@@ -0,0 +1,83 @@
+# tests/test_seed_data.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+
+import seed_data
+from database import Base, ContactDB, UserDB
+from models import Contact
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+REFERENCE = date(2025, 6, 1)
+
+
+class TestGenerateChunk(unittest.TestCase):
+    """
+    Tests the generation of synthetic user and contact rows.
+    """
+
+    def test_same_seed_generates_the_same_rows(self):
+        first = seed_data.generate_chunk(1, 20, 10, seed=7, reference=REFERENCE)
+        second = seed_data.generate_chunk(1, 20, 10, seed=7, reference=REFERENCE)
+        other = seed_data.generate_chunk(1, 20, 10, seed=8, reference=REFERENCE)
+        strip = lambda rows: [row[:6] for row in rows]  # timestamps depend on the clock
+        self.assertEqual(strip(first[0]), strip(second[0]))
+        self.assertEqual(strip(first[1]), strip(second[1]))
+        self.assertNotEqual(strip(first[1]), strip(other[1]))
+
+    def test_fixed_contacts_gives_every_user_the_same_count(self):
+        users, contacts = seed_data.generate_chunk(5, 3, 4, vary_contacts=False, reference=REFERENCE)
+        self.assertEqual([row[0] for row in users], [5, 6, 7])
+        user_ids = [row[seed_data.CONTACT_COLUMNS.index("user_id")] for row in contacts]
+        self.assertEqual(user_ids, [5] * 4 + [6] * 4 + [7] * 4)
+
+    def test_varied_contact_counts_average_to_the_mean(self):
+        _, contacts = seed_data.generate_chunk(1, 2000, 50, reference=REFERENCE)
+        self.assertAlmostEqual(len(contacts) / 2000, 50, delta=5)
+
+    def test_rows_are_valid_contacts(self):
+        users, contacts = seed_data.generate_chunk(1, 50, 20, reference=REFERENCE)
+        for row in contacts:
+            contact = Contact(id=0, **dict(zip(seed_data.CONTACT_COLUMNS, row)))
+            self.assertTrue(date(1930, 1, 1) <= contact.birthday <= REFERENCE)
+            self.assertTrue(contact.phone_number.startswith("+380"))
+        self.assertEqual({row[3] for row in users}, {seed_data.SEED_PASSWORD_HASH})
+
+
+class TestSeed(unittest.TestCase):
+    """
+    Tests bulk seeding into an in-memory SQLite database.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=engine)
+
+    def test_seed_inserts_users_and_contacts_after_existing_rows(self):
+        first = seed_data.seed(engine, 25, 4, chunk_users=10, vary_contacts=False, reference=REFERENCE)
+        second = seed_data.seed(engine, 5, 4, chunk_users=10, vary_contacts=False, reference=REFERENCE)
+
+        self.assertEqual((first.users, first.contacts), (25, 100))
+        self.assertEqual((second.users, second.contacts), (5, 20))
+        self.assertGreater(first.rows_per_second, 0)
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(select(func.max(UserDB.id))).scalar(), 30)
+            self.assertEqual(connection.execute(select(func.count(func.distinct(UserDB.email)))).scalar(), 30)
+            self.assertEqual(connection.execute(select(func.count(func.distinct(ContactDB.email)))).scalar(), 120)
+
+    def test_workers_fall_back_to_one_process_on_sqlite(self):
+        report = seed_data.seed(engine, 3, 2, workers=4, vary_contacts=False, reference=REFERENCE)
+        self.assertEqual((report.users, report.contacts), (3, 6))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+# tests/test_serialization.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import unittest
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import models
+import serialization
+from database import Base, ContactDB, UserDB
+from main import app, get_db
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class TestFastJSONResponse(unittest.TestCase):
+    """
+    Tests the orjson response class and trusted-row conversion.
+    """
+
+    def test_render_matches_pydantic_formats(self):
+        user = models.UserResponse(
+            id=1, username="user", email="user@example.com",
+            created_at=datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc),
+        )
+        rendered = serialization.FastJSONResponse(user.model_dump()).body
+        self.assertEqual(json.loads(rendered), json.loads(user.model_dump_json()))
+
+    def test_trusted_rows_copy_only_model_fields(self):
+        row = UserDB(
+            id=1, username="user", email="user@example.com", hashed_password="secret-hash", refresh_token="secret-token",
+            is_active=True, is_verified=False, created_at=datetime(2025, 1, 1), avatar_url=None, role="user",
+        )
+        [data] = serialization.trusted_rows([row], models.UserResponse)
+        self.assertEqual(set(data), set(models.UserResponse.model_fields))
+        self.assertNotIn("hashed_password", data)
+        self.assertNotIn("refresh_token", data)
+
+    def test_default_response_class_follows_setting(self):
+        with patch.object(serialization, "JSON_FAST_PATH_ENABLED", True):
+            self.assertIs(serialization.default_response_class(), serialization.FastJSONResponse)
+        with patch.object(serialization, "JSON_FAST_PATH_ENABLED", False):
+            self.assertIsNot(serialization.default_response_class(), serialization.FastJSONResponse)
+
+
+class TestListEndpointsFastPath(unittest.TestCase):
+    """
+    Tests that the fast path returns the same payloads as ``response_model`` validation.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.admin = UserDB(username="admin", email="admin@example.com", hashed_password="hashed", role="admin")
+        self.db.add(self.admin)
+        self.db.add(UserDB(username="user", email="user@example.com", hashed_password="hashed", avatar_url="/a.webp"))
+        self.db.flush()
+        for index in range(5):
+            self.db.add(ContactDB(
+                first_name=f"First{index}", last_name="Last", email=f"c{index}@example.com", phone_number=f"555-{index}",
+                birthday=date(1990, 1, index + 1), additional_data=None if index % 2 else "note", user_id=self.admin.id,
+            ))
+        self.db.commit()
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: self.admin
+        app.dependency_overrides[auth.get_current_active_admin] = lambda: self.admin
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def assert_same_payload(self, url):
+        with patch.object(serialization, "JSON_FAST_PATH_ENABLED", False):
+            validated = self.client.get(url)
+        with patch.object(serialization, "JSON_FAST_PATH_ENABLED", True):
+            trusted = self.client.get(url)
+        self.assertEqual(validated.status_code, 200)
+        self.assertEqual(trusted.status_code, 200)
+        self.assertEqual(trusted.headers["content-type"], "application/json")
+        self.assertEqual(trusted.json(), validated.json())
+        return trusted.json()
+
+    def test_contacts(self):
+        self.assertEqual(len(self.assert_same_payload("/contacts?limit=100")), 5)
+
+    def test_users(self):
+        users = self.assert_same_payload("/users")
+        self.assertEqual([user["username"] for user in users], ["admin", "user"])
+        self.assertEqual(len(self.assert_same_payload("/users?skip=1&limit=1")), 1)
+
+
+class TestContactSparseFieldsets(unittest.TestCase):
+    """
+    Tests that ``?fields=`` narrows both the SQL column list and the response.
+    """
+
+    def setUp(self):
+        Base.metadata.create_all(bind=engine)
+        self.db = TestingSessionLocal()
+        self.user = UserDB(username="user", email="user@example.com", hashed_password="hashed")
+        self.db.add(self.user)
+        self.db.flush()
+        self.contact = ContactDB(
+            first_name="Ada", last_name="Lovelace", email="ada@example.com", phone_number="555-0100",
+            birthday=date(1815, 12, 10), additional_data="x" * 1000, user_id=self.user.id,
+        )
+        self.db.add(self.contact)
+        self.db.commit()
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self.record_statement)
+        app.dependency_overrides[get_db] = lambda: self.db
+        app.dependency_overrides[auth.get_current_active_user] = lambda: self.user
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        event.remove(engine, "before_cursor_execute", self.record_statement)
+        app.dependency_overrides.clear()
+        self.db.close()
+        Base.metadata.drop_all(bind=engine)
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "contacts" in statement:
+            self.statements.append(statement)
+
+    def test_list_selects_and_returns_only_requested_fields(self):
+        for fast_path in (False, True):
+            self.statements.clear()
+            with patch.object(serialization, "JSON_FAST_PATH_ENABLED", fast_path):
+                response = self.client.get("/contacts?fields=id,first_name,last_name")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), [{"first_name": "Ada", "last_name": "Lovelace", "id": self.contact.id}])
+            [statement] = self.statements
+            self.assertNotIn("additional_data", statement)
+            self.assertNotIn("contacts.email", statement)
+
+    def test_single_contact_fields(self):
+        response = self.client.get(f"/contacts/{self.contact.id}?fields=email,birthday")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"email": "ada@example.com", "birthday": "1815-12-10"})
+        self.assertNotIn("additional_data", self.statements[-1])
+
+    def test_without_fields_returns_full_contacts(self):
+        response = self.client.get("/contacts")
+        self.assertEqual(set(response.json()[0]), set(models.CONTACT_FIELDS))
+
+    def test_single_contact_without_fields_matches_response_model(self):
+        for fast_path in (False, True):
+            with patch.object(serialization, "JSON_FAST_PATH_ENABLED", fast_path):
+                response = self.client.get(f"/contacts/{self.contact.id}")
+            self.assertEqual(response.json(), models.Contact.model_validate(self.contact).model_dump(mode="json"))
+
+    def test_schema_documents_sparse_responses(self):
+        schemas = app.openapi()["paths"]
+        listed = schemas["/contacts"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]["items"]
+        single = schemas["/contacts/{contact_id}"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        for schema in (listed, single):
+            self.assertEqual([option["$ref"].rsplit("/", 1)[1] for option in schema["anyOf"]], ["Contact", "ContactFields"])
+        self.assertNotIn("required", app.openapi()["components"]["schemas"]["ContactFields"])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/contacts?fields=id,owner")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("owner", response.json()["detail"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# tests/test_server.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import unittest
+from unittest.mock import mock_open, patch
+
+import server
+
+
+class TestWorkerCount(unittest.TestCase):
+    """
+    Tests how the number of workers is derived from the CPUs and the settings.
+    """
+
+    def test_one_worker_per_cpu_by_default(self):
+        self.assertEqual(server.worker_count(cpus=4, concurrency=None, per_core=1, max_workers=16), 4)
+        self.assertEqual(server.worker_count(cpus=1.5, concurrency=None, per_core=1, max_workers=16), 2)
+
+    def test_bounds(self):
+        self.assertEqual(server.worker_count(cpus=64, concurrency=None, per_core=2, max_workers=16), 16)
+        self.assertEqual(server.worker_count(cpus=1, concurrency=None, per_core=0.1, max_workers=16), 1)
+
+    def test_explicit_concurrency_wins(self):
+        self.assertEqual(server.worker_count(cpus=64, concurrency="3", per_core=1, max_workers=2), 3)
+
+    def test_container_quota_caps_cpus(self):
+        with patch("os.sched_getaffinity", return_value=set(range(8))), \
+                patch("builtins.open", mock_open(read_data="200000 100000\n")):
+            self.assertEqual(server.available_cpus(), 2.0)
+        with patch("os.sched_getaffinity", return_value=set(range(8))), \
+                patch("builtins.open", mock_open(read_data="max 100000\n")):
+            self.assertEqual(server.available_cpus(), 8.0)
+
+
+class TestGunicornOptions(unittest.TestCase):
+    """
+    Tests the Gunicorn configuration of the production server.
+    """
+
+    def test_preloads_and_recycles_uvloop_workers(self):
+        options = server.gunicorn_options(workers=3)
+        self.assertEqual(options["workers"], 3)
+        self.assertTrue(options["preload_app"])
+        self.assertEqual(options["max_requests"], server.WEB_MAX_REQUESTS)
+        self.assertEqual(options["max_requests_jitter"], server.WEB_MAX_REQUESTS_JITTER)
+        self.assertEqual(options["worker_class"], "server.ProductionUvicornWorker")
+        self.assertEqual(server.ProductionUvicornWorker.CONFIG_KWARGS, {"loop": "uvloop", "http": "httptools"})
+
+    def test_options_are_valid_gunicorn_settings(self):
+        application = server.ProductionServer(server.gunicorn_options(workers=2))
+        self.assertEqual(application.cfg.workers, 2)
+        self.assertTrue(application.cfg.preload_app)
+
+    def test_schema_is_created_once_in_the_master(self):
+        import database
+        with patch.object(database.Base.metadata, "create_all") as create_all, \
+                patch.object(database.engine, "dispose") as dispose:
+            app = server.load_app()
+        create_all.assert_called_once_with(bind=database.engine)
+        dispose.assert_called_once()
+        self.assertFalse(app.state.settings.create_schema)
+
+
+if __name__ == "__main__":
+    unittest.main()
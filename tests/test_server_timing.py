@@ -0,0 +1,137 @@
+# tests/test_server_timing.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import re
+import time
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+import redis
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import crud
+import database
+import main
+import models
+import serialization
+import server_timing
+from fake_redis_server import FakeRedisServer
+from redis_utils import get_redis
+from settings import Settings
+
+
+def slow_verify(plain_password, hashed_password):
+    time.sleep(0.01)
+    return True
+
+
+class TestServerTiming(unittest.TestCase):
+    """
+    Tests the Server-Timing header of authenticated requests.
+    """
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        server_timing.instrument_engine(self.engine)
+        database.Base.metadata.create_all(bind=self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.add_all([
+            database.UserDB(id=1, username="admin", email="admin@example.com", hashed_password="x", role="admin"),
+            database.UserDB(id=2, username="user", email="user@example.com", hashed_password="x", role="user"),
+        ])
+        self.session.commit()
+        self.server = FakeRedisServer().start()
+        self.redis = redis.Redis(host="127.0.0.1", port=self.server.port, decode_responses=True)
+        server_timing.instrument_redis(self.redis)
+
+    def tearDown(self):
+        self.session.close()
+        self.redis.close()
+        self.server.stop()
+
+    def build_app(self, **options) -> FastAPI:
+        app = FastAPI(default_response_class=serialization.TimedJSONResponse)
+
+        @app.get("/check")
+        async def check(current_user: models.User = Depends(auth.get_current_active_user)):
+            with patch.object(crud.pwd_context, "verify", slow_verify):
+                crud.verify_password("secret", "hash")
+            return {"email": current_user.email}
+
+        @app.get("/public")
+        async def public():
+            return {}
+
+        app.dependency_overrides[database.get_db] = lambda: self.session
+        app.dependency_overrides[get_redis] = lambda: self.redis
+        app.add_middleware(server_timing.ServerTimingMiddleware, **options)
+        return app
+
+    def headers(self, user_id: int, email: str) -> dict:
+        token = auth.create_access_token({"sub": email, "id": user_id}, expires_delta=timedelta(minutes=5))
+        return {"Authorization": f"Bearer {token}"}
+
+    def timings(self, response) -> dict:
+        return {name: float(value) for name, value in re.findall(r"(\w+);dur=([\d.]+)", response.headers["server-timing"])}
+
+    def test_admin_responses_break_the_time_down(self):
+        response = TestClient(self.build_app()).get("/check", headers=self.headers(1, "admin@example.com"))
+
+        self.assertEqual(response.json(), {"email": "admin@example.com"})
+        timings = self.timings(response)
+        self.assertEqual(list(timings), ["auth", "db", "cache", "hash", "render", "total"])
+        self.assertGreaterEqual(timings["hash"], 10)
+        self.assertGreaterEqual(timings["total"], timings["auth"] + timings["hash"])
+
+    def test_other_users_only_get_the_header_when_configured(self):
+        headers = self.headers(2, "user@example.com")
+        self.assertNotIn("server-timing", TestClient(self.build_app()).get("/check", headers=headers).headers)
+        self.assertNotIn("server-timing", TestClient(self.build_app()).get("/public").headers)
+        everyone = TestClient(self.build_app(audience="everyone"))
+        self.assertIn("hash;dur=", everyone.get("/check", headers=headers).headers["server-timing"])
+        self.assertEqual(list(self.timings(everyone.get("/public"))), ["render", "total"])
+
+    def test_timers_outside_requests_do_nothing(self):
+        with server_timing.timer("db"):
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        self.assertIsNone(server_timing.current())
+
+    def test_create_app_adds_the_middleware_by_default(self):
+        enabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+        disabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False, server_timing=False))
+        self.assertIn(server_timing.ServerTimingMiddleware, [middleware.cls for middleware in enabled.user_middleware])
+        self.assertNotIn(server_timing.ServerTimingMiddleware, [middleware.cls for middleware in disabled.user_middleware])
+
+
+class TestTimer(unittest.TestCase):
+    """
+    Tests the accumulation of request-scoped timers.
+    """
+
+    def test_nested_timers_of_one_metric_count_once(self):
+        timings = server_timing.RequestTimings()
+        token = server_timing._timings.set(timings)
+        try:
+            with server_timing.timer("db"):
+                with server_timing.timer("db"):
+                    time.sleep(0.01)
+            with server_timing.timer("db"):
+                time.sleep(0.01)
+        finally:
+            server_timing._timings.reset(token)
+        self.assertAlmostEqual(timings.durations["db"], 0.02, delta=0.01)
+        self.assertEqual(timings.header(0.05), f"db;dur={timings.durations['db'] * 1000:.1f}, total;dur=50.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+# tests/test_tracing.py
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import tempfile
+import subprocess
+import unittest
+from unittest.mock import patch
+
+import redis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
+from sqlalchemy import create_engine, text
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import cloudinary_utils
+import main
+import redis_utils
+import tracing
+from fake_redis_server import FakeRedisServer
+from settings import Settings
+
+exporter = InMemorySpanExporter()
+tracing.configure_tracing("none").add_span_processor(SimpleSpanProcessor(exporter))
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+def read_item(engine, client, item_id: int) -> dict:
+    with engine.connect() as connection:
+        connection.execute(text("SELECT :id"), {"id": item_id})
+    client.get(f"item:{item_id}")
+    with patch("cloudinary.uploader.upload", return_value={"url": "https://example.com/a.png"}):
+        cloudinary_utils._upload("data")
+    return {"id": item_id}
+
+
+def build_app(engine, client) -> Starlette:
+    # A plain Starlette application, which (unlike recent FastAPI) does not trace requests itself.
+    async def item(request):
+        return JSONResponse(read_item(engine, client, int(request.path_params["item_id"])))
+
+    async def fail(request):
+        raise RuntimeError("boom")
+
+    app = Starlette(routes=[Route("/items/{item_id}", item), Route("/fail", fail)])
+    app.add_middleware(tracing.TracingMiddleware)
+    return app
+
+
+class TestTracing(unittest.TestCase):
+    """
+    Tests the request span and the spans of the instrumented clients.
+    """
+
+    def setUp(self):
+        exporter.clear()
+        self.server = FakeRedisServer().start()
+        self.client = redis.Redis(host="127.0.0.1", port=self.server.port, decode_responses=True)
+        tracing.instrument_redis(self.client)
+        self.engine = create_engine("sqlite://")
+        tracing.instrument_engine(self.engine)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def spans(self):
+        return {span.name: span for span in exporter.get_finished_spans()}
+
+    def assert_client_spans_under(self, parent):
+        spans = self.spans()
+        self.assertEqual(spans["SELECT"].attributes["db.query.text"], "SELECT ?")
+        self.assertEqual(spans["SELECT"].attributes["db.system.name"], "sqlite")
+        self.assertEqual(spans["GET"].attributes["db.system.name"], "redis")
+        for name in ("SELECT", "GET", "cloudinary.upload"):
+            self.assertEqual(spans[name].kind, SpanKind.CLIENT)
+            self.assertEqual(spans[name].parent.span_id, parent.context.span_id)
+
+    def test_request_continues_the_incoming_trace_with_child_spans(self):
+        client = TestClient(build_app(self.engine, self.client))
+        self.assertEqual(client.get("/items/7", headers={"traceparent": TRACEPARENT}).json(), {"id": 7})
+
+        server = self.spans()["GET /items/{item_id}"]
+        self.assertEqual(server.kind, SpanKind.SERVER)
+        self.assertEqual(format(server.context.trace_id, "032x"), TRACE_ID)
+        self.assertEqual(server.attributes["http.route"], "/items/{item_id}")
+        self.assertEqual(server.attributes["http.response.status_code"], 200)
+        self.assertTrue(server.attributes["code.function.name"].endswith("item"))
+        self.assert_client_spans_under(server)
+
+    @unittest.skipUnless(tracing.NATIVE_REQUEST_SPANS, "FastAPI does not trace requests itself")
+    def test_native_request_spans_are_the_parents_of_client_spans(self):
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: int):
+            return read_item(self.engine, self.client, item_id)
+
+        TestClient(app).get("/items/7", headers={"traceparent": TRACEPARENT})
+        spans = self.spans()
+        self.assertEqual(format(spans["GET /items/{item_id}"].context.trace_id, "032x"), TRACE_ID)
+        self.assert_client_spans_under(spans["fastapi.endpoint"])
+
+    def test_server_errors_mark_the_span_as_failed(self):
+        client = TestClient(build_app(self.engine, self.client), raise_server_exceptions=False)
+        self.assertEqual(client.get("/fail").status_code, 500)
+        self.assertEqual(self.spans()["GET /fail"].status.status_code, StatusCode.ERROR)
+
+    def test_failed_statements_are_recorded(self):
+        with self.engine.connect() as connection, self.assertRaises(Exception):
+            connection.execute(text("SELECT * FROM missing"))
+        self.assertEqual(self.spans()["SELECT"].status.status_code, StatusCode.ERROR)
+
+    def test_instrumenting_twice_records_one_span(self):
+        tracing.instrument_redis(self.client)
+        tracing.instrument_engine(self.engine)
+        self.client.ping()
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        self.assertEqual([span.name for span in exporter.get_finished_spans()], ["PING", "SELECT"])
+
+    def test_lazy_client_is_instrumented_once_created(self):
+        lazy = redis_utils.LazyRedisClient(lambda: self.client)
+        calls = []
+        lazy.add_setup(calls.append)
+        self.assertEqual(calls, [])
+        lazy.get_client()
+        self.assertEqual(calls, [self.client])
+        lazy.add_setup(calls.append)
+        self.assertEqual(calls, [self.client, self.client])
+
+
+class TestExporters(unittest.TestCase):
+    """
+    Tests the selection of the span exporter.
+    """
+
+    def test_file_exporter_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                patch("tracing.TRACING_FILE", os.path.join(directory, "traces-{pid}.jsonl")):
+            file_exporter = tracing.create_exporter("file")
+            file_exporter.export([exporter_span()])
+            file_exporter.shutdown()
+            with open(os.path.join(directory, f"traces-{os.getpid()}.jsonl")) as f:
+                self.assertEqual(json.loads(f.readline())["name"], "exported")
+
+    def test_unknown_exporter_is_rejected(self):
+        self.assertIsNone(tracing.create_exporter("none"))
+        with self.assertRaises(ValueError):
+            tracing.create_exporter("zipkin")
+
+    def test_create_app_adds_the_middleware_unless_fastapi_traces_requests(self):
+        enabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False, tracing=True))
+        disabled = main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))
+        added = tracing.TracingMiddleware in [middleware.cls for middleware in enabled.user_middleware]
+        self.assertEqual(added, not tracing.NATIVE_REQUEST_SPANS)
+        self.assertNotIn(tracing.TracingMiddleware, [middleware.cls for middleware in disabled.user_middleware])
+
+
+class TestWithoutOpenTelemetry(unittest.TestCase):
+    """
+    Tests that the application runs without the OpenTelemetry SDK while tracing is disabled.
+    """
+
+    def test_sdk_is_only_needed_with_tracing(self):
+        script = (
+            "import sys\n"
+            "sys.modules['opentelemetry.sdk'] = None\n"
+            "import main, tracing\n"
+            "from settings import Settings\n"
+            "main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False))\n"
+            "with tracing.span('smtp.send', tracing.SpanKind.CLIENT): pass\n"
+            "try:\n"
+            "    main.create_app(Settings(create_schema=False, outbox_worker=False, warmup=False, tracing=True))\n"
+            "except RuntimeError as e:\n"
+            "    print(e)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("opentelemetry-sdk", result.stdout)
+
+
+def exporter_span():
+    with tracing.span("exported"):
+        pass
+    return exporter.get_finished_spans()[-1]
+
+
+if __name__ == "__main__":
+    unittest.main()
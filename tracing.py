@@ -0,0 +1,309 @@
+# tracing.py
+
+import os
+import asyncio
+import functools
+from contextlib import nullcontext
+from typing import Any
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import database, redis_utils
+
+try:
+    import fastapi.telemetry  # FastAPI 0.143+ traces requests, dependencies and endpoints itself
+    NATIVE_REQUEST_SPANS = True
+except ImportError:
+    NATIVE_REQUEST_SPANS = False
+
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "file").lower()
+TRACING_FILE = os.environ.get("TRACING_FILE", "traces-{pid}.jsonl")
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "contacts-app")
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", 1.0))
+
+# opentelemetry is imported by _load_opentelemetry once tracing is enabled, so processes
+# without tracing neither load its SDK nor need it installed.
+trace = None
+propagate = None
+tracer = None
+
+_provider = None
+
+
+class SpanKind:
+    """
+    Span kind names, resolved to ``opentelemetry.trace.SpanKind`` when a span starts, so
+    instrumented modules do not import opentelemetry.
+    """
+    INTERNAL = "INTERNAL"
+    SERVER = "SERVER"
+    CLIENT = "CLIENT"
+
+
+def _load_opentelemetry():
+    """
+    Imports opentelemetry on first use.
+
+    Raises:
+        RuntimeError: If the opentelemetry-api or opentelemetry-sdk package is not installed.
+    """
+    global trace, propagate, tracer
+    if trace is None:
+        try:
+            import opentelemetry.sdk.trace  # noqa: F401, needed by configure_tracing
+            from opentelemetry import propagate as otel_propagate, trace as otel_trace
+        except ImportError as e:
+            raise RuntimeError("TRACING_ENABLED needs the opentelemetry-api and opentelemetry-sdk packages") from e
+        trace, propagate = otel_trace, otel_propagate
+        tracer = trace.get_tracer(__name__)
+
+
+def _error_status():
+    return trace.Status(trace.StatusCode.ERROR)
+
+
+def span(name: str, kind: str = SpanKind.INTERNAL, **attributes):
+    """
+    Returns a context manager running a block in a child span of the current one.
+
+    Until ``configure_tracing`` has run, this is a ``nullcontext``, so instrumented code
+    costs next to nothing in processes without tracing.
+
+    Args:
+        name (str): The span name, e.g. "bcrypt.verify".
+        kind (str): The ``SpanKind``; CLIENT for calls to other services.
+        **attributes: Span attributes.
+    """
+    if _provider is None:
+        return nullcontext()
+    return tracer.start_as_current_span(name, kind=trace.SpanKind[kind], attributes=attributes)
+
+
+def traced(name: str, kind: str = SpanKind.INTERNAL, **attributes):
+    """
+    Decorates a function, sync or async, to run in a ``span``.
+    """
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind, **attributes):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name, kind, **attributes):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def create_exporter(name: str = TRACING_EXPORTER):
+    """
+    Creates the span exporter selected by ``TRACING_EXPORTER``.
+
+    "file" appends one JSON span per line to ``TRACING_FILE`` (``{pid}`` is replaced with
+    the process ID), "console" prints spans to standard output, "otlp" sends them to an
+    OpenTelemetry collector (configured with the standard ``OTEL_EXPORTER_OTLP_*``
+    variables; needs ``opentelemetry-exporter-otlp-proto-http``) and "none" records spans
+    without exporting them, e.g. only to propagate trace context.
+
+    Args:
+        name (str): The exporter name.
+
+    Returns:
+        Optional[SpanExporter]: The exporter, or None for "none".
+
+    Raises:
+        ValueError: If the exporter is unknown.
+    """
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    if name == "none":
+        return None
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        out = open(TRACING_FILE.format(pid=os.getpid()), "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError as e:
+            raise ValueError("TRACING_EXPORTER=otlp needs the opentelemetry-exporter-otlp-proto-http package") from e
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown TRACING_EXPORTER: {name!r} (expected file, console, otlp or none)")
+
+
+def configure_tracing(exporter: Any = TRACING_EXPORTER):
+    """
+    Installs the process-wide tracer provider, once; later calls return the same provider.
+
+    Spans are sampled per trace with ``TRACING_SAMPLE_RATE``, following the decision of an
+    incoming ``traceparent`` header, and exported in batches from a background thread.
+
+    Args:
+        exporter: A span exporter, or the name of one (see ``create_exporter``).
+
+    Returns:
+        TracerProvider: The provider.
+
+    Raises:
+        RuntimeError: If the opentelemetry packages are not installed.
+    """
+    global _provider
+    if _provider is None:
+        _load_opentelemetry()
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": TRACING_SERVICE_NAME}),
+            sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATE)),
+        )
+        exporter = create_exporter(exporter) if isinstance(exporter, str) else exporter
+        if exporter is not None:
+            provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        _provider = provider
+    return _provider
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _provider is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    context._tracing_span = tracer.start_span(operation, kind=trace.SpanKind.CLIENT, attributes={
+        "db.system.name": conn.dialect.name,
+        "db.operation.name": operation,
+        "db.query.text": statement,
+    })
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = getattr(context, "_tracing_span", None)
+    if current is not None:
+        current.end()
+        context._tracing_span = None
+
+
+def _handle_error(exception_context):
+    current = getattr(exception_context.execution_context, "_tracing_span", None)
+    if current is not None:
+        current.record_exception(exception_context.original_exception)
+        current.set_status(_error_status())
+        current.end()
+        exception_context.execution_context._tracing_span = None
+
+
+def instrument_engine(engine: Engine):
+    """
+    Runs every SQL statement of an engine in a CLIENT span holding the statement text.
+
+    Only the statement is recorded: bound parameters, which hold personal data, are not.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def instrument_redis(client):
+    """
+    Runs every command of a Redis client in a CLIENT span named after the command.
+
+    Keys and values are not recorded.
+    """
+    execute_command = client.execute_command
+    if getattr(execute_command, "_traced", False):
+        return
+
+    @functools.wraps(execute_command)
+    def traced_execute_command(*args, **options):
+        if _provider is None:
+            return execute_command(*args, **options)
+        command = str(args[0]).upper() if args else "COMMAND"
+        with tracer.start_as_current_span(command, kind=trace.SpanKind.CLIENT, attributes={
+            "db.system.name": "redis", "db.operation.name": command,
+        }):
+            return execute_command(*args, **options)
+
+    traced_execute_command._traced = True
+    client.execute_command = traced_execute_command
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware running each HTTP request in a SERVER span.
+
+    The span continues the trace of an incoming W3C ``traceparent`` header (with the
+    propagators of ``OTEL_PROPAGATORS``, W3C trace context and baggage by default). Once
+    the request is routed it is named after the route template and records the handler
+    (``code.function.name``) and the response status; server errors mark it as failed.
+    Only needed with FastAPI versions that do not trace requests themselves (see
+    ``NATIVE_REQUEST_SPANS``).
+
+    Args:
+        app: The wrapped ASGI application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _provider is None:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        parent = propagate.extract(carrier)
+        method = scope["method"]
+        with tracer.start_as_current_span(method, context=parent, kind=trace.SpanKind.SERVER, attributes={
+            "http.request.method": method,
+            "url.path": scope["path"],
+            "url.scheme": scope.get("scheme", "http"),
+        }) as server_span:
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        server_span.set_status(_error_status())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    server_span.update_name(f"{method} {route}")
+                    server_span.set_attribute("http.route", route)
+                endpoint = scope.get("endpoint")
+                if endpoint is not None:
+                    server_span.set_attribute("code.function.name", f"{endpoint.__module__}.{endpoint.__qualname__}")
+
+
+def enable_tracing(app: FastAPI):
+    """
+    Instruments the application for tracing.
+
+    Instruments the database engine and the Redis client, and adds ``TracingMiddleware``
+    unless FastAPI records request spans itself (``NATIVE_REQUEST_SPANS``); password
+    hashing, email delivery and avatar uploads open their own spans (see ``span``).
+    Spans are only recorded once ``configure_tracing`` has run, which the application's
+    lifespan does in each worker process, so every worker gets its own exporter.
+
+    Args:
+        app (FastAPI): The FastAPI application instance.
+
+    Raises:
+        RuntimeError: If the opentelemetry packages are not installed.
+    """
+    _load_opentelemetry()
+    instrument_engine(database.engine)
+    redis_utils.redis_client.add_setup(instrument_redis)
+    if not NATIVE_REQUEST_SPANS:
+        app.add_middleware(TracingMiddleware)